@@ -1,4 +1,7 @@
 -- Exploración y validación inicial de la fuente SpaceParts
+-- Nota: los chequeos 1, 3 y 4 ahora corren solos en cada extracción
+-- (src/utils/validation.py, VALIDATION_SUITE) y se comparan con lo que llegó.
+-- Si agrego un chequeo aquí, también lo declaro allá.
 
 -- 1. Conteo total y nulos en Customers
 SELECT COUNT(*) AS total_customers,
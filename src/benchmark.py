@@ -0,0 +1,280 @@
+# ------------------------------------------------------------
+# Script: benchmark.py
+#
+# Propósito:
+#   Medir el pipeline de punta a punta sobre datos sintéticos
+#   (utils/synthetic.py) a distintas escalas, sin la base de Azure.
+#   Hasta ahora la única referencia de tiempos era una corrida con
+#   "--limit 5000" en logs/etl.log: no había forma de saber si un
+#   cambio hacía el ETL más rápido o más lento.
+#
+# ¿Qué hace por cada escala?
+#   1. Genera la fuente sintética (SQLite o directamente RAW). Si ya
+#      existe con la misma escala y semilla, la reutiliza.
+#   2. Corre y mide cada etapa en una carpeta aislada
+#      (<workdir>/x<escala>/, con su propio data/):
+#        • extract → run_extract() de etl_spaceparts.py contra SQLite
+#        • curate  → run_curated() de etl_curated.py (sin caché)
+#        • load    → run_load() de main_etl.py, con la misma publicación
+#                    que main_etl ("--publish", default snapshot) y la
+#                    carga SQL con --sql
+#   3. Guarda una línea JSON por etapa en logs/benchmarks/results.jsonl
+#      con tiempo, CPU, pico de memoria, filas/segundo, commit de git
+#      y versiones de Python/pandas/pyarrow.
+#   4. Compara contra la última corrida guardada con la misma escala,
+#      fuente y formato (diferencia % de tiempo).
+#
+# Ejemplo de ejecución:
+#   python src/benchmark.py --scales 1e4 1e5 1e6
+#   python src/benchmark.py --scales 1e7 --source raw --format parquet --stream
+#   python src/benchmark.py --scales 1e5 --sql --label "antes del cambio X"
+#
+# Ojo:
+#   • El pico de memoria (rss) es del proceso y nunca baja: al medir
+#     varias escalas en una corrida, cada una arrastra el pico de las
+#     anteriores. Para comparar memoria, una escala por corrida.
+#   • 1e8 filas en SQLite ocupan varios GB en disco; para escalas
+#     grandes conviene "--source raw" con "--stream".
+# ------------------------------------------------------------
+
+import os
+import json
+import shutil
+import platform
+import argparse
+import subprocess
+import datetime as dt
+import pandas as pd
+import pyarrow as pa
+from utils.logger import get_logger
+from utils.metrics import RunMetrics, path_bytes
+from utils.raw_io import RAW_FORMATS
+from utils.csv_io import CSV_ENGINES, DEFAULT_CSV_ENGINE
+from utils import synthetic
+from etl_spaceparts import run_extract
+from etl_curated import run_curated
+from etl_load import run_sql_load
+from utils import publish
+from main_etl import run_load, PUBLISH_MODES
+
+logger = get_logger("Benchmark")
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_WORKDIR = os.path.join("data", "bench")
+DEFAULT_RESULTS = os.path.join("logs", "benchmarks", "results.jsonl")
+DEFAULT_SCALES = [10_000, 100_000]
+SOURCES = ("sqlite", "raw")
+
+
+def parse_scale(text):
+    # Acepta "100000", "1e5" o "100_000"
+    return int(float(text.replace("_", "")))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark ETL - SpacePartsCoDW (datos sintéticos)")
+    parser.add_argument("--scales", type=parse_scale, nargs="+", default=DEFAULT_SCALES,
+                        help="Filas de fact.Invoices por escala (ej: 1e4 1e5 1e6)")
+    parser.add_argument("--source", choices=SOURCES, default="sqlite",
+                        help="sqlite: mide también la extracción; raw: genera RAW y empieza en curated")
+    parser.add_argument("--format", choices=RAW_FORMATS, default="csv",
+                        help="Formato RAW (extract lo escribe así; con --source raw se genera así)")
+    parser.add_argument("--seed", type=int, default=synthetic.DEFAULT_SEED,
+                        help="Semilla del generador (misma semilla → mismos datos)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Tablas en paralelo al extraer")
+    parser.add_argument("--stream", action="store_true",
+                        help="Curated por lotes (memoria acotada)")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="fact_Invoices curated como dataset particionado por año/mes")
+    parser.add_argument("--csv-engine", choices=CSV_ENGINES, default=DEFAULT_CSV_ENGINE,
+                        help="Motor CSV de curated (pandas o arrow)")
+    parser.add_argument("--publish", choices=PUBLISH_MODES, default="snapshot",
+                        help="Publicación de la etapa load, como en main_etl (default: snapshot)")
+    parser.add_argument("--sql", action="store_true",
+                        help="Mide además la carga SQL (etl_load.py) en un SQLite local")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="Vuelve a generar la fuente aunque ya exista")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR,
+                        help=f"Carpeta de trabajo (default: {DEFAULT_WORKDIR})")
+    parser.add_argument("--results", default=DEFAULT_RESULTS,
+                        help=f"Archivo JSONL de resultados (default: {DEFAULT_RESULTS})")
+    parser.add_argument("--label", default=None,
+                        help="Etiqueta libre de la corrida (ej: nombre del cambio que se prueba)")
+    return parser
+
+
+def environment():
+    """Commit y versiones: lo necesario para saber qué se midió."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+            "pyarrow": pa.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+
+def prepare_source(args, scale_dir, scale):
+    """
+    Deja lista la fuente sintética de la escala. Devuelve la carpeta de
+    la base SQLite (None con --source raw) y si hubo que generarla.
+    """
+    if args.source == "raw":
+        # RAW siempre se regenera: curated lo lee y extract no corre
+        raw = os.path.join(scale_dir, "data", "raw")
+        synthetic.write_raw(raw, scale, fmt=args.format, seed=args.seed, logger=logger)
+        return None, True
+
+    db_dir = os.path.join(scale_dir, "source")
+    marker = synthetic.read_marker(db_dir)
+    if not args.regenerate and marker and marker.get("scale") == scale \
+            and marker.get("seed") == args.seed \
+            and marker.get("version") == synthetic.SYNTHETIC_VERSION:
+        logger.info(f"[BENCH] Reutilizo la fuente sintética de {db_dir}")
+        return db_dir, False
+    synthetic.write_sqlite(db_dir, scale, seed=args.seed, logger=logger)
+    return db_dir, True
+
+
+def run_scale(args, metrics, scale):
+    """Corre las etapas de una escala en su carpeta y las mide."""
+    scale_dir = os.path.join(os.path.abspath(args.workdir), f"x{scale}")
+    os.makedirs(scale_dir, exist_ok=True)
+    # Cada corrida parte sin RAW, curated, estados ni caché previos
+    shutil.rmtree(os.path.join(scale_dir, "data"), ignore_errors=True)
+    name = f"x{scale}"
+
+    with metrics.measure("generate", name) as m:
+        db_dir, generated = prepare_source(args, scale_dir, scale)
+        m.cached = not generated
+        m.rows_out = scale
+
+    # Las etapas usan rutas relativas (data/raw, data/state/...): las
+    # corro dentro de la carpeta de la escala para no tocar las reales
+    cwd = os.getcwd()
+    os.chdir(scale_dir)
+    try:
+        if db_dir:
+            with metrics.measure("extract", name) as m:
+                result = run_extract(connect=lambda: synthetic.sqlite_connect(db_dir),
+                                     full_refresh=True, workers=args.workers, format=args.format)
+                m.status = "ok" if result["ok"] else "failed"
+                m.rows_out = sum(r.get("rows", 0) for r in result["tables"])
+                m.bytes_written = sum(r.get("bytes") or 0 for r in result["tables"])
+
+        with metrics.measure("curate", name) as m:
+            m.bytes_read = path_bytes([os.path.join("data", "raw")])
+            result = run_curated(no_cache=True, stream=args.stream, partitioned=args.partitioned,
+                                 csv_engine=args.csv_engine)
+            m.status = "ok" if result["ok"] else "failed"
+            # Solo las tablas del modelo (las tablas resumen se cuentan aparte)
+            tables = [r for r in result["tables"] if r["table"] != "rollups"]
+            m.rows_in = sum(r.get("rows_in") or 0 for r in tables)
+            m.rows_out = sum(r.get("rows") or 0 for r in tables)
+            m.bytes_written = path_bytes([os.path.join("data", "curated")])
+
+        with metrics.measure("load", name) as m:
+            load_dir = os.path.join("data", "load")
+            snapshot = publish.new_snapshot(load_dir) if args.publish == "snapshot" else None
+            result = run_load(curated_dir=os.path.join("data", "curated"), load_dir=load_dir,
+                              snapshot=snapshot)
+            if snapshot:
+                # Igual que main_etl: solo se publica si la carga terminó bien
+                if result["ok"]:
+                    publish.publish(snapshot)
+                else:
+                    publish.discard(snapshot)
+            m.status = "ok" if result["ok"] else "failed"
+            m.bytes_written = result.get("bytes")
+
+        if args.sql:
+            with metrics.measure("sql", name) as m:
+                result = run_sql_load(target_url="sqlite:///data/load/bench.db")
+                m.status = "ok" if result["ok"] else "failed"
+                m.rows_out = sum(r.get("rows") or 0 for r in result["tables"])
+    finally:
+        os.chdir(cwd)
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_results(path, rows):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def compare(rows, previous):
+    """Líneas de comparación contra la última corrida equivalente."""
+    def same(a, b):
+        return all(a.get(k) == b.get(k) for k in ("scale", "source", "format", "stage",
+                                                    "stream", "partitioned", "csv_engine",
+                                                    "publish", "synthetic_version"))
+
+    lines = []
+    for row in rows:
+        if row["status"] != "ok" or row.get("cached"):
+            continue
+        before = [p for p in previous if same(p, row) and p.get("status") == "ok"
+                  and not p.get("cached")]
+        if not before or not before[-1]["wall_seconds"]:
+            continue
+        last = before[-1]
+        delta = (row["wall_seconds"] - last["wall_seconds"]) / last["wall_seconds"] * 100
+        lines.append(f"{row['stage']:<8} x{row['scale']:<10} {last['wall_seconds']:>8.2f}s → "
+                     f"{row['wall_seconds']:>8.2f}s ({delta:+.1f}%)  "
+                     f"[antes: {last.get('commit') or '?'} {last['timestamp']}]")
+    return lines
+
+
+def run_benchmark(args):
+    bench_id = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+    env = environment()
+    previous = load_results(args.results)
+    metrics = RunMetrics(run_id=f"bench_{bench_id}",
+                         metrics_dir=os.path.join(os.path.abspath(args.workdir), "metrics"))
+
+    ok = True
+    for scale in args.scales:
+        logger.info(f"=== BENCHMARK x{scale:,} ({args.source}, {args.format}) ===")
+        try:
+            run_scale(args, metrics, scale)
+        except Exception:
+            logger.error(f"[BENCH] La escala x{scale} falló", exc_info=True)
+            ok = False
+
+    rows = []
+    for record in metrics.records:
+        row = {"bench_id": bench_id, "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+               "label": args.label, "scale": int(record.table[1:]), "source": args.source,
+               "format": args.format, "stream": args.stream, "partitioned": args.partitioned,
+               "csv_engine": args.csv_engine, "publish": args.publish,
+               "synthetic_version": synthetic.SYNTHETIC_VERSION,
+               **{k: v for k, v in record.as_dict().items() if k != "table"}, **env}
+        rows.append(row)
+        ok = ok and record.status == "ok"
+    save_results(args.results, rows)
+
+    for line in metrics.summary_lines():
+        logger.info(f"[BENCH] {line}")
+    for line in compare(rows, previous):
+        logger.info(f"[COMPARE] {line}")
+    logger.info(f"[BENCH] Resultados agregados a {args.results}")
+    return ok
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return 0 if run_benchmark(args) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -19,182 +19,727 @@
 #   • Agrego el argumento opcional "--limit" para procesar solo un subconjunto de filas.
 #   • Esto acelera la demo, evitando transformar datasets completos si son muy grandes.
 #   • En producción se omite "--limit" y se procesan todas las filas.
+#   • El límite se aplica en el lector (no leo todo para después cortar),
+#     y se puede pedir solo algunas columnas ("--columns") o una muestra
+#     aleatoria / estratificada por fecha ("--sample", "--stratify").
+#   • Con "--stream" la tabla de hechos se procesa por lotes fijos
+#     ("--chunk-size"): cada lote se limpia y se escribe de inmediato,
+#     así la memoria no crece con el histórico.
+#   • Los tipos de cada tabla salen de un esquema declarado
+#     (utils/schema.py): se aplican al leer y se validan al escribir.
+#   • Caché por contenido (utils/cache.py): si el RAW, el código y los
+#     parámetros son los mismos que en la corrida anterior, la tabla no
+#     se vuelve a limpiar ("--no-cache" para forzar).
+#   • Con "--partitioned" fact_Invoices se guarda como dataset Parquet
+#     particionado por año/mes de invoice_date (utils/dataset.py): Power BI
+#     lee solo los meses que filtra y, en corridas incrementales, solo se
+#     reescriben las particiones que cambiaron. "--no-csv" omite el CSV.
+#   • Después de limpiar genero tablas resumen (utils/rollups.py): ventas
+#     por día, mes, cliente y producto, unidas con las dimensiones. Si solo
+#     llegaron fechas nuevas, se suman esas filas a lo que ya había
+#     ("--no-rollups" para no generarlas, "--rebuild-rollups" para rehacerlas).
+#   • Las dimensiones mantienen un índice de claves (utils/keys.py) y las
+#     claves foráneas de fact_Invoices se resuelven contra él en bloque:
+#     las facturas huérfanas se cuentan en el perfil. Con "--surrogate-keys"
+#     customerid / productkey se reemplazan por claves sustitutas int32.
+#
+# [USO COMO MÓDULO]
+#   • run_curated() hace todo el trabajo y main() es solo la CLI.
+#     Si recibe DataFrames ya extraídos ("frames"), los limpia sin
+#     volver a leer RAW desde disco.
 # ------------------------------------------------------------
 
 import os
+import shutil
 import argparse
 import pandas as pd   
-from utils.logger import get_logger
+from utils.logger import get_logger, log_context
+from utils.raw_io import (find_raw, read_raw, raw_columns, normalize_name,
+                          resolve_columns, iter_raw_batches, RawBatchWriter,
+                          DEFAULT_READ_BATCH)
+from utils.schema import (read_dtypes, enforce_schema, business_key, SchemaError,
+                          SCHEMA_VERSION)
+from utils import schema as schema_module
+from utils.cache import StageCache, fingerprint, source_version
+from utils.profiling import Profiler, write_profile
+from utils.dataset import PartitionedWriter, DEFAULT_ROW_GROUP_SIZE
+from utils.csv_io import CsvWriter, write_csv, CSV_ENGINES, DEFAULT_CSV_ENGINE
+from utils.dates import parse_dates, format_dates, forget_formats
+from utils.rollups import build_rollups, find_curated
+from utils.keys import (DIMENSION_KEYS, KeyIndex, OrphanCounter, keys_dir_for,
+                        index_path, load_indexes, save_indexes, update_dimension,
+                        resolve_fact_keys)
 
 # ============================================================
 # 1. Configuración de carpetas
 # ============================================================
 RAW_FOLDER = os.path.join("data", "raw")
 CURATED_FOLDER = os.path.join("data", "curated")
-os.makedirs(CURATED_FOLDER, exist_ok=True)
 
 # Instancia del logger (para registrar mensajes en consola + archivo)
 logger = get_logger("ETL-Curated")
 
+# Versión del código de limpieza: si cambio este archivo o el esquema,
+# cambia la huella y el caché deja de servir
+CODE_VERSION = f"{source_version(__file__, schema_module.__file__)}-s{SCHEMA_VERSION}"
+
 # ============================================================
-# 2. Parser para argumento --limit
+# 2. Parser para argumento --limit (y lectura parcial)
 # ============================================================
-parser = argparse.ArgumentParser(description="ETL Curated - SpacePartsCoDW")
-parser.add_argument("--limit", type=int, default=None,
-                    help="Número máximo de filas a procesar por tabla (opcional, útil en pruebas).")
-args = parser.parse_args()
-row_limit = args.limit
+def build_parser():
+    parser = argparse.ArgumentParser(description="ETL Curated - SpacePartsCoDW")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Número máximo de filas a procesar por tabla (opcional, útil en pruebas).")
+    parser.add_argument("--columns", action="append", default=[], metavar="TABLA=COL1,COL2",
+                        help="Lee solo esas columnas de TABLA (ej: fact_Invoices=invoice_date,quantity). "
+                             "Se puede repetir.")
+    parser.add_argument("--sample", type=float, default=None,
+                        help="Fracción (0-1] de filas a muestrear al azar por tabla (útil para validar rápido).")
+    parser.add_argument("--stratify", action="store_true",
+                        help="Con --sample, muestrea la misma fracción de cada mes de la columna de fecha.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Semilla del muestreo (para repetir la misma muestra).")
+    parser.add_argument("--stream", action="store_true",
+                        help="Procesa fact_Invoices por lotes (memoria constante) en vez de cargarla completa.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_READ_BATCH,
+                        help=f"Filas por lote en modo --stream (default: {DEFAULT_READ_BATCH}).")
+    parser.add_argument("--profile-full-row", action="store_true",
+                        help="Cuenta duplicados sobre la fila completa en vez de la clave de negocio.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Limpia todas las tablas aunque su RAW no haya cambiado.")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="Guarda fact_Invoices como dataset Parquet particionado por año/mes.")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help=f"Filas por row group en los Parquet curated (default: {DEFAULT_ROW_GROUP_SIZE}).")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="No genera el CSV curated (solo Parquet).")
+    parser.add_argument("--no-rollups", action="store_true",
+                        help="No genera las tablas resumen (rollup_*.parquet).")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Rehace las tablas resumen completas en vez de actualizarlas.")
+    parser.add_argument("--csv-engine", choices=CSV_ENGINES, default=DEFAULT_CSV_ENGINE,
+                        help="Motor para leer RAW CSV y escribir el CSV curated: pandas (un hilo) "
+                             "o arrow (multihilo; los textos salen entre comillas).")
+    parser.add_argument("--surrogate-keys", action="store_true",
+                        help="Reemplaza customerid / productkey de fact_Invoices por claves "
+                             "sustitutas int32 (customer_sk / product_sk) y las agrega a las dimensiones.")
+    parser.add_argument("--keys-dir", default=None,
+                        help="Carpeta de los índices de claves (default: state/keys junto a la "
+                             "carpeta curated, ej: data/state/keys).")
+    return parser
+
+
+def build_context(options):
+    """
+    Opciones de la corrida: defaults del parser + lo recibido
+    (mismos nombres que los flags, con "_").
+    """
+    ctx = build_parser().parse_args([])
+    for name, value in options.items():
+        if not hasattr(ctx, name):
+            raise TypeError(f"Opción de curated desconocida: {name}")
+        setattr(ctx, name, value)
+
+    # "fact_Invoices=invoice_date,quantity" → {"fact_Invoices": ["invoice_date", "quantity"]}
+    ctx.column_projection = {}
+    for spec in ctx.columns:
+        c_table, c_cols = spec.split("=", 1)
+        ctx.column_projection[c_table] = [c.strip() for c in c_cols.split(",") if c.strip()]
+    return ctx
 
 # ============================================================
 # 3. Lista de tablas (esperadas desde RAW)
 # ============================================================
-tables = ["dim_Customers", "dim_Products", "fact_Invoices"]
+TABLES = ["dim_Customers", "dim_Products", "fact_Invoices"]
 
 # ------------------------------------------------------------
 # Función de perfilado rápido de calidad
 # Me sirve para obtener un vistazo inmediato de:
 #   - cantidad de filas y columnas
 #   - cuántos nulos hay en total y en % por columna
-#   - duplicados
+#   - duplicados (por clave de negocio o fila completa)
+#   - min/max, negativos y distintos estimados por columna
+# Se guarda como profile_<tabla>.json / .csv junto al curated.
 # Esto es oro para contar la historia de "antes/después"
 # en mi sustentación final.
 # ------------------------------------------------------------
-def quick_profile(df):
-    profile = {
-        "rows": len(df),
-        "cols": df.shape[1],
-        "null_total": int(df.isna().sum().sum()),
-        "null_percent_by_col": (df.isna().mean() * 100).round(2).to_dict(),
-        "duplicates": int(df.duplicated().sum())
+def new_profiler(ctx, table):
+    # Perfil en una sola pasada (utils/profiling.py): nulos, min/max,
+    # negativos, distintos estimados y duplicados por clave de negocio
+    return Profiler(table, key=business_key(table), full_row=ctx.profile_full_row)
+
+
+def log_profile(table, profile):
+    logger.info(f"Perfil [{table}] -> filas: {profile['rows']}, "
+                f"columnas: {profile['cols']}, "
+                f"nulos totales: {profile['null_total']}, "
+                f"duplicados ({profile['duplicate_basis']}): {profile['duplicates']}")
+
+# ------------------------------------------------------------
+# Transformaciones específicas por tabla
+# Cada una recibe un DataFrame crudo y devuelve el limpio. Como
+# trabajan fila a fila (sin agregaciones), sirven igual para la
+# tabla completa o para un lote (modo streaming).
+# ------------------------------------------------------------
+def transform_dim_customers(df):
+    # Estandarizo nombres de columnas a snake_case
+    df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
+
+    # Renombro columnas claves (más amigables para BI)
+    rename_map = {
+        "customerid": "id_cliente",
+        "firstname": "nombre",
+        "lastname": "apellido"
     }
+    df = df.rename(columns={c: rename_map[c] for c in df.columns if c in rename_map})
+
+    # Elimino filas sin clave de cliente
+    if "id_cliente" in df.columns:
+        df = df.dropna(subset=["id_cliente"])
+        df["id_cliente"] = df["id_cliente"].astype(int)
+    return df
+
+
+def transform_dim_products(df):
+    # Estandarizo nombres de columnas
+    df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
+
+    # Normalizo precios a numérico
+    if "price" in df.columns:
+        df["price"] = pd.to_numeric(df["price"], errors="coerce").round(2)
+    return df
+
+
+def transform_fact_invoices(df):
+    # =====================================================
+    # Transformaciones de la tabla de hechos (Fact Invoices)
+    # =====================================================
+    df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
+
+    # ------------------------------------------
+    # Paso: Identifico y convierto columna de fecha
+    # ------------------------------------------
+    date_cols = [c for c in df.columns if "date" in c or "orderdate" in c or "invoice_date" in c]
+    if date_cols:
+        col = date_cols[0]
+        # Formato detectado una vez; se parsean/formatean solo las fechas distintas
+        stats = {}
+        df[col] = parse_dates(df[col], key=f"fact_Invoices.{col}", stats=stats)
+        if stats.get("coerced"):
+            logger.warning(f"[DATES] fact_Invoices.{col}: {stats['coerced']} valores no son "
+                           f"fecha → se descartan esas filas")
+        df = df.dropna(subset=[col])
+        df["date_iso"] = format_dates(df[col], "%Y-%m-%d")
+
+    # ------------------------------------------
+    # Paso: Limpieza de campos numéricos
+    # ------------------------------------------
+    if "quantity" in df.columns:
+        df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0).astype(int)
+    if "unitprice" in df.columns:
+        df["unitprice"] = pd.to_numeric(df["unitprice"], errors="coerce").round(2)
+
+    # Valores originales que venían negativos → los normalizo
+    if "net_invoice_value" in df.columns:
+        df["net_invoice_value"] = pd.to_numeric(df["net_invoice_value"], errors="coerce").fillna(0)
+        df["net_invoice_value"] = df["net_invoice_value"].abs()
+
+    if "net_invoice_cogs" in df.columns:
+        df["net_invoice_cogs"] = pd.to_numeric(df["net_invoice_cogs"], errors="coerce").fillna(0)
+        df["net_invoice_cogs"] = df["net_invoice_cogs"].abs()
+
+    # ------------------------------------------
+    # Paso: Columnas derivadas para BI (más claridad)
+    # ------------------------------------------
+    # Gross sales = quantity * unit price
+    if "quantity" in df.columns and "unitprice" in df.columns:
+        df["gross_invoice_value"] = (df["quantity"] * df["unitprice"]).round(2)
+    else:
+        # fallback por si no vienen columnas separadas
+        df["gross_invoice_value"] = df.get("net_invoice_value", 0)
+
+    # Profit = Gross invoice - COGS (ya positivizados)
+    if "gross_invoice_value" in df.columns and "net_invoice_cogs" in df.columns:
+        df["profit"] = df["gross_invoice_value"] - df["net_invoice_cogs"]
+    return df
+
+
+TRANSFORMS = {
+    "dim_Customers": transform_dim_customers,
+    "dim_Products": transform_dim_products,
+    "fact_Invoices": transform_fact_invoices,
+}
+
+# Tablas que se pueden procesar por lotes con "--stream"
+# (las dimensiones son chicas y conviene tenerlas completas)
+STREAMABLE_TABLES = {"fact_Invoices"}
+
+# Tablas que se pueden guardar particionadas con "--partitioned"
+# (tabla → columna de fecha de la que salen year/month)
+PARTITIONED_TABLES = {"fact_Invoices": "invoice_date"}
+
+
+def partition_column(ctx, table):
+    return PARTITIONED_TABLES.get(table) if ctx.partitioned else None
+
+
+def curated_paths(ctx, table):
+    """
+    Rutas de salida de una tabla: CSV (None con --no-csv) y Parquet
+    (archivo único o carpeta del dataset particionado).
+    """
+    base = os.path.join(ctx.curated_folder, f"{table}_curated")
+    csv = None if ctx.no_csv else base + ".csv"
+    parquet = base if partition_column(ctx, table) else base + ".parquet"
+    return csv, parquet
+
+
+def drop_stale_outputs(ctx, table):
+    """
+    Borra las salidas del otro formato (ej: el Parquet único después de
+    pasar a particionado), para que load no publique ambas versiones.
+    """
+    base = os.path.join(ctx.curated_folder, f"{table}_curated")
+    stale = []
+    if ctx.no_csv:
+        stale.append(base + ".csv")
+    stale.append(base + ".parquet" if partition_column(ctx, table) else base)
+    for path in stale:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+# Tablas de hechos cuyas claves foráneas se resuelven contra las dimensiones
+KEYED_FACT_TABLES = {"fact_Invoices"}
+
+
+def key_indexes(ctx, table):
+    """
+    Índices de las dimensiones para resolver las claves de una tabla de
+    hechos (None si la tabla no es de hechos). Si falta el índice de una
+    dimensión (ej: su curate salió del caché), lo armo desde su curated.
+    """
+    if table not in KEYED_FACT_TABLES:
+        return None
+    indexes = load_indexes(ctx.keys_dir)
+    for dimension, index in indexes.items():
+        path = find_curated(ctx.curated_folder, dimension)
+        key = DIMENSION_KEYS[dimension]["key"]
+        if len(index) or path is None or key not in raw_columns(path):
+            continue
+        update_dimension(dimension, read_raw(path, columns=[key]), ctx.keys_dir)
+        indexes[dimension] = KeyIndex.load(dimension, ctx.keys_dir)
+    return indexes
+
+
+def log_orphans(table, orphans):
+    for column, info in orphans.items():
+        if info["rows"]:
+            logger.warning(f"[KEYS] {table}.{column}: {info['rows']} filas huérfanas "
+                           f"(ej: {info['sample']})")
+
+
+def log_inferred(dimensions):
+    for dimension in dimensions:
+        logger.info(f"[KEYS] {dimension}: miembros inferidos desde los hechos guardados en el índice")
+
+
+def log_partitions(table, summary):
+    logger.info(f"[PARTITIONS] {table}: {len(summary['written'])} reescritas, "
+                f"{len(summary['unchanged'])} sin cambios, {len(summary['removed'])} borradas")
+
+
+# ------------------------------------------------------------
+# Modo streaming: lote → transformación → CSV/Parquet (append)
+# ------------------------------------------------------------
+def curate_in_chunks(ctx, table, raw_path, curated_path_csv, curated_path_parquet, profiler):
+    """
+    Aplica las mismas reglas de limpieza que el modo normal, pero lote
+    a lote: cada lote transformado se agrega al CSV y a un ParquetWriter
+    abierto. Nunca hay más de un lote en memoria.
+
+    Escribo en archivos temporales y los renombro al final, para no dejar
+    un curated a medias si algo falla. curated_path_csv puede ser None
+    (--no-csv) y curated_path_parquet la carpeta de un dataset particionado.
+    El perfil se acumula en "profiler" (los duplicados se cuentan entre
+    todos los lotes, no solo dentro de cada uno).
+    """
+    tmp_csv = curated_path_csv + ".tmp" if curated_path_csv else None
+    tmp_parquet = curated_path_parquet + ".tmp"
+    date_col = partition_column(ctx, table)
+    indexes, orphans = key_indexes(ctx, table), OrphanCounter()
+
+    columns = resolve_columns(raw_path, ctx.column_projection.get(table))
+    batches = iter_raw_batches(raw_path, columns=columns,
+                               batch_size=ctx.chunk_size, limit=ctx.limit,
+                               dtypes=read_dtypes(table, columns or raw_columns(raw_path)),
+                               csv_engine=ctx.csv_engine)
+    # Plan de tipos: se fija con el primer lote y se reusa en todos (sin
+    # achicar enteros no declarados: los lotes siguientes podrían no caber)
+    plan = None
+    rows_read = 0
+    csv_writer = CsvWriter(tmp_csv, ctx.csv_engine) if tmp_csv else None
+    try:
+        # El dataset particionado maneja su propio staging por partición
+        parquet_writer = (PartitionedWriter(curated_path_parquet, date_col, table=table,
+                                            row_group_size=ctx.row_group_size)
+                          if date_col else RawBatchWriter(tmp_parquet, "parquet"))
+        with parquet_writer:
+            for batch_num, chunk in enumerate(batches, start=1):
+                rows_read += len(chunk)
+                chunk = TRANSFORMS[table](chunk)
+                chunk, plan = enforce_schema(chunk, table, plan, streaming=True)
+                if indexes:
+                    chunk = resolve_fact_keys(chunk, indexes, orphans, replace=ctx.surrogate_keys)
+                if csv_writer:
+                    csv_writer.write(chunk)
+                parquet_writer.write(chunk)
+
+                profiler.update(chunk)
+                logger.info(f"[CHUNK] {table} lote {batch_num}: {len(chunk)} filas "
+                            f"(acumulado: {profiler.rows})")
+
+        if csv_writer:
+            csv_writer.close()
+            os.replace(tmp_csv, curated_path_csv)
+        if indexes:
+            log_inferred(save_indexes(indexes, ctx.keys_dir))
+        if date_col:
+            log_partitions(table, parquet_writer.summary)
+        else:
+            os.replace(tmp_parquet, curated_path_parquet)
+    finally:
+        if csv_writer:
+            csv_writer.close()
+        for tmp in (tmp_csv, tmp_parquet):
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+    profile = profiler.result()
+    profile["rows_read"] = rows_read
+    if indexes:
+        profile["orphans"] = orphans.result()
     return profile
 
 # ============================================================
 # 4. Proceso tabla por tabla
 # ============================================================
-for table in tables:
-    raw_path = os.path.join(RAW_FOLDER, f"{table}.csv")
-    curated_path_csv = os.path.join(CURATED_FOLDER, f"{table}_curated.csv")
-    curated_path_parquet = os.path.join(CURATED_FOLDER, f"{table}_curated.parquet")
+def curate_fingerprint(ctx, table, raw_path):
+    """
+    Huella de la entrada de una tabla: contenido del RAW + versión del
+    código + parámetros que cambian el resultado. None si no se puede
+    cachear (sin RAW en disco o muestra aleatoria sin semilla).
+    """
+    if ctx.cache is None or not os.path.exists(raw_path):
+        return None
+    if ctx.sample and ctx.seed is None:
+        return None
+    params = {
+        "limit": ctx.limit,
+        "columns": ctx.column_projection.get(table),
+        "sample": ctx.sample,
+        "stratify": ctx.stratify,
+        "seed": ctx.seed,
+        "stream": ctx.stream and table in STREAMABLE_TABLES,
+        "profile_full_row": ctx.profile_full_row,
+        "partitioned": bool(partition_column(ctx, table)),
+        "row_group_size": ctx.row_group_size,
+        "no_csv": ctx.no_csv,
+        "surrogate_keys": ctx.surrogate_keys,
+        "csv_engine": ctx.csv_engine,
+        "keys_dir": os.path.abspath(ctx.keys_dir),
+    }
+    if table in KEYED_FACT_TABLES:
+        # Las claves resueltas dependen de los índices de las dimensiones
+        params["key_index"] = {d: ctx.cache.file_hash(index_path(d, ctx.keys_dir))
+                               for d in DIMENSION_KEYS if os.path.exists(index_path(d, ctx.keys_dir))}
+    return fingerprint("curate", table, CODE_VERSION, ctx.cache.file_hash(raw_path), params)
+
+
+def write_outputs(ctx, table, df, curated_path_csv, curated_path_parquet):
+    """
+    Escribe CSV + Parquet en temporales y los renombra al final: nadie ve
+    un archivo a medias y no se pisa el inodo que comparte con el caché.
+    Con --partitioned el Parquet es un dataset por año/mes; con --no-csv
+    no hay CSV y un fallo del Parquet es un error.
+    """
+    if curated_path_csv:
+        tmp_csv = curated_path_csv + ".tmp"
+        write_csv(df, tmp_csv, ctx.csv_engine)
+        os.replace(tmp_csv, curated_path_csv)
+    tmp_parquet = curated_path_parquet + ".tmp"
+    date_col = partition_column(ctx, table)
+    try:
+        if date_col:
+            with PartitionedWriter(curated_path_parquet, date_col, table=table,
+                                   row_group_size=ctx.row_group_size) as writer:
+                writer.write(df)
+            log_partitions(table, writer.summary)
+        else:
+            # Row groups acotados + estadísticas min/max (pyarrow las
+            # escribe por defecto) → los lectores saltan row groups
+            df.to_parquet(tmp_parquet, index=False, row_group_size=ctx.row_group_size)
+            os.replace(tmp_parquet, curated_path_parquet)
+        logger.info(f"[OK] Guardado {' y '.join(p for p in (curated_path_csv, curated_path_parquet) if p)}")
+    except Exception as e:
+        if not curated_path_csv:
+            raise
+        logger.warning(f"[WARN] Parquet falló: {repr(e)}. Solo guardo CSV.")
+        # Tampoco dejo el Parquet de una corrida anterior: no coincidiría con el CSV
+        for stale in (tmp_parquet, curated_path_parquet):
+            if os.path.isdir(stale):
+                shutil.rmtree(stale)
+            elif os.path.exists(stale):
+                os.remove(stale)
+
+
+def curate_table(ctx, table, df=None):
+    """
+    Limpia una tabla y escribe su versión curated (CSV + Parquet).
+
+    - df: DataFrame crudo ya en memoria (ej: recién extraído en el mismo
+      proceso). Si es None, se lee el RAW desde disco.
 
-    if not os.path.exists(raw_path):
+    Devuelve {"table", "ok", "rows", "skipped", "cached", "outputs"} (más
+    "rows_in", filas leídas antes de limpiar, si se procesó) y, si
+    ctx.keep_frames, también "df" con el resultado curated.
+    "outputs" son los archivos que dejó (o validó) esta corrida.
+    """
+    # El RAW puede ser CSV, Parquet, Arrow o una carpeta de parts
+    raw_path = find_raw(ctx.raw_folder, table) or os.path.join(ctx.raw_folder, f"{table}.csv")
+    curated_path_csv, curated_path_parquet = curated_paths(ctx, table)
+    result = {"table": table, "ok": False, "rows": 0, "skipped": False, "cached": False,
+              "outputs": []}
+
+    if df is None and not os.path.exists(raw_path):
         logger.warning(f"[SKIP] No existe {raw_path}. Me salto {table}")
-        continue
+        result.update(ok=True, skipped=True)
+        return result
+
+    # --------------------------------------------------------
+    # Caché: si la entrada no cambió desde la última corrida, me la salto
+    # --------------------------------------------------------
+    profile_json = os.path.join(ctx.curated_folder, f"profile_{table}.json")
+    profile_csv = os.path.join(ctx.curated_folder, f"profile_{table}.csv")
+    outputs = [p for p in (curated_path_csv, curated_path_parquet, profile_json, profile_csv) if p]
+    drop_stale_outputs(ctx, table)
+    fp = curate_fingerprint(ctx, table, raw_path)
+    cached = ctx.cache.lookup("curate", table, fp, outputs) if fp else None
+    if cached is not None:
+        logger.info(f"[CACHE] {table} sin cambios (huella {fp[:12]}). Me salto la limpieza.")
+        result.update(ok=True, rows=cached.get("rows", 0), cached=True,
+                      outputs=[p for p in outputs if os.path.exists(p)])
+        if ctx.keep_frames:
+            # read_raw entiende tanto el archivo único como el dataset particionado
+            result["df"] = read_raw(curated_path_parquet)
+        return result
 
-    logger.info(f"[START] Procesando {table} desde {raw_path} "
-                f"(limit={row_limit if row_limit else 'ALL'})")
+    source = "memoria" if df is not None else raw_path
+    logger.info(f"[START] Procesando {table} desde {source} "
+                f"(limit={ctx.limit if ctx.limit else 'ALL'}"
+                + (f", sample={ctx.sample}" if ctx.sample else "") + ")")
+    # Formatos de fecha: se detectan de nuevo en cada corrida de la tabla
+    forget_formats(table)
 
     # --------------------------------------------------------
-    # Paso 1: Cargo el CSV crudo (RAW)
+    # Modo streaming (solo fact_Invoices): lee, limpia y escribe por lotes
     # --------------------------------------------------------
-    try:
-        df = pd.read_csv(raw_path, encoding="utf-8-sig")
+    if df is None and ctx.stream and table in STREAMABLE_TABLES and not ctx.sample:
+        try:
+            profile = curate_in_chunks(ctx, table, raw_path, curated_path_csv,
+                                       curated_path_parquet, new_profiler(ctx, table))
+        except Exception as e:
+            logger.error(f"[ERROR] Falló el procesamiento por lotes de {table}: {repr(e)}")
+            return result
+        log_orphans(table, profile.get("orphans", {}))
+        log_profile(table, profile)
+        write_profile(profile, profile_json, profile_csv)
+        logger.info(f"[OK] Guardado {' y '.join(p for p in (curated_path_csv, curated_path_parquet) if p)}")
+        result.update(ok=True, rows=profile["rows"], rows_in=profile["rows_read"],
+                      outputs=outputs, profile=profile)
+        if fp:
+            ctx.cache.store("curate", table, fp, outputs, meta={"rows": profile["rows"]})
+        return result
 
-        # Aplico límite si fue indicado
-        if row_limit:
-            df = df.head(row_limit)
+    # --------------------------------------------------------
+    # Paso 1: Cargo el archivo crudo (RAW)
+    # --------------------------------------------------------
+    try:
+        if df is not None:
+            # Ya viene en memoria: aplico aquí límite, columnas y muestra
+            df = select_in_memory(ctx, table, df)
+        else:
+            # CSV se parsea; Parquet/Arrow se leen columna a columna con
+            # sus tipos originales. Los datasets de parts se leen como uno.
+            # Límite, columnas y muestra se aplican dentro del lector.
+            stratify_col = None
+            if ctx.sample and ctx.stratify:
+                stratify_col = next((c for c in raw_columns(raw_path)
+                                     if "date" in normalize_name(c)), None)
+            projection = ctx.column_projection.get(table)
+            dtypes = read_dtypes(table, resolve_columns(raw_path, projection) or raw_columns(raw_path))
+            df = read_raw(raw_path, columns=projection, limit=ctx.limit,
+                          sample=ctx.sample, stratify_by=stratify_col, seed=ctx.seed,
+                          dtypes=dtypes, csv_engine=ctx.csv_engine)
 
     except Exception as e:
-        logger.error(f"[ERROR] No pude leer {raw_path}: {repr(e)}")
-        continue
+        logger.error(f"[ERROR] No pude leer {source}: {repr(e)}")
+        return result
 
     # --------------------------------------------------------
     # Paso 2: Transformaciones específicas según tabla
     # --------------------------------------------------------
+    rows_read = len(df)
+    df = TRANSFORMS[table](df)
 
-    if table == "dim_Customers":
-        # Estandarizo nombres de columnas a snake_case
-        df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
-
-        # Renombro columnas claves (más amigables para BI)
-        rename_map = {
-            "customerid": "id_cliente",
-            "firstname": "nombre",
-            "lastname": "apellido"
-        }
-        df = df.rename(columns={c: rename_map[c] for c in df.columns if c in rename_map})
-
-        # Elimino filas sin clave de cliente
-        if "id_cliente" in df.columns:
-            df = df.dropna(subset=["id_cliente"])
-            df["id_cliente"] = df["id_cliente"].astype(int)
-
-    elif table == "dim_Products":
-        # Estandarizo nombres de columnas
-        df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
-
-        # Normalizo precios a numérico
-        if "price" in df.columns:
-            df["price"] = pd.to_numeric(df["price"], errors="coerce").round(2)
-
-    elif table == "fact_Invoices":
-        # =====================================================
-        # Transformaciones de la tabla de hechos (Fact Invoices)
-        # =====================================================
-        df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
-
-        # ------------------------------------------
-        # Paso: Identifico y convierto columna de fecha
-        # ------------------------------------------
-        date_cols = [c for c in df.columns if "date" in c or "orderdate" in c or "invoice_date" in c]
-        if date_cols:
-            col = date_cols[0]
-            df[col] = pd.to_datetime(df[col], errors="coerce")
-            df = df.dropna(subset=[col])
-            df["date_iso"] = df[col].dt.strftime("%Y-%m-%d")
-
-        # ------------------------------------------
-        # Paso: Limpieza de campos numéricos
-        # ------------------------------------------
-        if "quantity" in df.columns:
-            df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0).astype(int)
-        if "unitprice" in df.columns:
-            df["unitprice"] = pd.to_numeric(df["unitprice"], errors="coerce").round(2)
-
-        # Valores originales que venían negativos → los normalizo
-        if "net_invoice_value" in df.columns:
-            df["net_invoice_value"] = pd.to_numeric(df["net_invoice_value"], errors="coerce").fillna(0)
-            df["net_invoice_value"] = df["net_invoice_value"].abs()
-
-        if "net_invoice_cogs" in df.columns:
-            df["net_invoice_cogs"] = pd.to_numeric(df["net_invoice_cogs"], errors="coerce").fillna(0)
-            df["net_invoice_cogs"] = df["net_invoice_cogs"].abs()
-
-        # ------------------------------------------
-        # Paso: Columnas derivadas para BI (más claridad)
-        # ------------------------------------------
-        # Gross sales = quantity * unit price
-        if "quantity" in df.columns and "unitprice" in df.columns:
-            df["gross_invoice_value"] = (df["quantity"] * df["unitprice"]).round(2)
-        else:
-            # fallback por si no vienen columnas separadas
-            df["gross_invoice_value"] = df.get("net_invoice_value", 0)
+    # Tipos compactos según el esquema declarado (y validación)
+    try:
+        df, _ = enforce_schema(df, table)
+    except SchemaError as e:
+        logger.error(f"[ERROR] {table} no cumple su esquema: {e}")
+        return result
 
-        # Profit = Gross invoice - COGS (ya positivizados)
-        if "gross_invoice_value" in df.columns and "net_invoice_cogs" in df.columns:
-            df["profit"] = df["gross_invoice_value"] - df["net_invoice_cogs"]
+    # Claves: las dimensiones alimentan su índice; los hechos se resuelven contra él
+    orphans = OrphanCounter()
+    if table in DIMENSION_KEYS:
+        df, added, removed = update_dimension(table, df, ctx.keys_dir, add_sk=ctx.surrogate_keys)
+        if added:
+            logger.info(f"[KEYS] {table}: {added} claves nuevas en el índice")
+        if removed:
+            logger.info(f"[KEYS] {table}: {removed} claves ya no están en la dimensión")
+    indexes = key_indexes(ctx, table)
+    if indexes:
+        df = resolve_fact_keys(df, indexes, orphans, replace=ctx.surrogate_keys)
+        log_inferred(save_indexes(indexes, ctx.keys_dir))
 
     # --------------------------------------------------------
     # Paso 3: Perfilado rápido (útil para storytelling demo)
     # --------------------------------------------------------
-    profile = quick_profile(df)
-    logger.info(f"Perfil [{table}] -> filas: {profile['rows']}, "
-                f"columnas: {profile['cols']}, "
-                f"nulos totales: {profile['null_total']}, "
-                f"duplicados: {profile['duplicates']}")
+    profile = new_profiler(ctx, table).update(df).result()
+    # Filas antes de limpiar: el "antes" del antes/después
+    profile["rows_read"] = rows_read
+    if indexes:
+        profile["orphans"] = orphans.result()
+        log_orphans(table, profile["orphans"])
+    log_profile(table, profile)
 
     # --------------------------------------------------------
-    # Paso 4: Guardar resultados (CSV + Parquet)
+    # Paso 4: Guardar resultados (CSV + Parquet + perfil JSON/CSV)
     # --------------------------------------------------------
     try:
-        df.to_csv(curated_path_csv, index=False, encoding="utf-8-sig")
-        df.to_parquet(curated_path_parquet, index=False)
-        logger.info(f"[OK] Guardado {curated_path_csv} y {curated_path_parquet}")
+        write_outputs(ctx, table, df, curated_path_csv, curated_path_parquet)
     except Exception as e:
-        logger.warning(f"[WARN] Parquet falló: {repr(e)}. Solo guardo CSV.")
-        df.to_csv(curated_path_csv, index=False, encoding="utf-8-sig")
+        logger.error(f"[ERROR] No pude guardar {table}: {repr(e)}")
+        return result
+    write_profile(profile, profile_json, profile_csv)
+
+    result.update(ok=True, rows=len(df), rows_in=rows_read, profile=profile,
+                  outputs=[p for p in outputs if os.path.exists(p)])
+    if fp:
+        ctx.cache.store("curate", table, fp, outputs, meta={"rows": len(df)})
+    if ctx.keep_frames:
+        result["df"] = df
+    return result
+
+
+def select_in_memory(ctx, table, df):
+    """Límite / proyección / muestra para un DataFrame que ya está en memoria."""
+    projection = ctx.column_projection.get(table)
+    if projection:
+        by_norm = {normalize_name(c): c for c in df.columns}
+        df = df[[by_norm[normalize_name(c)] for c in projection]]
+    if ctx.sample:
+        df = df.sample(frac=ctx.sample, random_state=ctx.seed)
+    if ctx.limit:
+        df = df.head(ctx.limit)
+    return df.reset_index(drop=True)
+
+
+# ============================================================
+# 5. Tablas resumen (después de limpiar las tres tablas)
+# ============================================================
+def run_rollups(curated_folder=CURATED_FOLDER, rebuild=False):
+    """
+    Genera / actualiza las tablas resumen sobre los curated.
+    Devuelve el mismo formato que run_curated ({"tables": [...], "ok"}),
+    con una sola entrada "rollups", para encadenarlo igual en main_etl.
+    """
+    result = {"table": "rollups", "ok": False, "rows": 0, "skipped": False, "cached": False,
+              "outputs": []}
+    try:
+        summary = build_rollups(curated_folder, full_rebuild=rebuild, logger=logger)
+    except Exception as e:
+        logger.error(f"[ERROR] No pude generar las tablas resumen: {repr(e)}")
+        return {"tables": [result], "ok": False}
+    result.update(ok=True, rows=sum(summary["rows"].values()),
+                  cached=summary["mode"] == "unchanged", outputs=summary["outputs"])
+    return {"tables": [result], "ok": True}
+
+# ============================================================
+# 6. Ejecución de la etapa completa
+# ============================================================
+def run_curated(frames=None, tables=None, raw_folder=RAW_FOLDER,
+                curated_folder=CURATED_FOLDER, keep_frames=False, cache=None, **options):
+    """
+    Ejecuta la fase curated para todas las tablas.
+
+    - frames: {tabla: DataFrame crudo} ya en memoria (ej: lo que devolvió
+      run_extract(keep_frames=True)); las tablas que no estén se leen de RAW
+    - tables: tablas a procesar (default: TABLES)
+    - keep_frames: si True, devuelve los DataFrames curated en "frames"
+    - cache: StageCache compartido (ej: el de main_etl); si es None creo
+      uno propio en data/cache, salvo con no_cache=True
+    - options: mismas opciones que la CLI (limit, columns, sample, stream, ...)
+
+    Devuelve {"tables": [resultado por tabla], "frames": {tabla: df}, "ok": bool}.
+    """
+    ctx = build_context(options)
+    ctx.raw_folder = raw_folder
+    ctx.curated_folder = curated_folder
+    ctx.keep_frames = keep_frames
+    # Índices de claves propios de esta carpeta curated (no del CWD)
+    ctx.keys_dir = ctx.keys_dir or keys_dir_for(curated_folder)
+    own_cache = cache is None and not ctx.no_cache
+    ctx.cache = None if ctx.no_cache else (cache or StageCache())
+    os.makedirs(curated_folder, exist_ok=True)
+    frames = frames or {}
+
+    def curate_one(table):
+        with log_context(stage="curate", table=table):
+            return curate_table(ctx, table, frames.get(table))
+
+    results = [curate_one(table) for table in tables or TABLES]
+    if own_cache:
+        ctx.cache.evict()
+
+    # Resúmenes: solo si se procesaron las tres tablas completas (sin
+    # proyección de columnas en los hechos) y todas salieron bien.
+    # main_etl las procesa de a una y agrega su propia tarea de rollups.
+    if not ctx.no_rollups and "fact_Invoices" not in ctx.column_projection \
+            and set(TABLES) <= {r["table"] for r in results} and all(r["ok"] for r in results):
+        results += run_rollups(curated_folder, rebuild=ctx.rebuild_rollups)["tables"]
+
+    failed = [r["table"] for r in results if not r["ok"]]
+    if failed:
+        logger.error(f"[END] ETL curated terminó con errores en: {', '.join(failed)}")
+    else:
+        logger.info("[END] ETL curated completado correctamente.")
+
+    curated_frames = {r["table"]: r.pop("df") for r in results if "df" in r}
+    return {"tables": results, "frames": curated_frames, "ok": not failed}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    summary = run_curated(**vars(args))
+    return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+
 
-logger.info("[END] ETL curated completado correctamente.")
 
 # ------------------------------------------------------------
 # NOTAS:
@@ -205,10 +750,48 @@ logger.info("[END] ETL curated completado correctamente.")
 # 4. En fact_Invoices ahora corrijo valores negativos con abs().
 # 5. Agrego derivadas: gross_invoice_value y profit → facilitan el modelo en BI.
 # 6. El argumento "--limit" permite demos más rápidas sin necesidad de procesar todo.
+#    Ahora el límite viaja al lector (nrows / lectura por lotes): una corrida
+#    con "--limit 5000" lee 5000 filas, no el archivo completo.
 # 7. Guardado en carpeta raíz "data/curated", separando bien capas RAW/Curated.
+#    Con "--stream", fact_Invoices pasa lote a lote por las mismas reglas
+#    (transform_fact_invoices) y se escribe con un ParquetWriter abierto:
+#    la memoria depende de "--chunk-size", no del tamaño del histórico.
 # 8. **Cambio importante (data quality): Detectamos que los campos 
 #    net_invoice_value y net_invoice_cogs venían negativos desde la fuente 
 #    (probablemente por notas de crédito o diseño del sistema). 
 #    Se normalizan con ABS() para asegurar que las métricas de BI 
 #    (ventas, COGS, profit, márgenes) se calculen correctamente.**
+# 9. Tipos declarados (utils/schema.py): enteros en int32, textos repetitivos
+#    como category, fechas como datetime. Menos memoria, Parquet más chico y
+#    sin depender de lo que pandas adivine en cada corrida.
+# 10. Todo el trabajo vive en run_curated(); la CLI solo llama a main().
+#    main_etl.py lo importa y puede pasarle en memoria lo que extrajo.
+# 11. El caché compara huellas de contenido, no fechas de archivo: si la
+#    extracción reescribe un RAW idéntico, igual se reconoce como "sin cambios".
+# 12. "--partitioned": fact_Invoices_curated/ queda como year=AAAA/month=M/
+#    con un _manifest.json que guarda el hash de cada partición. Una partición
+#    cuyo contenido no cambió no se reemplaza (mismo archivo, mismo inodo), así
+#    que con --incremental solo se reescriben los meses que trajeron facturas.
+#    Los row groups ("--row-group-size") llevan estadísticas min/max para que
+#    los filtros por fecha salten bloques enteros.
+# 13. Las tablas resumen (rollup_*.parquet) tienen una fila por día, mes,
+#    cliente o producto: es lo que Power BI necesita para los tableros de
+#    ventas. El estado (huella de cada archivo de fact_Invoices ya agregado)
+#    vive en data/state/rollups.json; si el curated cambió por delante de
+#    las filas nuevas, se reconstruye.
+# 14. Índice de claves (data/state/keys/, o state/keys junto a la carpeta
+#    curated de la corrida; "--keys-dir" lo cambia): la clave sustituta de
+#    un cliente o producto no cambia entre corridas. Una factura que apunta a una clave
+#    que no está en la dimensión actual (nunca estuvo o se borró) se reporta
+#    en profile_fact_Invoices.json ("orphans"), en vez de perderse en un
+#    join. Con --surrogate-keys la clave desconocida entra al índice como
+#    miembro inferido: la factura lleva una clave sustituta propia y la
+#    clave de negocio sigue en el índice.
+# 15. "--csv-engine arrow" (utils/csv_io.py): lee RAW CSV y escribe el CSV
+#    curated con pyarrow en varios hilos. Los valores se escriben como los
+#    escribe pandas (fechas, True/False, 5.0); solo cambia que los textos van
+#    entre comillas. Las fechas de facturas se parsean y formatean sobre los
+#    valores distintos (utils/dates.py), con el formato detectado una vez
+#    por corrida. Una fecha en otro formato se parsea igual (valor a valor)
+#    y las filas cuyo valor no es fecha se cuentan en el log ([DATES]).
 # ------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,418 @@
+# ------------------------------------------------------------
+# Script: etl_load.py
+#
+# Propósito:
+#   Este script implementa la fase **Load** "de verdad": inserto los
+#   datasets curated (dim_Customers, dim_Products, fact_Invoices) en
+#   una base SQL destino, en vez de solo copiar archivos.
+#
+#   ¿Cómo cargo?
+#     - Leo el Parquet curated por lotes (memoria constante).
+#     - Cada lote se inserta con un executemany (SQLAlchemy) y se
+#       confirma en su propia transacción: si algo falla a mitad,
+#       lo ya confirmado queda y el error dice en qué lote fue.
+#     - Dimensiones → upsert por clave (borro las claves del lote y
+#       las vuelvo a insertar, dentro de la misma transacción).
+#     - Hechos → se reemplaza la tabla completa: los lotes van a una
+#       tabla de staging y al final, en una sola transacción, la
+#       staging toma el lugar de la destino (rename). Quien lee la
+#       tabla ve los datos viejos hasta el final y nunca una tabla vacía
+#       o a medias; si la carga falla, la destino queda intacta.
+#     - Al final informo filas/segundo por tabla para poder ajustar
+#       "--batch-size".
+#
+# Destino:
+#   Cualquier URL de SQLAlchemy ("--target-url" o la variable
+#   LOAD_TARGET_URL del .env). Ejemplos:
+#     sqlite:///data/load/spaceparts.db              (pruebas locales)
+#     mssql+pyodbc:///?odbc_connect=<cadena ODBC>    (Azure SQL / SQL Server)
+#   Con mssql+pyodbc activo fast_executemany: pyodbc manda cada lote
+#   como un solo arreglo de parámetros en vez de fila por fila.
+#
+# Ejemplo de ejecución:
+#   python src/etl_load.py --target-url sqlite:///data/load/spaceparts.db
+#   python src/etl_load.py --batch-size 20000 --tables fact_Invoices
+# ------------------------------------------------------------
+
+import os
+import time
+import argparse
+from dotenv import load_dotenv
+from sqlalchemy import (create_engine, inspect, MetaData, Table, Column, Integer,
+                        BigInteger, Float, Boolean, DateTime, String, delete, insert,
+                        tuple_, text)
+import pandas as pd
+from utils.logger import get_logger
+from utils.cache import fingerprint, source_version
+from utils.raw_io import iter_raw_batches, empty_raw_frame
+
+# ============================================================
+# 1. Configuración inicial
+# ============================================================
+load_dotenv()
+logger = get_logger("ETL-Load")
+
+CURATED_FOLDER = os.path.join("data", "curated")
+
+# Versión del código de carga: entra en la huella del caché
+CODE_VERSION = source_version(__file__)
+
+DEFAULT_BATCH_SIZE = 5_000
+# SQL Server acepta como máximo 2100 parámetros por sentencia:
+# los DELETE ... IN (...) del upsert se parten en trozos de este tamaño
+DELETE_CHUNK = 1_000
+# Sufijos de las tablas auxiliares del modo replace
+STAGING_SUFFIX = "__staging"
+OLD_SUFFIX = "__old"
+
+# Cómo se carga cada tabla curated
+#   - target: nombre de la tabla destino
+#   - mode: "upsert" (por clave) o "replace" (vacío y cargo todo)
+#   - key: columnas clave (para upsert y primary key al crear la tabla)
+LOAD_TABLES = {
+    "dim_Customers": {"target": "dim_customers", "mode": "upsert", "key": ["id_cliente"]},
+    "dim_Products": {"target": "dim_products", "mode": "upsert", "key": ["productkey"]},
+    "fact_Invoices": {"target": "fact_invoices", "mode": "replace", "key": []},
+}
+
+
+# ============================================================
+# 2. Parser de argumentos
+# ============================================================
+def build_parser():
+    parser = argparse.ArgumentParser(description="ETL Load - SpacePartsCoDW")
+    parser.add_argument("--target-url", default=os.getenv("LOAD_TARGET_URL"),
+                        help="URL de SQLAlchemy del destino (default: LOAD_TARGET_URL del .env).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Filas por lote / transacción (default: {DEFAULT_BATCH_SIZE}).")
+    parser.add_argument("--source-dir", default=CURATED_FOLDER,
+                        help=f"Carpeta con los archivos curated (default: {CURATED_FOLDER}).")
+    parser.add_argument("--tables", nargs="+", default=None, choices=list(LOAD_TABLES),
+                        help="Tablas a cargar (default: todas).")
+    return parser
+
+
+# ============================================================
+# 3. Conexión y tablas destino
+# ============================================================
+def open_engine(target_url):
+    """Engine de SQLAlchemy para el destino (fast_executemany si es pyodbc)."""
+    if not target_url:
+        raise ValueError("No hay destino: usa --target-url o define LOAD_TARGET_URL")
+    if target_url.startswith("mssql+pyodbc"):
+        return create_engine(target_url, fast_executemany=True)
+    if target_url.startswith("sqlite"):
+        # Varias tablas en paralelo escriben en el mismo archivo: espero el lock
+        return create_engine(target_url, connect_args={"timeout": 60})
+    return create_engine(target_url)
+
+
+def _sql_type(series, is_key):
+    if pd.api.types.is_bool_dtype(series):
+        return Boolean()
+    if pd.api.types.is_integer_dtype(series):
+        return Integer() if series.dtype.itemsize <= 4 else BigInteger()
+    if pd.api.types.is_float_dtype(series):
+        return Float()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return DateTime()
+    # Una clave de texto necesita largo fijo para poder ser primary key
+    return String(255) if is_key else String()
+
+
+def _build_table(metadata, name, df, key):
+    columns = [Column(c, _sql_type(df[c], c in key), primary_key=c in key)
+               for c in df.columns]
+    return Table(name, metadata, *columns)
+
+
+def check_columns(table, df):
+    """
+    Las columnas del lote tienen que ser las de la tabla existente: un
+    insert con columnas que la tabla no tiene las descarta sin error, y
+    las que faltan quedan en NULL.
+    """
+    extra = [c for c in df.columns if c not in table.c]
+    missing = [c.name for c in table.c if c.name not in df.columns]
+    if extra or missing:
+        raise ValueError(f"{table.name}: las columnas del curated no coinciden con la tabla "
+                         f"destino (nuevas: {extra}, faltan: {missing}); bórrala para que "
+                         f"se vuelva a crear")
+
+
+def ensure_table(engine, name, df, key):
+    """
+    Devuelve la Table destino; si no existe la creo con los tipos del
+    primer lote (y primary key en las columnas clave). Si existe, sus
+    columnas tienen que coincidir con las del lote (ver check_columns).
+    """
+    metadata = MetaData()
+    if inspect(engine).has_table(name):
+        table = Table(name, metadata, autoload_with=engine)
+        check_columns(table, df)
+        return table
+
+    table = _build_table(metadata, name, df, key)
+    metadata.create_all(engine)
+    logger.info(f"[DDL] Creada tabla destino {name} ({len(table.c)} columnas)")
+    return table
+
+
+def create_staging(engine, name, df, key):
+    """
+    Tabla de staging vacía con las columnas y tipos del curated que llega
+    (no los de la destino: si cambiaron las columnas, la destino nueva
+    las trae). Si quedó una de una corrida que falló, la borro antes.
+    """
+    staging = _build_table(MetaData(), name + STAGING_SUFFIX, df, key)
+    staging.drop(engine, checkfirst=True)
+    staging.create(engine)
+    return staging
+
+
+def _rename(conn, old, new):
+    if conn.dialect.name == "mssql":
+        conn.execute(text("EXEC sp_rename :old, :new"), {"old": old, "new": new})
+    else:
+        quote = conn.dialect.identifier_preparer.quote
+        conn.execute(text(f"ALTER TABLE {quote(old)} RENAME TO {quote(new)}"))
+
+
+def swap_tables(engine, staging, name):
+    """Staging pasa a ser la tabla name en una sola transacción (la vieja se borra)."""
+    old = name + OLD_SUFFIX
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        exists = inspect(conn).has_table(name)
+        if inspect(conn).has_table(old):
+            conn.execute(text(f"DROP TABLE {quote(old)}"))
+        if exists:
+            _rename(conn, name, old)
+        _rename(conn, staging.name, name)
+        if exists:
+            conn.execute(text(f"DROP TABLE {quote(old)}"))
+    logger.info(f"[DDL] {name} reemplazada ({len(staging.c)} columnas)")
+
+
+def _records(df):
+    # category/numpy → objetos de Python; NaN/NaT → None (NULL en SQL)
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict("records")
+
+
+# ============================================================
+# 4. Carga de una tabla
+# ============================================================
+def pick_source(source_dir, table, files=None):
+    """
+    Prefiero el Parquet (conserva tipos): archivo único o dataset
+    particionado (carpeta <tabla>_curated/). Si no está, el CSV.
+    """
+    names = [f"{table}_curated.parquet", f"{table}_curated", f"{table}_curated.csv"]
+    candidates = files or [os.path.join(source_dir, name) for name in names]
+    for name in names:
+        for path in candidates:
+            # Solo el dataset curated (no el perfil profile_<tabla>.csv)
+            if os.path.basename(path) == name and os.path.exists(path):
+                return path
+    return None
+
+
+def load_table(engine, table, source, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Inserta un archivo curated en la tabla destino, lote a lote.
+    Devuelve {"table", "ok", "rows", "batches", "seconds", "rows_per_sec"}.
+
+    - upsert: cada lote borra sus claves y las inserta en una transacción;
+      si algo falla a mitad, los lotes ya confirmados quedan
+    - replace: los lotes se confirman de a uno en una tabla de staging y
+      la destino se reemplaza por rename al final, en una transacción.
+      El precio: mientras dura la carga la base guarda dos copias de la
+      tabla, y las vistas/permisos definidos sobre la destino hay que
+      volver a crearlos (el rename deja la tabla nueva). A cambio no hay
+      una sola transacción gigante con todo el DELETE + INSERT en el log
+      y nadie ve la tabla vacía o a medias. La staging toma las columnas
+      del curated; un curated vacío deja la destino vacía
+    - upsert: si la destino ya existe con otras columnas → ValueError
+    """
+    spec = LOAD_TABLES[table]
+    key = spec["key"]
+    start = time.perf_counter()
+    result = {"table": table, "ok": False, "rows": 0, "batches": 0,
+              "seconds": 0.0, "rows_per_sec": 0.0}
+    logger.info(f"[START] Cargando {table} → {spec['target']} ({spec['mode']}) desde {source}")
+
+    replace = spec["mode"] == "replace"
+    target = staging = None
+    try:
+        for batch_num, df in enumerate(iter_raw_batches(source, batch_size=batch_size), start=1):
+            if batch_num == 1:
+                missing = [k for k in key if k not in df.columns]
+                if missing:
+                    raise ValueError(f"{table}: faltan columnas clave {missing}")
+                if replace:
+                    staging = create_staging(engine, spec["target"], df, key)
+                else:
+                    target = ensure_table(engine, spec["target"], df, key)
+            else:
+                # Parts de un dataset con otras columnas: mismo chequeo que la destino
+                check_columns(staging if replace else target, df)
+
+            if not replace:
+                # Si una clave viene repetida en el lote, gana la última
+                df = df.drop_duplicates(subset=key, keep="last")
+
+            records = _records(df)
+            # Una transacción por lote: o entra el lote completo o nada
+            with engine.begin() as conn:
+                if not replace:
+                    key_cols = [target.c[k] for k in key]
+                    values = df[key].astype(object).values.tolist()
+                    for i in range(0, len(values), DELETE_CHUNK):
+                        chunk = values[i:i + DELETE_CHUNK]
+                        if len(key) == 1:
+                            cond = key_cols[0].in_([v[0] for v in chunk])
+                        else:
+                            cond = tuple_(*key_cols).in_([tuple(v) for v in chunk])
+                        conn.execute(delete(target).where(cond))
+                conn.execute(insert(staging if replace else target), records)
+
+            result["rows"] += len(records)
+            result["batches"] = batch_num
+            logger.info(f"[BATCH] {table} lote {batch_num}: {len(records)} filas "
+                        f"(acumulado: {result['rows']})")
+
+        if replace:
+            if staging is None:
+                # Curated vacío: la destino igual se reemplaza (queda vacía),
+                # con las columnas del esquema del archivo
+                empty = empty_raw_frame(source)
+                if empty is None:
+                    raise ValueError(f"{table}: {source} no tiene archivos ni esquema; "
+                                     f"no reemplazo {spec['target']}")
+                staging = create_staging(engine, spec["target"], empty, key)
+            swap_tables(engine, staging, spec["target"])
+    except Exception:
+        # La destino sigue con los datos anteriores; la staging sobra
+        if staging is not None:
+            staging.drop(engine, checkfirst=True)
+        raise
+
+    seconds = time.perf_counter() - start
+    result.update(ok=True, seconds=round(seconds, 2),
+                  rows_per_sec=round(result["rows"] / seconds, 1) if seconds else 0.0)
+    logger.info(f"[OK] {table}: {result['rows']} filas en {result['seconds']}s "
+                f"({result['rows_per_sec']} filas/s)")
+    return result
+
+
+def load_fingerprint(engine, table, source, cache):
+    """
+    Huella de una carga: contenido del curated + destino (URL sin
+    contraseña) + cómo se carga la tabla + versión del código.
+    """
+    spec = LOAD_TABLES[table]
+    return fingerprint("sql", table, cache.file_hash(source), str(engine.url),
+                       spec["target"], spec["mode"], spec["key"], CODE_VERSION)
+
+
+# ============================================================
+# 5. Ejecución de la etapa completa
+# ============================================================
+def run_sql_load(target_url=None, tables=None, source_dir=CURATED_FOLDER,
+                 batch_size=DEFAULT_BATCH_SIZE, files=None, engine=None, cache=None):
+    """
+    Carga las tablas curated en la base destino.
+
+    - target_url: URL de SQLAlchemy (ignorado si se pasa engine)
+    - tables: tablas curated a cargar (default: todas las de LOAD_TABLES)
+    - files: rutas exactas de los archivos a cargar (ej: los outputs de
+      curate en esta corrida); si es None, se buscan en source_dir
+    - engine: Engine ya abierto (para compartirlo entre hilos)
+    - cache: StageCache; si el curated, el destino y el modo son los de
+      la última carga correcta (y la tabla destino sigue ahí), no se carga
+
+    Devuelve {"tables": [resultado por tabla], "ok": bool}.
+    """
+    own_engine = engine is None
+    engine = engine or open_engine(target_url)
+    results = []
+    try:
+        for table in tables or list(LOAD_TABLES):
+            source = pick_source(source_dir, table, files)
+            if source is None:
+                logger.warning(f"[SKIP] No hay archivo curated para {table}")
+                results.append({"table": table, "ok": True, "rows": 0, "skipped": True})
+                continue
+            fp = load_fingerprint(engine, table, source, cache) if cache is not None else None
+            if fp is not None:
+                meta = cache.lookup("sql", table, fp, [])
+                if meta is not None and inspect(engine).has_table(LOAD_TABLES[table]["target"]):
+                    logger.info(f"[CACHE] {table} ya está cargada en el destino con este "
+                                f"contenido. No la cargo.")
+                    results.append({"table": table, "ok": True, "rows": meta.get("rows", 0),
+                                    "cached": True})
+                    continue
+                # Si la carga se corta a mitad, la destino ya no es la registrada
+                cache.invalidate("sql", table)
+            try:
+                result = load_table(engine, table, source, batch_size=batch_size)
+            except Exception:
+                logger.error(f"[ERROR] Falló la carga de {table}", exc_info=True)
+                results.append({"table": table, "ok": False, "rows": 0})
+                continue
+            if fp is not None:
+                cache.store("sql", table, fp, [], meta={"rows": result["rows"]}, keep_copy=False)
+            results.append(result)
+    finally:
+        if own_engine:
+            engine.dispose()
+
+    failed = [r["table"] for r in results if not r["ok"]]
+    if failed:
+        logger.error(f"[END] Carga SQL con errores en: {', '.join(failed)}")
+    else:
+        logger.info("[END] Carga SQL completada correctamente.")
+    return {"tables": results, "ok": not failed}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        summary = run_sql_load(**vars(args))
+    except Exception:
+        logger.error("Error en la fase de carga", exc_info=True)
+        return 1
+    return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+
+# ------------------------------------------------------------
+# NOTAS:
+#
+# 1. Antes la carga era una simulación (copiar archivos a data/load).
+#    Ahora los datos llegan a una base SQL real, lista para que Power BI
+#    o Fabric se conecten por DirectQuery / import.
+# 2. Se lee el Parquet curated y no el CSV: los tipos (enteros, fechas,
+#    montos) llegan intactos y no hay que volver a parsear texto.
+# 3. El upsert es "DELETE de las claves del lote + INSERT" en la misma
+#    transacción: funciona igual en SQLite y en SQL Server sin MERGE.
+# 4. Cada lote se confirma por separado: un lote grande de más puede
+#    llenar el log de transacciones; uno chico de más agrega viajes.
+#    "--batch-size" + el reporte de filas/s sirven para encontrar el punto.
+# 5. Para probar sin Azure: --target-url sqlite:///data/load/spaceparts.db
+# 6. El replace antes hacía DELETE (confirmado) y después los INSERT por
+#    lote: durante la carga la tabla estaba vacía o a medias, y si fallaba
+#    quedaba así. Con staging + rename la destino cambia de una sola vez.
+#    Alternativa descartada: DELETE + todos los INSERT en una transacción
+#    (bloquea la tabla toda la carga y llena el log con la tabla entera).
+# 7. Si el curated cambia de columnas (ej: "--surrogate-keys"), el insert
+#    de SQLAlchemy descartaba las nuevas sin avisar. En replace la staging
+#    se arma con las columnas del curated y la destino cambia con ellas;
+#    en upsert no puedo rehacer la tabla sin perder filas → error claro.
+# 8. Con caché (main_etl.py) una corrida sin cambios no vuelve a cargar:
+#    la huella es el contenido del curated + destino + modo + código. Si
+#    alguien borra la tabla destino a mano, se carga igual.
+# ------------------------------------------------------------
@@ -28,50 +28,101 @@
 #     un volumen masivo (ej: fact.Invoices).
 #   • En producción, se corre el script sin "--limit" y se bajan
 #     todas las filas de las tablas de interés.
+#
+# [EXTRACCIÓN EN STREAMING]
+#   • Por defecto descargo cada tabla por lotes ("--batch-size", fetchmany)
+#     y agrego cada lote al CSV apenas llega. La memoria queda acotada
+#     por el tamaño del lote y no por el tamaño de la tabla.
+#   • Con "--batch-size 0" vuelvo al modo clásico (pd.read_sql completo).
+#
+# [EXTRACCIÓN CONCURRENTE]
+#   • Con "--workers N" extraigo hasta N tablas en paralelo, cada una
+#     con su propia conexión tomada de un pool acotado (utils/db.py).
+#   • Cada tabla se mide por separado y si una falla las demás siguen.
+#
+# [EXTRACCIÓN PARTICIONADA]
+#   • Con "--partition fact.Invoices:invoice_date:8" divido la tabla en
+#     8 rangos de la clave y bajo cada rango en paralelo a su propio
+#     archivo (data/raw/fact_Invoices/part-XXXXX.<formato> + _manifest.json).
+#   • Un rango que falla se reintenta solo ("--retries"), sin volver
+#     a bajar toda la tabla.
+#
+# [EXTRACCIÓN INCREMENTAL]
+#   • fact.Invoices solo crece por fecha. Guardo por tabla la marca de
+#     agua (máximo invoice_date ya bajado) en data/state/watermarks.json
+#     y en cada corrida solo pido las filas posteriores, que se agregan
+#     al RAW existente.
+#   • "--full-refresh" ignora la marca y vuelve a bajar todo.
+#   • invoice_date es por día: junto a la marca guardo cuántas filas
+#     tenían ese día. Si la fuente tiene otra cantidad (llegaron
+#     facturas tarde con la misma fecha), pido "clave >= marca" y
+#     reemplazo en RAW las filas de ese día.
+#
+# [FORMATO RAW]
+#   • "--format parquet|arrow" guarda el RAW en formato columnar
+#     (con "--compression" a elección) en vez de CSV. Se conservan
+#     los tipos SQL y etl_curated.py no tiene que volver a parsear texto.
+#
+# [VALIDACIONES EN EL SERVIDOR]
+#   • Los chequeos de sql/exploration.sql (nulos en CustomerID, rango de
+#     invoice_date, negativos en Net_Invoice_Value, conteos) ahora son una
+#     suite declarativa (utils/validation.py): corren como agregados en el
+#     servidor antes y después de extraer, y se comparan con lo que llegó.
+#   • "--validate strict" marca la tabla como fallida si no cuadra.
+#
+# [PLAN DESDE EL CATÁLOGO]
+#   • Antes de extraer leo el catálogo de la fuente (utils/catalog.py):
+#     columnas, tipos, clave primaria, filas aproximadas y MIN/MAX de
+#     las columnas candidatas a partición. Queda en caché en
+#     data/state/catalog.json ("--catalog-ttl" horas), así una corrida
+#     normal no hace ninguna consulta de catálogo.
+#   • Con eso cada tabla se extrae según su tamaño: las chicas en un
+#     solo fetch, las medianas en streaming y las grandes en rangos
+#     en paralelo, sin tener que pasar "--partition" a mano (si se
+#     pasa, manda lo pedido). También se dejan afuera columnas binarias
+#     y el RAW columnar toma los tipos del catálogo si el driver no los da.
+#   • "--plan off" vuelve a extraer todo como antes; "--refresh-catalog"
+#     ignora la caché.
+#
+# [USO COMO MÓDULO]
+#   • Todo el trabajo vive en run_extract(); la CLI solo arma los
+#     argumentos y llama a main(). Así main_etl.py lo importa y lo corre
+#     en el mismo proceso (sin pagar un intérprete nuevo por etapa).
 # ------------------------------------------------------------
 
 import os
+import time
 import argparse
-import pyodbc 
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd 
 from dotenv import load_dotenv 
-from utils.logger import get_logger
+from utils.logger import get_logger, log_context
+from utils.extract import (stream_query_to_file, extract_partitioned,
+                           append_query_to_csv, append_query_to_parts,
+                           promote_to_parts, count_key_value, DEFAULT_BATCH_SIZE)
+from utils.raw_io import (RawBatchWriter, RAW_FORMATS, find_raw, clear_raw,
+                          raw_file_path)
+from utils.watermark import WatermarkStore, MaxTracker, DEFAULT_STATE_FILE
+from utils.catalog import (load_catalog, find_table, plan_table, describe_plan,
+                           DEFAULT_CATALOG_FILE, DEFAULT_TTL_HOURS, SINGLE_FETCH_ROWS)
+from utils.db import build_conn_str, ConnectionPool
+from utils.metrics import path_bytes
+from utils.validation import (VALIDATION_SUITE, VALIDATION_MODES, LocalAggregates,
+                              run_server_checks, compare, save_report)
 
 # ============================================================
 # 1. Configuración inicial
 # ============================================================
 load_dotenv()
-driver = os.getenv("ODBC_DRIVER")
-server = os.getenv("AZURE_SQL_SERVER")
-user = os.getenv("AZURE_SQL_USER")
-password = os.getenv("AZURE_SQL_PASSWORD")
 database = os.getenv("AZURE_SQL_DB")
 
 logger = get_logger("ETL-SpaceParts")
 
-# Parser para argumento "--limit"
-parser = argparse.ArgumentParser(description="ETL Extract - SpacePartsCoDW")
-parser.add_argument("--limit", type=int, default=None,
-                    help="Número máximo de filas a descargar por tabla. "
-                         "Opcional. Útil en pruebas. "
-                         "Si se omite: se descargan todas las filas.")
-args = parser.parse_args()
-row_limit = args.limit
+# Carpeta destino RAW
+RAW_FOLDER = os.path.join("data", "raw")
 
-# ============================================================
-# 2. Construir cadena de conexión
-# ============================================================
-conn_str = (
-    f"DRIVER={{{driver}}};"
-    f"SERVER={server};"
-    f"UID={user};PWD={password};"
-    f"DATABASE={database};"
-    f"Encrypt=yes;TrustServerCertificate=yes"
-)
-
-# ============================================================
-# 3. Tablas de interés (definitivas)
-# ============================================================
+# Tablas de interés (definitivas)
 # Usamos estas 3 por lo siguiente:
 # - dim.Customers → dimensión de clientes (quién compra).
 # - dim.Products  → dimensión de productos (qué vendo).
@@ -80,50 +131,451 @@ conn_str = (
 # Estas tres tablas (2 dimensiones + 1 hecho) forman un mini Esquema Estrella típico
 # que permite modelar indicadores de ventas y análisis de clientes/productos
 # en herramientas como Power BI.
-tables = ["dim.Customers", "dim.Products", "fact.Invoices"]
+TABLES = ["dim.Customers", "dim.Products", "fact.Invoices"]
+
+# Tablas que solo crecen → se extraen de forma incremental por esta clave
+INCREMENTAL_TABLES = {"fact.Invoices": "invoice_date"}
+
+PLAN_MODES = ("auto", "off")
+
 
 # ============================================================
-# 4. Defino carpeta destino RAW
+# 2. Parser de argumentos
 # ============================================================
-raw_folder = "data/raw"
-os.makedirs(raw_folder, exist_ok=True)
+def build_parser():
+    parser = argparse.ArgumentParser(description="ETL Extract - SpacePartsCoDW")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Número máximo de filas a descargar por tabla. "
+                             "Opcional. Útil en pruebas. "
+                             "Si se omite: se descargan todas las filas.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Filas por lote en la extracción en streaming "
+                             f"(default: {DEFAULT_BATCH_SIZE}). "
+                             "Con 0 se descarga la tabla completa en memoria (pd.read_sql).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Tablas a extraer en paralelo (y tamaño del pool de conexiones). "
+                             "Default: 1 (secuencial).")
+    parser.add_argument("--partition", action="append", default=[], metavar="TABLA:CLAVE:N",
+                        help="Extrae TABLA en N rangos de CLAVE en paralelo "
+                             "(ej: fact.Invoices:invoice_date:8). Se puede repetir.")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Reintentos por rango en la extracción particionada (default: 2).")
+    parser.add_argument("--incremental", action="append", default=[], metavar="TABLA:CLAVE",
+                        help="Extrae TABLA de forma incremental usando CLAVE como marca de agua "
+                             "(se suma a los defaults: fact.Invoices:invoice_date).")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Ignora las marcas de agua y vuelve a bajar todas las tablas completas.")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE,
+                        help=f"Archivo de estado de las marcas de agua (default: {DEFAULT_STATE_FILE}).")
+    parser.add_argument("--format", choices=RAW_FORMATS, default="csv",
+                        help="Formato de los archivos RAW (default: csv).")
+    parser.add_argument("--validate", choices=VALIDATION_MODES, default="warn",
+                        help="Chequeos agregados en el servidor antes/después de extraer, comparados "
+                             "con lo que llegó (warn: solo avisa; strict: la tabla cuenta como fallida).")
+    parser.add_argument("--compression", default=None,
+                        help="Códec de compresión para parquet (snappy, zstd, gzip, none) "
+                             "o arrow (lz4, zstd, none). Default: snappy en parquet, sin compresión en arrow.")
+    parser.add_argument("--plan", choices=PLAN_MODES, default="auto",
+                        help="auto: decide por tabla (un fetch, streaming o rangos) según el "
+                             "catálogo de la fuente; off: todas igual, como antes (default: auto).")
+    parser.add_argument("--catalog-file", default=DEFAULT_CATALOG_FILE,
+                        help=f"Caché del catálogo de la fuente (default: {DEFAULT_CATALOG_FILE}).")
+    parser.add_argument("--catalog-ttl", type=float, default=DEFAULT_TTL_HOURS,
+                        help=f"Horas que vale la caché del catálogo (default: {DEFAULT_TTL_HOURS}).")
+    parser.add_argument("--refresh-catalog", action="store_true",
+                        help="Vuelve a leer el catálogo de la fuente aunque la caché esté vigente.")
+    return parser
+
 
 # ============================================================
-# 5. Ejecuto extracción
+# 3. Conexión y opciones de la corrida
 # ============================================================
-try:
-    cnxn = pyodbc.connect(conn_str, timeout=10)
+def open_connection():
+    # Importo pyodbc aquí: así el módulo se puede importar (y probar con
+    # sqlite3 vía "connect") en equipos sin el driver ODBC instalado
+    import pyodbc
+    cnxn = pyodbc.connect(build_conn_str(), timeout=10)
     logger.info(f"Conexión establecida con la base: {database}")
+    return cnxn
+
+
+def build_context(options):
+    """
+    Arma las opciones de la corrida: parte de los defaults del parser
+    y aplica lo recibido (mismos nombres que los flags, con "_").
+    """
+    ctx = build_parser().parse_args([])
+    for name, value in options.items():
+        if not hasattr(ctx, name):
+            raise TypeError(f"Opción de extracción desconocida: {name}")
+        setattr(ctx, name, value)
+    ctx.workers = max(1, ctx.workers)
+
+    # "fact.Invoices:invoice_date:8" → {"fact.Invoices": ("invoice_date", 8)}
+    ctx.partition_specs = {}
+    for spec in ctx.partition:
+        p_table, p_key, p_parts = spec.rsplit(":", 2)
+        ctx.partition_specs[p_table] = (p_key, int(p_parts))
+
+    ctx.incremental_tables = dict(INCREMENTAL_TABLES)
+    for spec in ctx.incremental:
+        i_table, i_key = spec.rsplit(":", 1)
+        ctx.incremental_tables[i_table] = i_key
+
+    ctx.watermarks = WatermarkStore(ctx.state_file)
+    ctx.plans = {}
+    return ctx
+
+
+def plan_tables(ctx, pool, tables, source=None):
+    """
+    Arma el plan de cada tabla desde el catálogo (en caché o leído de
+    la fuente) y agrega a ctx.partition_specs las tablas grandes que
+    no se pidieron particionar a mano. Si el catálogo no se puede leer,
+    aviso y todo se extrae como antes.
+    """
+    if ctx.plan == "off":
+        return
+    hints = {t: [k] for t, k in ctx.incremental_tables.items()}
+    for t, (k, _) in ctx.partition_specs.items():
+        hints.setdefault(t, []).insert(0, k)
+    try:
+        catalog = load_catalog(pool.connection, tables, path=ctx.catalog_file,
+                               ttl_hours=ctx.catalog_ttl, refresh=ctx.refresh_catalog,
+                               source=source, hints=hints, logger=logger)
+    except Exception as e:
+        logger.warning(f"[PLAN] No pude leer el catálogo de la fuente, extraigo sin plan: {repr(e)}")
+        return
 
     for table in tables:
-        try:
-            logger.info(f"[START] Extrayendo tabla: {table} " +
-                        (f"(limit={row_limit})" if row_limit else "(sin límite)"))
+        entry = find_table(catalog, table)
+        if entry is None:
+            logger.warning(f"[PLAN] {table} no está en el catálogo de la fuente")
+            continue
+        plan = plan_table(entry, catalog["dialect"], hints.get(table, ()))
+        if plan["partition"] and not ctx.limit:
+            ctx.partition_specs.setdefault(table, plan["partition"])
+        ctx.plans[table] = plan
+        logger.info(f"[PLAN] {describe_plan(table, plan)}")
+
+
+# ============================================================
+# 4. Extracción de una tabla
+# ============================================================
+def extract_table(ctx, cnxn, table, on_batch=None):
+    """
+    Extrae una tabla completa (o TOP N) a data/raw.
+    Devuelve la cantidad de filas escritas.
+    """
+    logger.info(f"[START] Extrayendo tabla: {table} " +
+                (f"(limit={ctx.limit})" if ctx.limit else "(sin límite)") +
+                (f" en lotes de {ctx.batch_size}" if ctx.batch_size else ""))
+
+    # Columnas y tipos según el plan (sin plan: todas, tipos del driver)
+    plan = ctx.plans.get(table, {})
+    select = plan.get("select", "*")
+    batch_size = ctx.batch_size
+    if plan.get("mode") == "single" and batch_size:
+        # Tabla chica: un solo fetchmany trae todo
+        batch_size = max(batch_size, SINGLE_FETCH_ROWS)
+
+    # Si hay límite, agregar TOP N a la consulta
+    query = f"SELECT {select} FROM {table}"
+    if ctx.limit:
+        query = f"SELECT TOP {ctx.limit} {select} FROM {table}"
+
+    # Reemplazo "." en el nombre para generar el archivo
+    base_name = table.replace(".", "_")
+    file_path = raw_file_path(ctx.raw_folder, base_name, ctx.format)
+
+    if batch_size:
+        # Streaming: cada lote se agrega al archivo apenas llega
+        n_rows = stream_query_to_file(cnxn, query, file_path,
+                                      batch_size=batch_size, logger=logger,
+                                      on_batch=on_batch, fmt=ctx.format,
+                                      compression=ctx.compression,
+                                      schema=plan.get("schema"))
+    else:
+        # Modo clásico: cargar toda la tabla desde Azure SQL
+        df = pd.read_sql(query, cnxn)
+        with RawBatchWriter(file_path, ctx.format, ctx.compression,
+                            columns=list(df.columns)) as writer:
+            writer.write(df)
+        n_rows = len(df)
+        if on_batch:
+            on_batch(df)
+
+    # Si antes se extrajo particionada o en otro formato, borro esas
+    # versiones para que etl_curated.py no lea una vieja
+    clear_raw(ctx.raw_folder, base_name, keep=file_path)
+
+    logger.info(f"[OK] Guardado {file_path} (filas: {n_rows})")
+    return n_rows
+
+
+def extract_table_partitioned(ctx, pool, table, on_batch=None):
+    """
+    Extrae una tabla en rangos de clave, cada rango en paralelo
+    con su propia conexión del pool.
+    """
+    key, n_parts = ctx.partition_specs[table]
+    plan = ctx.plans.get(table, {})
+    logger.info(f"[START] Extrayendo tabla: {table} en {n_parts} rangos de {key}")
+
+    base_name = table.replace(".", "_")
+    parts_dir = os.path.join(ctx.raw_folder, base_name)
+    # Los rangos siempre se bajan en streaming
+    n_rows = extract_partitioned(pool, table, key, n_parts, parts_dir,
+                                 batch_size=ctx.batch_size or DEFAULT_BATCH_SIZE,
+                                 workers=ctx.workers,
+                                 retries=ctx.retries, logger=logger,
+                                 on_batch=on_batch, fmt=ctx.format,
+                                 compression=ctx.compression,
+                                 select=plan.get("select", "*"), schema=plan.get("schema"))
 
-            # Si hay límite, agregar TOP N a la consulta
-            query = f"SELECT * FROM {table}"
-            if row_limit:
-                query = f"SELECT TOP {row_limit} * FROM {table}"
+    # El archivo único de una corrida anterior ya no aplica
+    clear_raw(ctx.raw_folder, base_name, keep=parts_dir)
 
-            # Cargar data desde Azure SQL
-            df = pd.read_sql(query, cnxn)
+    logger.info(f"[OK] Guardado {parts_dir} (filas: {n_rows})")
+    return n_rows
 
-            # Reemplazo "." en el nombre para generar el archivo
-            file_name = table.replace(".", "_") + ".csv"
-            file_path = os.path.join(raw_folder, file_name)
 
-            # Exportar a CSV
-            df.to_csv(file_path, index=False)
-            logger.info(f"[OK] Guardado {file_path} (filas: {len(df)})")
+def extract_table_incremental(ctx, cnxn, table, key, watermark, on_batch=None, overlap=False):
+    """
+    Baja solo las filas con clave > marca de agua y las agrega
+    al RAW existente (al final del CSV, o como part nuevo).
 
-        except Exception as e_table:
-            logger.error(f"[ERROR] No se pudo extraer {table}", exc_info=True)
+    - overlap: si True pide clave >= marca y las filas de RAW con
+      clave == marca se reemplazan por las que llegan (filas tardías)
+    """
+    op = ">=" if overlap else ">"
+    logger.info(f"[START] Extrayendo tabla: {table} (incremental: {key} {op} {watermark})")
 
-    cnxn.close()
-    logger.info("Extracción completada con éxito para todas las tablas solicitadas")
+    base_name = table.replace(".", "_")
+    # Mismas columnas que la extracción completa (el delta va al mismo RAW)
+    select = ctx.plans.get(table, {}).get("select", "*")
+    query = f"SELECT {select} FROM {table} WHERE {key} {op} ?"
+    target = find_raw(ctx.raw_folder, base_name)
+    replace = (key, watermark) if overlap else None
 
-except Exception as e:
-    logger.error("Error en el proceso ETL de extracción", exc_info=True)
+    if target.endswith(".csv"):
+        n_rows = append_query_to_csv(cnxn, query, target,
+                                     batch_size=ctx.batch_size or DEFAULT_BATCH_SIZE,
+                                     params=(watermark,), logger=logger,
+                                     on_batch=on_batch, replace=replace)
+    else:
+        # Parquet/Arrow no admiten append → el RAW pasa a ser un dataset
+        # de parts y el delta entra como part nuevo
+        if not os.path.isdir(target):
+            target = promote_to_parts(target, os.path.join(ctx.raw_folder, base_name), table, key)
+        n_rows = append_query_to_parts(cnxn, query, target,
+                                       batch_size=ctx.batch_size or DEFAULT_BATCH_SIZE,
+                                       params=(watermark,), logger=logger,
+                                       on_batch=on_batch, compression=ctx.compression,
+                                       replace=replace)
+
+    logger.info(f"[OK] Agregadas {n_rows} filas nuevas a {target}")
+    return n_rows
+
+
+def server_checks(pool, table, checks, where=None, params=()):
+    """
+    Corre los agregados de validación en el servidor. Si la consulta
+    falla (ej: una columna que no existe en esta base), aviso y sigo:
+    la validación no debe tumbar la extracción.
+    """
+    try:
+        with pool.connection() as cnxn:
+            return run_server_checks(cnxn, table, checks, where, params)
+    except Exception as e:
+        logger.warning(f"[VALIDATION] No pude validar {table} en el servidor: {repr(e)}")
+        return None
+
+
+def log_validation(report, path):
+    table = report["table"]
+    for check in report["checks"]:
+        line = (f"[VALIDATION] {table}.{check['name']}: servidor={check['server_after']} "
+                f"local={check['local']} → {check['status']}")
+        (logger.info if check["status"] == "ok" else logger.error)(line)
+    if report["drift"]:
+        logger.warning(f"[VALIDATION] {table}: la fuente cambió durante la extracción")
+    for warning in report["quality_warnings"]:
+        logger.warning(f"[CALIDAD] {table}: {warning}")
+    logger.info(f"[VALIDATION] Reporte: {path}")
+
+
+def extract_with_pool(ctx, pool, table):
+    """
+    Envoltura para el thread pool: toma una conexión del pool,
+    mide el tiempo y aísla errores (una tabla caída no tumba a las demás).
+    """
+    start = time.perf_counter()
+    try:
+        # Marca de agua: solo para tablas incrementales y corridas completas
+        key = ctx.incremental_tables.get(table)
+        tracker = MaxTracker(key) if key and not ctx.limit else None
+        watermark = None
+        if tracker and not ctx.full_refresh and find_raw(ctx.raw_folder, table.replace(".", "_")):
+            watermark = ctx.watermarks.get(table, key)
+
+        # Si se pidió, guardo los lotes para pasarlos en memoria a curated
+        # (solo en extracción completa: un delta no es la tabla entera)
+        collected = [] if ctx.keep_frames and watermark is None else None
+
+        # Filas tardías: si la fuente tiene otra cantidad de filas con
+        # clave == marca que las ya bajadas, vuelvo a bajar ese valor entero
+        overlap = False
+        if watermark is not None:
+            with pool.connection() as cnxn:
+                at_mark = count_key_value(cnxn, table, key, watermark)
+            overlap = at_mark != ctx.watermarks.get_count(table, key)
+            if overlap:
+                logger.info(f"[WATERMARK] {table}: {at_mark} filas con {key} = {watermark} en la "
+                            f"fuente (ya bajadas: {ctx.watermarks.get_count(table, key)}) "
+                            f"→ se vuelven a bajar")
+
+        # Validaciones: agregados en el servidor (mismo filtro que la extracción)
+        # y los mismos agregados sobre los lotes que llegan
+        checks = VALIDATION_SUITE.get(table) if ctx.validate != "off" and not ctx.limit else None
+        where, params = (f"{key} {'>=' if overlap else '>'} ?", (watermark,)) \
+            if watermark is not None else (None, ())
+        before = server_checks(pool, table, checks, where, params) if checks else None
+        local = LocalAggregates(checks) if before is not None else None
+
+        def on_batch(df):
+            if tracker:
+                tracker(df)
+            if collected is not None:
+                collected.append(df)
+            if local:
+                local(df)
+
+        # Bytes escritos en RAW: el delta si es incremental, el archivo entero si no
+        raw_before = path_bytes([find_raw(ctx.raw_folder, table.replace(".", "_")) or ""]) \
+            if watermark is not None else 0
+
+        if watermark is not None:
+            with pool.connection() as cnxn:
+                n_rows = extract_table_incremental(ctx, cnxn, table, key, watermark,
+                                                   on_batch=on_batch, overlap=overlap)
+        # Con --limit no particiono: TOP N ya es una consulta chica
+        elif table in ctx.partition_specs and not ctx.limit:
+            # Aquí no tomo conexión: cada rango pide la suya al pool
+            n_rows = extract_table_partitioned(ctx, pool, table, on_batch=on_batch)
+        else:
+            with pool.connection() as cnxn:
+                n_rows = extract_table(ctx, cnxn, table, on_batch=on_batch)
+
+        raw_bytes = max(0, path_bytes([find_raw(ctx.raw_folder, table.replace(".", "_")) or ""])
+                        - raw_before)
+
+        report = None
+        if local:
+            after = server_checks(pool, table, checks, where, params)
+            if after is not None:
+                report = compare(table, checks, before, after, local.values)
+                log_validation(report, save_report(report))
+                if not report["ok"] and ctx.validate == "strict":
+                    # No muevo la marca de agua: la próxima corrida reintenta
+                    return {"table": table, "ok": False, "rows": n_rows, "validation": report,
+                            "seconds": round(time.perf_counter() - start, 2)}
+
+        if tracker and tracker.value is not None:
+            ctx.watermarks.set(table, key, tracker.value, tracker.count)
+            logger.info(f"[WATERMARK] {table}.{key} = {tracker.value} ({tracker.count} filas)")
+        elif overlap:
+            # El día de la marca ya no tiene filas en la fuente (se borraron)
+            ctx.watermarks.set(table, key, watermark, 0)
+        elif key and ctx.limit:
+            # Un RAW parcial (TOP N) no sirve como base para el incremental
+            ctx.watermarks.clear(table)
+        return {"table": table, "ok": True, "rows": n_rows, "validation": report,
+                "bytes": raw_bytes, "seconds": round(time.perf_counter() - start, 2),
+                "df": pd.concat(collected, ignore_index=True) if collected else None}
+    except Exception:
+        logger.error(f"[ERROR] No se pudo extraer {table}", exc_info=True)
+        return {"table": table, "ok": False, "rows": 0,
+                "seconds": round(time.perf_counter() - start, 2)}
+
+
+# ============================================================
+# 5. Ejecuto extracción
+# ============================================================
+def run_extract(tables=None, connect=None, raw_folder=RAW_FOLDER, keep_frames=False,
+                watermarks=None, **options):
+    """
+    Ejecuta la fase Extract completa y devuelve un resumen.
+
+    - tables: tablas a extraer (default: TABLES)
+    - connect: función que abre una conexión DB-API (default: pyodbc con .env;
+      en pruebas se puede pasar lambda: sqlite3.connect(...))
+    - raw_folder: carpeta destino RAW
+    - keep_frames: si True, devuelve también los DataFrames extraídos para
+      pasarlos en memoria a la siguiente etapa (ojo: ocupa RAM)
+    - watermarks: WatermarkStore compartido (si varias llamadas corren en
+      paralelo, todas deben usar el mismo para no pisarse el JSON)
+    - options: mismas opciones que la CLI (limit, batch_size, workers,
+      partition, incremental, full_refresh, format, compression, plan,
+      catalog_file, catalog_ttl, refresh_catalog, ...)
+
+    Devuelve {"tables": [resultado por tabla], "frames": {tabla_raw: df},
+              "seconds": total, "ok": bool}.
+    """
+    ctx = build_context(options)
+    ctx.raw_folder = raw_folder
+    ctx.keep_frames = keep_frames
+    if watermarks is not None:
+        ctx.watermarks = watermarks
+    tables = tables or TABLES
+    os.makedirs(raw_folder, exist_ok=True)
+
+    start_all = time.perf_counter()
+    logger.info(f"Extrayendo {len(tables)} tablas con {ctx.workers} worker(s)")
+
+    def extract_one(table):
+        # Cada hilo del pool arranca sin contexto de log: le pongo tabla y etapa
+        with log_context(stage="extract", table=table.replace(".", "_")):
+            return extract_with_pool(ctx, pool, table)
+
+    with ConnectionPool(connect or open_connection, size=ctx.workers) as pool:
+        # Con la conexión por default la fuente es la del .env; con otra
+        # (pruebas, benchmark) no comparo la fuente guardada en la caché
+        source = f"{os.getenv('AZURE_SQL_SERVER')}/{database}" if connect is None else None
+        plan_tables(ctx, pool, tables, source=source)
+        with ThreadPoolExecutor(max_workers=ctx.workers) as executor:
+            results = list(executor.map(extract_one, tables))
+
+    # Resumen por tabla (tiempos individuales vs. total)
+    for r in results:
+        status = "OK" if r["ok"] else "FALLÓ"
+        logger.info(f"[TIMING] {r['table']}: {status} - {r['rows']} filas en {r['seconds']}s")
+    total_seconds = round(time.perf_counter() - start_all, 2)
+
+    failed = [r["table"] for r in results if not r["ok"]]
+    if failed:
+        logger.error(f"Extracción terminada en {total_seconds}s con errores en: {', '.join(failed)}")
+    else:
+        logger.info(f"Extracción completada con éxito para todas las tablas solicitadas "
+                    f"({total_seconds}s)")
+
+    frames = {r["table"].replace(".", "_"): r.pop("df", None) for r in results}
+    return {"tables": results, "seconds": total_seconds, "ok": not failed,
+            "frames": {k: v for k, v in frames.items() if v is not None}}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        summary = run_extract(**vars(args))
+    except Exception:
+        logger.error("Error en el proceso ETL de extracción", exc_info=True)
+        return 1
+    return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
 
 # ------------------------------------------------------------
 # NOTAS:
@@ -169,4 +621,53 @@ except Exception as e:
 #
 # 7. Importante: el "--limit" no altera la base de datos original.
 #    Solo añade un TOP en la consulta SQL → es 100% no intrusivo.
+#
+# 8. Extracción en streaming ("--batch-size"):
+#    - pd.read_sql traía toda fact.Invoices a un solo DataFrame antes
+#      de escribir la primera fila.
+#    - Ahora leo con fetchmany y escribo cada lote de inmediato
+#      (utils/extract.py). El CSV final es el mismo, pero la memoria
+#      ya no crece con el tamaño de la tabla.
+#
+# 9. Extracción concurrente ("--workers"):
+#    - Casi todo el tiempo se va esperando a la red, no en CPU.
+#    - Con varias conexiones en paralelo el tiempo total se acerca al de
+#      la tabla más lenta en vez de la suma de las tres.
+#    - Cada conexión se usa en un solo hilo a la vez (pyodbc no es
+#      thread-safe a nivel conexión), por eso el pool.
+#
+# 10. Extracción particionada ("--partition"):
+#    - fact.Invoices sigue dominando aunque las tablas vayan en paralelo.
+#    - Partirla en rangos de invoice_date (o de un id numérico) permite
+#      bajar varios rangos a la vez; el throughput crece con "--workers".
+#    - El _manifest.json lista los parts válidos; etl_curated.py los lee
+#      como un solo dataset.
+#
+# 11. Extracción incremental (marca de agua):
+#    - La primera corrida (o con "--full-refresh") baja todo y guarda el
+#      máximo de invoice_date visto en los lotes.
+#    - Las siguientes piden "WHERE invoice_date > marca" y agregan el
+#      delta al CSV (o como un part nuevo si la tabla está particionada).
+#    - La marca se actualiza recién después de escribir el delta.
+#    - Una corrida con "--limit" borra la marca: el RAW quedó parcial y
+#      la próxima corrida completa debe bajar todo de nuevo.
+#    - Con "> marca" solo, una factura que llega tarde con la fecha de la
+#      marca no se bajaba nunca (y la validación, con el mismo filtro, no
+#      lo veía). Ahora cada corrida cuenta en la fuente las filas de ese
+#      día (una consulta con el índice de la fecha) y, si no coincide con
+#      lo guardado, reemplaza el día completo. Solo se reescriben los
+#      archivos RAW que tienen filas de ese día.
+#
+# 12. Plan desde el catálogo ("--plan auto"):
+#    - El catálogo se lee de la base una vez por día (o con
+#      "--refresh-catalog") y las corridas siguientes lo toman de
+#      data/state/catalog.json sin preguntarle nada a la fuente.
+#    - Las filas son aproximadas (metadatos de sys.partitions): alcanzan
+#      para decidir chica / mediana / grande, no para validar. Los
+#      conteos exactos siguen siendo los de utils/validation.py.
+#    - Los MIN/MAX del catálogo solo deciden cuántos rangos tiene sentido
+#      pedir; los límites de cada rango se leen en vivo al extraer.
+#    - Se prueba contra SQLite (ej: la fuente de utils/synthetic.py vía
+#      run_extract(connect=...)): el catálogo usa PRAGMA table_info y
+#      MAX(rowid) en lugar de INFORMATION_SCHEMA.
 # ------------------------------------------------------------
\ No newline at end of file
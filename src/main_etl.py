@@ -7,7 +7,7 @@
 #
 #     1. Extracción desde Azure SQL → data/raw (etl_spaceparts.py)
 #     2. Transformación/Limpieza → data/curated (etl_curated.py)
-#     3. Simulación de carga (LOAD) → data/load (copia los resultados finales)
+#     3. Carga (LOAD) → data/load (publica los resultados finales)
 #
 #   Así no tengo que ejecutar varios comandos, sino un solo "pipeline".
 #
@@ -19,6 +19,57 @@
 # Ejemplo de ejecución:
 #   python src/main_etl.py --limit 1000
 #   python src/main_etl.py
+#   python src/main_etl.py --in-memory      (extract → curated sin releer RAW)
+#   python src/main_etl.py --subprocess     (modo anterior: un proceso por etapa)
+#
+# [EN UN SOLO PROCESO]
+#   • Antes cada etapa se lanzaba con subprocess: cada una pagaba el
+#     arranque del intérprete + imports de pandas/pyarrow, los datos solo
+#     pasaban por disco y el log del hijo se veía recién al terminar.
+#   • Ahora importo run_extract() y run_curated() y los llamo aquí mismo;
+#     el log sale en vivo y con "--in-memory" los DataFrames extraídos
+#     pasan directo a la limpieza.
+#
+# [POR TABLA, NO POR ETAPA]
+#   • Antes era una barrera: todas las tablas terminaban extract antes
+#     de que alguna empezara curated. Ahora cada tabla es una cadena
+#     extract → curate → load dentro de un grafo (utils/dag.py) que
+#     corre con "--workers" tareas a la vez.
+#   • Si extract de una tabla falla, su curate y su load no se ejecutan;
+#     las demás tablas siguen su camino.
+#   • Caché por contenido (utils/cache.py, manifiesto en data/cache): si
+#     el RAW de una tabla no cambió, su curate y su load (y la carga SQL
+#     con "--sql-target", si el destino es el mismo) se saltan.
+#   • curate de fact_Invoices espera a los curate de las dimensiones:
+#     necesita su índice de claves (utils/keys.py). Las extracciones
+#     igual corren en paralelo.
+#
+# [MÉTRICAS]
+#   • Cada tarea se mide (utils/metrics.py): tiempo, CPU, subida del pico de memoria,
+#     filas, bytes y filas/segundo. Queda una línea JSON por tarea en
+#     logs/metrics/run_<fecha>.jsonl y una tabla resumen al final del log.
+#
+# [LOGS]
+#   • El log se escribe desde un hilo aparte (utils/logger.py): los
+#     workers no esperan al disco. logs/etl.log rota por tamaño.
+#   • "--log-json": logs/etl.log en JSON, con run_id, table y stage.
+#   • En "--subprocess" la salida de cada etapa se ve en vivo, línea a
+#     línea, en vez de al terminar el proceso hijo. Los flags que afectan
+#     a una etapa (ej: "--no-cache") se le pasan al proceso hijo.
+#
+# [PUBLICACIÓN ATÓMICA]
+#   • "--publish snapshot" (default): cada corrida arma un snapshot con
+#     hard links en data/load/snapshots/<fecha> y al final mueve el
+#     puntero data/load/current (utils/publish.py). Sin copiar bytes,
+#     sin archivos a medias y solo con lo que produjo esta corrida.
+#   • "--publish copy": modo anterior, copia plana a data/load.
+#   • Vale también con "--subprocess": la publicación la hace este proceso.
+#
+# [CARGA A SQL]
+#   • Con "--sql-target <url>" cada tabla además se inserta en una base
+#     SQL (etl_load.py) apenas termina su curate. El snapshot solo se
+#     publica si también esa carga terminó bien. Con "--subprocess" la
+#     carga SQL corre como un proceso más, después de curated.
 # ------------------------------------------------------------
 
 import argparse
@@ -26,79 +77,475 @@ import subprocess
 import os
 import sys
 import shutil
-from utils.logger import get_logger
+from utils.logger import (get_logger, configure_logging, set_run_id, log_context,
+                          forward_child_line)
+from utils.dag import Task, run_dag, OK
+from utils.watermark import WatermarkStore, DEFAULT_STATE_FILE
+from utils.cache import StageCache, fingerprint
+from utils import publish
+from utils.keys import DIMENSION_KEYS
+from utils.metrics import RunMetrics, path_bytes
+from utils.raw_io import find_raw
+from etl_spaceparts import run_extract, TABLES, RAW_FOLDER
+from etl_curated import run_curated, run_rollups
+from utils.csv_io import CSV_ENGINES, DEFAULT_CSV_ENGINE
+from etl_load import run_sql_load, open_engine, DEFAULT_BATCH_SIZE as SQL_BATCH_SIZE
 
 logger = get_logger("Main-ETL")
 
 # ------------------------------------------------------------
-# Parser para --limit (opcional)
-# ------------------------------------------------------------
-parser = argparse.ArgumentParser(description="Pipeline Maestro ETL - SpacePartsCoDW")
-parser.add_argument("--limit", type=int, default=None,
-                    help="Número máximo de filas a procesar (se aplica en extracción y transformación)")
-args = parser.parse_args()
-
-# ------------------------------------------------------------
-# Definir ruta base de src (para ubicar los sub-scripts)
+# Rutas base (src y carpeta data del proyecto)
 # ------------------------------------------------------------
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 etl_extract_path = os.path.join(BASE_DIR, "etl_spaceparts.py")
 etl_curated_path = os.path.join(BASE_DIR, "etl_curated.py")
+etl_load_path = os.path.join(BASE_DIR, "etl_load.py")
+
+DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
+CURATED_DIR = os.path.join(DATA_DIR, "curated")
+LOAD_DIR = os.path.join(DATA_DIR, "load")
+
+# Tareas del grafo corriendo a la vez (una por tabla alcanza para solapar etapas)
+DEFAULT_WORKERS = 3
+
+PUBLISH_MODES = ("snapshot", "copy")
+
+# ------------------------------------------------------------
+# Parser para --limit (opcional)
+# ------------------------------------------------------------
+def build_parser():
+    parser = argparse.ArgumentParser(description="Pipeline Maestro ETL - SpacePartsCoDW")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Número máximo de filas a procesar (se aplica en extracción y transformación)")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Fuerza la extracción completa (ignora las marcas de agua incrementales)")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="Pasa los DataFrames extraídos directo a curated (sin releer RAW). "
+                             "Usa más RAM: todo el RAW queda en memoria a la vez.")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Modo anterior: ejecuta cada etapa como un proceso aparte")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Tareas del pipeline en paralelo (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Vuelve a limpiar y cargar todas las tablas aunque no hayan cambiado")
+    parser.add_argument("--publish", choices=PUBLISH_MODES, default="snapshot",
+                        help="snapshot: hard links + puntero 'current' (atómico); "
+                             "copy: copia plana a data/load (modo anterior)")
+    parser.add_argument("--keep-snapshots", type=int, default=publish.DEFAULT_KEEP,
+                        help=f"Snapshots publicados a conservar (default: {publish.DEFAULT_KEEP})")
+    parser.add_argument("--sql-target", default=None,
+                        help="URL de SQLAlchemy: además de publicar archivos, inserta cada tabla "
+                             "curated en esa base (ej: sqlite:///data/load/spaceparts.db)")
+    parser.add_argument("--sql-batch-size", type=int, default=SQL_BATCH_SIZE,
+                        help=f"Filas por lote en la carga SQL (default: {SQL_BATCH_SIZE})")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="Guarda fact_Invoices curated como dataset Parquet particionado por año/mes")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="No genera los CSV curated (solo Parquet)")
+    parser.add_argument("--no-rollups", action="store_true",
+                        help="No genera las tablas resumen por día/mes/cliente/producto")
+    parser.add_argument("--surrogate-keys", action="store_true",
+                        help="Reemplaza las claves de cliente/producto de los hechos por claves int32")
+    parser.add_argument("--csv-engine", choices=CSV_ENGINES, default=DEFAULT_CSV_ENGINE,
+                        help="Motor CSV de curated: pandas o arrow (multihilo)")
+    parser.add_argument("--refresh-catalog", action="store_true",
+                        help="Vuelve a leer el catálogo de la fuente (ignora data/state/catalog.json)")
+    parser.add_argument("--log-json", action="store_true",
+                        help="Escribe logs/etl.log en JSON (con run_id, table y stage)")
+    parser.add_argument("--sync-log", action="store_true",
+                        help="Escribe el log en el mismo hilo que loguea (sin cola)")
+    return parser
 
 # ------------------------------------------------------------
-# Función auxiliar: ejecutar un sub-script
+# Función auxiliar: ejecutar un sub-script (modo --subprocess)
 # ------------------------------------------------------------
-def run_step(script_path, limit=None):
+def run_step(script_path, limit=None, extra_args=None):
     # Usar siempre el mismo intérprete que ejecutó este script (sys.executable)
     command = [sys.executable, script_path]
     if limit:
         command += ["--limit", str(limit)]
+    if extra_args:
+        command += extra_args
 
     logger.info(f"Ejecutando: {' '.join(command)}")
 
-    result = subprocess.run(command, capture_output=True, text=True)
+    # El hijo manda su log por stdout (sin archivo) y yo lo re-emito línea
+    # a línea mientras corre: se ve en vivo y queda en mi logs/etl.log
+    env = dict(os.environ, ETL_LOG_CHILD="1", PYTHONUNBUFFERED="1")
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          text=True, encoding="utf-8", errors="replace", env=env) as proc:
+        for line in proc.stdout:
+            forward_child_line(line, logger)
+    returncode = proc.wait()
 
-    if result.returncode == 0:
+    if returncode == 0:
         logger.info(f"[OK] {os.path.basename(script_path)} completado.")
-        # Mostrar logs del subproceso
-        print(result.stdout)
     else:
         logger.error(f"[ERROR] {os.path.basename(script_path)} falló.")
-        print(result.stderr)
+    return returncode == 0
 
 # ------------------------------------------------------------
-# Orquestación paso a paso
+# Fase LOAD: curated → load (snapshot con hard links o copia)
 # ------------------------------------------------------------
-logger.info("=== INICIO PIPELINE ETL - SpaceParts ===")
+def run_load(curated_dir=CURATED_DIR, load_dir=LOAD_DIR, tables=None, cache=None,
+             files=None, snapshot=None):
+    """
+    Lleva los archivos curated a la capa load.
 
-# Paso 1: Extracción
-run_step(etl_extract_path, limit=args.limit)
+    - tables: si se indica, solo toma los archivos de esas tablas
+      (ej: ["dim_Customers"] → dim_Customers_curated.csv/.parquet)
+    - cache: StageCache; en modo copia, si los archivos curated de la
+      tabla son los mismos que ya se cargaron, no copio nada
+    - files: rutas exactas a cargar (lo que produjo esta corrida); si es
+      None, tomo lo que haya en curated_dir
+    - snapshot: carpeta de staging (publish.new_snapshot); si se indica,
+      enlazo con hard links ahí en vez de copiar a load_dir
 
-# Paso 2: Transformación
-run_step(etl_curated_path, limit=args.limit)
+    Devuelve {"files": [cargados], "ok": bool, "cached": bool, "bytes": copiados}
+    (con hard links "bytes" es 0: no se copia nada).
+    """
+    logger.info("=== START LOAD PHASE ===" if not tables else f"[LOAD] Cargando {', '.join(tables)}")
+    os.makedirs(load_dir, exist_ok=True)
 
-# Paso 3: Simulación de carga
-logger.info("=== START LOAD PHASE ===")
+    if files is not None:
+        curated_dir = os.path.dirname(files[0]) if files else curated_dir
+        files = sorted(os.path.basename(f) for f in files)
+    else:
+        # Archivos <tabla>_curated.* y carpetas de datasets particionados
+        files = [f for f in sorted(os.listdir(curated_dir))
+                 if not f.endswith((".tmp", ".staging"))
+                 and (not tables or any(f.startswith(f"{t}_curated.") or f == f"{t}_curated"
+                                        for t in tables))]
 
-# Definir carpeta load
-DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
-CURATED_DIR = os.path.join(DATA_DIR, "curated")
-LOAD_DIR = os.path.join(DATA_DIR, "load")
-os.makedirs(LOAD_DIR, exist_ok=True)
+    if snapshot:
+        # Hard link: tiempo constante, sin importar el tamaño del archivo
+        copied_bytes = 0
+        for file in files:
+            how = publish.link_file(os.path.join(curated_dir, file), os.path.join(snapshot, file))
+            if how == "copy":
+                copied_bytes += path_bytes([os.path.join(snapshot, file)])
+            logger.info(f"[LOAD] {file} → snapshot ({how})")
+        return {"files": files, "ok": True, "cached": False, "bytes": copied_bytes}
 
-# Copiar todos los archivos de curated a load
-for file in os.listdir(CURATED_DIR):
-    src = os.path.join(CURATED_DIR, file)
-    dst = os.path.join(LOAD_DIR, file)
-    try:
-        shutil.copy2(src, dst)
-        logger.info(f"[LOAD] Copiado {file} → {LOAD_DIR}")
-    except Exception as e:
-        logger.error(f"[ERROR-LOAD] No se pudo copiar {file}: {repr(e)}")
+    # Huella = contenido de los archivos curated de la tabla
+    fp = None
+    if cache is not None and tables and len(tables) == 1 and files:
+        fp = fingerprint("load", tables[0],
+                         {f: cache.file_hash(os.path.join(curated_dir, f)) for f in files})
+        outputs = [os.path.join(load_dir, f) for f in files]
+        if cache.lookup("load", tables[0], fp, outputs) is not None:
+            logger.info(f"[CACHE] {tables[0]} ya está cargada con este contenido. No copio.")
+            return {"files": [], "ok": True, "cached": True, "bytes": 0}
+
+    copied, ok = [], True
+    for file in files:
+        src = os.path.join(curated_dir, file)
+        dst = os.path.join(load_dir, file)
+        try:
+            if os.path.isdir(src):
+                # Dataset particionado: reemplazo la carpeta entera (sin
+                # dejar particiones que ya no existen)
+                if os.path.isdir(dst):
+                    shutil.rmtree(dst)
+                shutil.copytree(src, dst)
+            else:
+                shutil.copy2(src, dst)
+            copied.append(file)
+            logger.info(f"[LOAD] Copiado {file} → {load_dir}")
+        except Exception as e:
+            ok = False
+            logger.error(f"[ERROR-LOAD] No se pudo copiar {file}: {repr(e)}")
 
-logger.info("=== LOAD PHASE COMPLETADA ===")
+    if fp and ok:
+        # La copia en load ya es la salida: no guardo otra en objects/
+        cache.store("load", tables[0], fp, outputs, keep_copy=False)
+    if not tables:
+        logger.info("=== LOAD PHASE COMPLETADA ===")
+    return {"files": copied, "ok": ok, "cached": False,
+            "bytes": path_bytes([os.path.join(load_dir, f) for f in copied])}
 
 # ------------------------------------------------------------
-# Fin del pipeline
+# Métricas: qué cuenta cada etapa como filas / bytes
+# (el tiempo, la CPU y la memoria los mide RunMetrics.measure)
 # ------------------------------------------------------------
-logger.info("=== PIPELINE ETL COMPLETADO ===")
\ No newline at end of file
+def _raw_bytes(name):
+    raw = find_raw(RAW_FOLDER, name)
+    return path_bytes([raw]) if raw else None
+
+
+def fill_extract(name):
+    def fill(m, result):
+        m.rows_out = sum(r.get("rows", 0) for r in result.get("tables", []))
+        m.bytes_written = sum(r.get("bytes") or 0 for r in result.get("tables", []))
+    return fill
+
+
+def fill_curate(name, in_memory=False):
+    def fill(m, result):
+        r = (result.get("tables") or [{}])[0]
+        m.cached = r.get("cached", False)
+        m.rows_in, m.rows_out = r.get("rows_in"), r.get("rows")
+        if not m.cached:
+            m.bytes_written = path_bytes(r.get("outputs", []))
+            m.bytes_read = None if in_memory else _raw_bytes(name)
+    return fill
+
+
+def fill_load(m, result):
+    m.cached = result.get("cached", False)
+    m.bytes_written = result.get("bytes")
+
+
+def fill_sql(m, result):
+    m.cached = all(r.get("cached", False) for r in result.get("tables", [])) \
+        and bool(result.get("tables"))
+    m.rows_out = sum(r.get("rows", 0) for r in result.get("tables", []))
+
+
+# ------------------------------------------------------------
+# Grafo de tareas: extract(tabla) → curate(tabla) → load(tabla)
+# ------------------------------------------------------------
+def build_tasks(tables, limit=None, full_refresh=False, in_memory=False,
+                extract_options=None, curated_options=None, cache=None, snapshot=None,
+                keep_snapshots=publish.DEFAULT_KEEP, sql_engine=None,
+                sql_batch_size=SQL_BATCH_SIZE, metrics=None):
+    """
+    Arma las tres tareas encadenadas de cada tabla (más "sql:<tabla>" si
+    hay sql_engine), las tablas resumen ("curate:rollups" / "load:rollups")
+    cuando está fact_Invoices y, si hay snapshot, una tarea final
+    "publish" que depende de todas las cargas.
+    Con metrics (RunMetrics), cada tarea se mide por etapa y tabla.
+    """
+    extract_options = dict(extract_options or {})
+    curated_options = dict(curated_options or {})
+    # Un solo store para todas las extracciones en paralelo
+    watermarks = WatermarkStore(extract_options.get("state_file", DEFAULT_STATE_FILE))
+
+    def timed(stage, name, fn, fill=None):
+        # Sin métricas la tarea corre tal cual
+        if metrics is None:
+            return fn
+
+        def run(inputs):
+            with log_context(stage=stage, table=name), metrics.measure(stage, name) as m:
+                result = fn(inputs)
+                if isinstance(result, dict) and result.get("ok") is False:
+                    m.status = "failed"
+                if fill and isinstance(result, dict):
+                    fill(m, result)
+            return result
+        return run
+
+    def extract(table):
+        return lambda inputs: run_extract(tables=[table], limit=limit, full_refresh=full_refresh,
+                                          keep_frames=in_memory, watermarks=watermarks,
+                                          **extract_options)
+
+    def curate(name, upstream):
+        # Saco el DataFrame del resultado de extract: así no queda vivo
+        # en memoria hasta el final del pipeline
+        return lambda inputs: run_curated(frames=inputs[upstream].pop("frames", None),
+                                          tables=[name], limit=limit, cache=cache,
+                                          no_cache=cache is None, **curated_options)
+
+    def load(name, upstream):
+        # Solo cargo lo que curate dejó (o validó) en esta corrida
+        def run(inputs):
+            outputs = [f for r in inputs[upstream]["tables"] for f in r.get("outputs", [])]
+            return run_load(tables=[name], cache=cache, files=outputs, snapshot=snapshot)
+        return run
+
+    def sql_load(name, upstream):
+        def run(inputs):
+            outputs = [f for r in inputs[upstream]["tables"] for f in r.get("outputs", [])]
+            return run_sql_load(tables=[name], files=outputs, engine=sql_engine,
+                                batch_size=sql_batch_size, cache=cache)
+        return run
+
+    # Los hechos resuelven sus claves contra el índice de las dimensiones:
+    # su curate espera a que las dimensiones de esta corrida terminen
+    names = [t.replace(".", "_") for t in tables]
+    dim_curates = [f"curate:{n}" for n in names if n in DIMENSION_KEYS]
+
+    tasks = []
+    for table, name in zip(tables, names):
+        curate_deps = [f"extract:{name}"] + (dim_curates if name == "fact_Invoices" else [])
+        tasks += [
+            Task(f"extract:{name}", timed("extract", name, extract(table), fill_extract(name))),
+            Task(f"curate:{name}", timed("curate", name, curate(name, f"extract:{name}"),
+                                         fill_curate(name, in_memory)), deps=curate_deps),
+            Task(f"load:{name}", timed("load", name, load(name, f"curate:{name}"), fill_load),
+                 deps=[f"curate:{name}"]),
+        ]
+        if sql_engine is not None:
+            tasks.append(Task(f"sql:{name}", timed("sql", name, sql_load(name, f"curate:{name}"),
+                                                   fill_sql), deps=[f"curate:{name}"]))
+    # Tablas resumen: necesitan los hechos y las dimensiones ya curados
+    curates = [t.name for t in tasks if t.name.startswith("curate:")]
+    fact_projected = any(c.startswith("fact_Invoices=") for c in curated_options.get("columns", []))
+    if "curate:fact_Invoices" in curates and not curated_options.get("no_rollups") \
+            and not fact_projected:
+        tasks += [
+            Task("curate:rollups", timed("curate", "rollups", lambda inputs: run_rollups(
+                rebuild=curated_options.get("rebuild_rollups", False)), fill_curate("rollups")),
+                 deps=curates),
+            Task("load:rollups", timed("load", "rollups", load("rollups", "curate:rollups"), fill_load),
+                 deps=["curate:rollups"]),
+        ]
+    if snapshot:
+        loads = [t.name for t in tasks if t.name.startswith(("load:", "sql:"))]
+        tasks.append(Task("publish", timed("publish", None, lambda inputs: {
+            "snapshot": publish.publish(snapshot, keep_snapshots), "ok": True}), deps=loads))
+    return tasks
+
+
+def run_pipeline(limit=None, full_refresh=False, in_memory=False, workers=DEFAULT_WORKERS,
+                 tables=None, extract_options=None, curated_options=None, use_cache=True,
+                 publish_mode="snapshot", keep_snapshots=publish.DEFAULT_KEEP,
+                 sql_target=None, sql_batch_size=SQL_BATCH_SIZE):
+    """
+    Ejecuta Extract → Transform → Load en el mismo proceso, tabla por tabla.
+
+    - limit / full_refresh: igual que en la CLI
+    - in_memory: pasa los DataFrames extraídos a curated sin releer RAW
+    - workers: tareas del grafo en paralelo
+    - tables: tablas origen (default: las de etl_spaceparts.TABLES)
+    - extract_options / curated_options: opciones extra para cada etapa
+      (mismos nombres que sus flags, ej: {"workers": 4} o {"stream": True})
+    - use_cache: salta curate/load de las tablas cuya entrada no cambió
+    - publish_mode: "snapshot" (hard links + puntero current, solo se
+      publica si todas las tablas terminaron bien) o "copy"
+    - sql_target: URL de SQLAlchemy para cargar además en una base SQL
+
+    Devuelve {"tasks": {tarea: {"status", "result", "seconds"}}, "ok": bool,
+    "metrics": ruta del JSONL con las métricas de la corrida}.
+    """
+    logger.info("=== INICIO PIPELINE ETL - SpaceParts ===")
+    cache = StageCache() if use_cache else None
+    snapshot = publish.new_snapshot(LOAD_DIR) if publish_mode == "snapshot" else None
+    sql_engine = open_engine(sql_target) if sql_target else None
+    metrics = RunMetrics()
+    set_run_id(metrics.run_id)
+    tasks = build_tasks(tables or TABLES, limit=limit, full_refresh=full_refresh,
+                        in_memory=in_memory, extract_options=extract_options,
+                        curated_options=curated_options, cache=cache, snapshot=snapshot,
+                        keep_snapshots=keep_snapshots, sql_engine=sql_engine,
+                        sql_batch_size=sql_batch_size, metrics=metrics)
+    try:
+        outcome = run_dag(tasks, workers=workers, logger=logger)
+    finally:
+        if sql_engine is not None:
+            sql_engine.dispose()
+
+    if snapshot:
+        if outcome["publish"]["status"] == OK:
+            logger.info(f"[PUBLISH] Vigente: {outcome['publish']['result']['snapshot']}")
+        else:
+            # Falló alguna tabla: "current" sigue apuntando al snapshot anterior
+            publish.discard(snapshot)
+            logger.error("[PUBLISH] No publiqué: el snapshot anterior sigue vigente")
+    if cache is not None:
+        removed = cache.evict()
+        if removed:
+            logger.info(f"[CACHE] Limpieza: {len(removed)} salida(s) vieja(s) borradas")
+
+    ok = all(o["status"] == OK for o in outcome.values())
+    for name, o in outcome.items():
+        logger.info(f"[RESUMEN] {name}: {o['status']} ({o['seconds']}s)")
+    log_metrics(metrics)
+    if ok:
+        logger.info("=== PIPELINE ETL COMPLETADO ===")
+    else:
+        logger.error("=== PIPELINE ETL TERMINÓ CON ERRORES ===")
+    return {"tasks": outcome, "ok": ok, "metrics": metrics.path}
+
+
+def log_metrics(metrics):
+    """Tabla de métricas por etapa/tabla al final de la corrida."""
+    for line in metrics.summary_lines():
+        logger.info(f"[METRICS] {line}")
+    logger.info(f"[METRICS] Detalle en {metrics.path}")
+
+
+def run_pipeline_subprocess(limit=None, full_refresh=False, curated_args=None, extract_args=None,
+                            publish_mode="snapshot", keep_snapshots=publish.DEFAULT_KEEP,
+                            sql_target=None, sql_batch_size=SQL_BATCH_SIZE):
+    """
+    Modo anterior: cada etapa en su propio proceso (se comunican por disco).
+    La publicación en data/load corre aquí, igual que en run_pipeline; con
+    sql_target la carga SQL es un proceso más (etl_load.py) antes de publicar.
+    """
+    logger.info("=== INICIO PIPELINE ETL - SpaceParts (subprocess) ===")
+    metrics = RunMetrics()
+    set_run_id(metrics.run_id)
+
+    def stage(name, fn):
+        # Solo tiempo de reloj: la CPU y la memoria son de los procesos hijos
+        with log_context(stage=name), metrics.measure(name) as m:
+            ok = fn()
+            m.status = "ok" if ok else "failed"
+        return ok
+
+    def load():
+        if publish_mode != "snapshot":
+            return run_load()["ok"]
+        snapshot = publish.new_snapshot(LOAD_DIR)
+        if not run_load(snapshot=snapshot)["ok"]:
+            publish.discard(snapshot)
+            logger.error("[PUBLISH] No publiqué: el snapshot anterior sigue vigente")
+            return False
+        logger.info(f"[PUBLISH] Vigente: {publish.publish(snapshot, keep_snapshots)}")
+        return True
+
+    # Si una etapa falla no sigo: la siguiente trabajaría con datos viejos
+    extract_args = (["--full-refresh"] if full_refresh else []) + (extract_args or [])
+    ok = (stage("extract", lambda: run_step(etl_extract_path, limit=limit, extra_args=extract_args))
+          and stage("curate", lambda: run_step(etl_curated_path, limit=limit, extra_args=curated_args))
+          and (not sql_target or stage("sql", lambda: run_step(etl_load_path, extra_args=[
+              "--target-url", sql_target, "--batch-size", str(sql_batch_size)])))
+          and stage("load", load))
+    log_metrics(metrics)
+    if ok:
+        logger.info("=== PIPELINE ETL COMPLETADO ===")
+    else:
+        logger.error("=== PIPELINE ETL DETENIDO: falló una etapa ===")
+    return ok
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Sin flags manda el entorno (ETL_LOG_FORMAT / ETL_LOG_ASYNC)
+    if args.log_json or args.sync_log:
+        configure_logging(async_mode=False if args.sync_log else None,
+                          json_format=True if args.log_json else None)
+    curated_options = {"partitioned": args.partitioned, "no_csv": args.no_csv,
+                       "no_rollups": args.no_rollups, "surrogate_keys": args.surrogate_keys,
+                       "csv_engine": args.csv_engine}
+    if args.subprocess:
+        curated_args = []
+        for name, value in curated_options.items():
+            flag = f"--{name.replace('_', '-')}"
+            if value is True:
+                curated_args.append(flag)
+            elif isinstance(value, str):
+                curated_args += [flag, value]
+        if args.no_cache:
+            curated_args.append("--no-cache")
+        ok = run_pipeline_subprocess(limit=args.limit, full_refresh=args.full_refresh,
+                                     curated_args=curated_args,
+                                     extract_args=["--refresh-catalog"] if args.refresh_catalog else None,
+                                     publish_mode=args.publish, keep_snapshots=args.keep_snapshots,
+                                     sql_target=args.sql_target, sql_batch_size=args.sql_batch_size)
+    else:
+        ok = run_pipeline(limit=args.limit, full_refresh=args.full_refresh,
+                          in_memory=args.in_memory, workers=args.workers,
+                          extract_options={"refresh_catalog": args.refresh_catalog},
+                          curated_options=curated_options,
+                          use_cache=not args.no_cache, publish_mode=args.publish,
+                          keep_snapshots=args.keep_snapshots, sql_target=args.sql_target,
+                          sql_batch_size=args.sql_batch_size)["ok"]
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,12 +4,19 @@
 #
 # Este script me ayuda a descubrir el nombre exacto
 # de las tablas relacionadas con ventas/órdenes/facturas.
+#
+# Ahora en vez de consultar INFORMATION_SCHEMA.TABLES a mano leo
+# el catálogo completo (utils/catalog.py): además del nombre muestra
+# filas aproximadas y columnas, y deja la caché al día para
+# etl_spaceparts.py (data/state/catalog.json).
 # ------------------------------------------------------------
 
 import os
+import contextlib
 import pyodbc
 from dotenv import load_dotenv
 from utils.logger import get_logger
+from utils.catalog import load_catalog
 
 # Cargar variables desde .env
 load_dotenv()
@@ -30,26 +37,22 @@ conn_str = (
 
 logger = get_logger("TEST-PYODBC")
 
+# Palabras que delatan una tabla de ventas
+SALES_WORDS = ("sale", "order", "invoice", "transaction")
+
 try:
-    cnxn = pyodbc.connect(conn_str, timeout=10)
+    # Siempre leo la base (refresh): este script es para explorar
+    catalog = load_catalog(lambda: contextlib.closing(pyodbc.connect(conn_str, timeout=10)),
+                           refresh=True, source=f"{server}/{database}", logger=logger)
     logger.info(f"Conexion exitosa con la base: {database}")
-    cur = cnxn.cursor()
 
     # Buscar tablas relacionadas con ventas
     logger.info("Buscando tablas posibles de ventas (Sales/Order/Invoice/Transaction)...")
-    cur.execute("""
-    SELECT TABLE_SCHEMA, TABLE_NAME 
-    FROM INFORMATION_SCHEMA.TABLES
-    WHERE TABLE_NAME LIKE '%Sale%'
-       OR TABLE_NAME LIKE '%Order%'
-       OR TABLE_NAME LIKE '%Invoice%'
-       OR TABLE_NAME LIKE '%Transaction%'
-    """)
-    rows = cur.fetchall()
-    for r in rows:
-        logger.info(f"- Posible tabla de ventas: {r.TABLE_SCHEMA}.{r.TABLE_NAME}")
-
-    cnxn.close()
+    for name, entry in sorted(catalog["tables"].items()):
+        if any(word in name.split(".")[-1].lower() for word in SALES_WORDS):
+            rows = f"~{entry['rows']:,}" if entry["rows"] is not None else "?"
+            logger.info(f"- Posible tabla de ventas: {name} ({rows} filas, "
+                        f"{len(entry['columns'])} columnas)")
 
 except Exception as e:
     logger.error("Error buscando tabla de ventas", exc_info=True)
\ No newline at end of file
@@ -0,0 +1,294 @@
+# ------------------------------------------------------------
+# Script: cache.py
+#
+# Caché por etapa basado en el contenido de las entradas.
+#
+# Antes cada corrida de main_etl.py volvía a limpiar y copiar todas
+# las tablas, aunque el RAW de una dimensión no hubiera cambiado.
+# Ahora cada etapa (curate, load) calcula una "huella" (fingerprint)
+# de lo que recibe:
+#   • hash del contenido del RAW (o de los archivos de entrada)
+#   • versión del código de transformación (fuente + SCHEMA_VERSION)
+#   • parámetros que cambian el resultado (--limit, --columns, ...)
+#
+# Si la huella coincide con la de la última corrida y las salidas
+# siguen intactas en disco, la tabla se salta. Una etapa que no deja
+# archivos (la carga a la base SQL) se registra sin salidas: ahí
+# alcanza con que coincida la huella.
+#
+# Además guardo una copia (hard link cuando se puede) de cada salida
+# en data/cache/objects/<huella>/, así volver a una combinación ya
+# vista (ej: alternar entre "--limit 1000" y la corrida completa)
+# no requiere recalcular. Esa copia se limpia por tamaño y antigüedad.
+#
+# Todo vive en data/cache/manifest.json:
+#   {
+#     "stages":  {"curate": {"dim_Products": {"fingerprint", "outputs"}}},
+#     "objects": {"<huella>": {"stage", "table", "files", "bytes", "last_used"}},
+#     "hashes":  {"<ruta>": {"size", "mtime_ns", "sha256"}}
+#   }
+# ------------------------------------------------------------
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import datetime as dt
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cache")
+# Límites de la copia de salidas (objects/)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_AGE_DAYS = 30
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def fingerprint(*parts):
+    """Huella estable de cualquier combinación de valores serializables a JSON."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def source_version(*paths):
+    """Hash del código fuente de los módulos que definen una transformación."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def _now():
+    return dt.datetime.now().isoformat(timespec="seconds")
+
+
+def _stat_key(path):
+    if os.path.isdir(path):
+        # Carpeta (ej: dataset particionado): bytes totales, mtime más
+        # reciente y cantidad de archivos. Reemplazar una partición cambia
+        # el mtime; agregar o borrar una cambia el conteo.
+        size, mtime, count = 0, 0, 0
+        for folder, _, names in os.walk(path):
+            for name in names:
+                st = os.stat(os.path.join(folder, name))
+                size, mtime, count = size + st.st_size, max(mtime, st.st_mtime_ns), count + 1
+        return {"size": size, "mtime_ns": mtime, "files": count}
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _link_one(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _link_or_copy(src, dst):
+    # Hard link: no duplica bytes en disco. Si el sistema no lo permite
+    # (otro disco, FAT, ...), copio. Las carpetas se replican archivo
+    # por archivo con la misma regla.
+    tmp = dst + ".tmp"
+    if os.path.isdir(tmp):
+        shutil.rmtree(tmp)
+    elif os.path.exists(tmp):
+        os.remove(tmp)
+    if os.path.isdir(src):
+        shutil.copytree(src, tmp, copy_function=_link_one)
+        if os.path.isdir(dst):
+            shutil.rmtree(dst)
+        os.rename(tmp, dst)
+        return
+    _link_one(src, tmp)
+    os.replace(tmp, dst)
+
+
+class StageCache:
+    """
+    Manifiesto de huellas por etapa/tabla + copia de las salidas.
+
+    - root: carpeta del caché (manifest.json y objects/)
+    - max_bytes / max_age_days: política de limpieza de objects/
+
+    Es thread-safe: el pipeline procesa varias tablas a la vez.
+    Ojo: los archivos de salida se deben reemplazar (os.replace), no
+    reescribir en el lugar, porque pueden compartir inodo con el caché.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.root = root
+        self.path = os.path.join(root, "manifest.json")
+        self.objects_dir = os.path.join(root, "objects")
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._lock = threading.RLock()
+        self._state = {"stages": {}, "objects": {}, "hashes": {}}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self._state.update(json.load(f))
+
+    # --------------------------------------------------------
+    # Hash de contenido (con memo por tamaño + mtime)
+    # --------------------------------------------------------
+    def file_hash(self, path):
+        """
+        sha256 del contenido de un archivo o carpeta (ej: carpeta de parts).
+        Si el archivo no cambió de tamaño ni de mtime desde la última vez,
+        reuso el hash guardado en vez de releerlo.
+        """
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for name in sorted(os.listdir(path)):
+                digest.update(name.encode("utf-8"))
+                digest.update(self.file_hash(os.path.join(path, name)).encode("ascii"))
+            return digest.hexdigest()
+
+        key = os.path.abspath(path)
+        stat = _stat_key(path)
+        with self._lock:
+            memo = self._state["hashes"].get(key)
+        if memo and memo["size"] == stat["size"] and memo["mtime_ns"] == stat["mtime_ns"]:
+            return memo["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(block)
+        with self._lock:
+            self._state["hashes"][key] = dict(stat, sha256=digest.hexdigest())
+        return digest.hexdigest()
+
+    # --------------------------------------------------------
+    # Consulta / registro
+    # --------------------------------------------------------
+    def lookup(self, stage, table, fp, outputs):
+        """
+        Si la última corrida de stage/table tuvo esta huella y sus salidas
+        siguen en disco sin tocar, devuelve los metadatos guardados (dict).
+        Si las salidas no están pero hay una copia en objects/, las
+        restauro y también cuenta como acierto. Si no, devuelve None.
+        Con outputs vacío (etapa sin archivos, registrada igual) basta la huella.
+        """
+        with self._lock:
+            entry = self._state["stages"].get(stage, {}).get(table)
+            no_files = not outputs and entry is not None and not entry["outputs"]
+            if entry and entry["fingerprint"] == fp and \
+                    (no_files or self._outputs_intact(entry["outputs"])):
+                self._touch(fp)
+                return entry.get("meta", {})
+            return self._restore(stage, table, fp, outputs)
+
+    def store(self, stage, table, fp, outputs, meta=None, keep_copy=True):
+        """
+        Registra que stage/table produjo "outputs" con la huella fp.
+        - meta: datos chicos a devolver en un acierto (ej: {"rows": 1000})
+        - keep_copy: guarda además las salidas en objects/ (hard link)
+        """
+        outputs = [p for p in outputs if os.path.exists(p)]
+        with self._lock:
+            if keep_copy and outputs:
+                target = os.path.join(self.objects_dir, fp)
+                os.makedirs(target, exist_ok=True)
+                for p in outputs:
+                    _link_or_copy(p, os.path.join(target, os.path.basename(p)))
+                self._state["objects"][fp] = {
+                    "stage": stage,
+                    "table": table,
+                    "files": [os.path.basename(p) for p in outputs],
+                    "bytes": sum(_stat_key(p)["size"] for p in outputs),
+                    "meta": meta or {},
+                    "created_at": _now(),
+                    "last_used": _now(),
+                }
+            self._state["stages"].setdefault(stage, {})[table] = {
+                "fingerprint": fp,
+                "outputs": {p: _stat_key(p) for p in outputs},
+                "meta": meta or {},
+                "updated_at": _now(),
+            }
+            self._save()
+
+    def invalidate(self, stage, table):
+        with self._lock:
+            if self._state["stages"].get(stage, {}).pop(table, None) is not None:
+                self._save()
+
+    def _outputs_intact(self, outputs):
+        if not outputs:
+            return False
+        for p, stat in outputs.items():
+            if not os.path.exists(p) or _stat_key(p) != stat:
+                return False
+        return True
+
+    def _restore(self, stage, table, fp, outputs):
+        obj = self._state["objects"].get(fp)
+        if not obj or obj["stage"] != stage or obj["table"] != table:
+            return None
+        folder = os.path.join(self.objects_dir, fp)
+        by_name = {os.path.basename(p): p for p in outputs}
+        if set(obj["files"]) != set(by_name) or \
+                not all(os.path.exists(os.path.join(folder, f)) for f in obj["files"]):
+            return None
+        for name, dst in by_name.items():
+            os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+            _link_or_copy(os.path.join(folder, name), dst)
+        self._touch(fp)
+        self._state["stages"].setdefault(stage, {})[table] = {
+            "fingerprint": fp,
+            "outputs": {p: _stat_key(p) for p in outputs},
+            "meta": obj.get("meta", {}),
+            "updated_at": _now(),
+        }
+        self._save()
+        return obj.get("meta", {})
+
+    def _touch(self, fp):
+        if fp in self._state["objects"]:
+            self._state["objects"][fp]["last_used"] = _now()
+
+    # --------------------------------------------------------
+    # Limpieza por antigüedad y tamaño
+    # --------------------------------------------------------
+    def evict(self):
+        """
+        Borra copias en objects/ más viejas que max_age_days y, si todavía
+        se pasa de max_bytes, las menos usadas recientemente. Nunca borro
+        la copia vigente de una tabla (la huella de su última corrida).
+        Devuelve la lista de huellas borradas.
+        """
+        with self._lock:
+            current = {e["fingerprint"] for stage in self._state["stages"].values()
+                       for e in stage.values()}
+            limit = dt.datetime.now() - dt.timedelta(days=self.max_age_days)
+            candidates = sorted(
+                (fp for fp in self._state["objects"] if fp not in current),
+                key=lambda fp: self._state["objects"][fp]["last_used"],
+            )
+            total = sum(o["bytes"] for o in self._state["objects"].values())
+
+            removed = []
+            for fp in candidates:
+                obj = self._state["objects"][fp]
+                too_old = dt.datetime.fromisoformat(obj["last_used"]) < limit
+                if not too_old and total <= self.max_bytes:
+                    continue
+                shutil.rmtree(os.path.join(self.objects_dir, fp), ignore_errors=True)
+                total -= obj["bytes"]
+                del self._state["objects"][fp]
+                removed.append(fp)
+
+            # Memo de hashes: olvido archivos que ya no existen
+            for key in [k for k in self._state["hashes"] if not os.path.exists(k)]:
+                del self._state["hashes"][key]
+            self._save()
+            return removed
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_path, self.path)
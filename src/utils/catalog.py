@@ -0,0 +1,440 @@
+# ------------------------------------------------------------
+# Script: catalog.py
+#
+# Catálogo de metadatos de la fuente (con caché local) y plan de
+# extracción derivado de él.
+#
+# Antes la extracción no sabía nada de la base: la lista de tablas
+# estaba fija en etl_spaceparts.py, cada tabla se bajaba con
+# "SELECT *" igual fuera de 500 filas o de 50 millones, y para
+# descubrir tablas había que correr consultas a mano contra
+# INFORMATION_SCHEMA (test_pyodbc.py).
+#
+# [CATÁLOGO]
+#   • introspect() lee de una vez, para todas las tablas:
+#       - columnas, tipo y si aceptan NULL (INFORMATION_SCHEMA.COLUMNS)
+#       - clave primaria (TABLE_CONSTRAINTS + KEY_COLUMN_USAGE)
+#       - filas aproximadas (sys.partitions: metadatos, no cuenta filas)
+#     y solo para las tablas grandes pedidas, MIN/MAX de las columnas
+#     candidatas a partición (fechas, clave primaria entera y las claves
+#     que indique el llamador), todas en una sola consulta por tabla.
+#   • Contra SQLite (fuente sintética / pruebas) usa sqlite_master,
+#     PRAGMA table_info y MAX(rowid) como conteo aproximado.
+#
+# [CACHÉ]
+#   • El resultado se guarda en data/state/catalog.json y se reutiliza
+#     mientras tenga menos de "ttl_hours" (24 por default): una corrida
+#     normal arranca sin ninguna consulta de catálogo.
+#   • Se vuelve a leer la base si venció, si cambió la fuente, si falta
+#     alguna tabla pedida o si se pide refresh. Si una tabla grande
+#     pedida no tiene MIN/MAX (la caché salió de otra llamada, ej: un
+#     run_extract por tabla en paralelo) se calculan solo esos rangos y
+#     se guardan en la caché. Dentro de un proceso se
+#     introspecciona una sola vez aunque varias extracciones corran en
+#     paralelo.
+#
+# [PLAN]
+#   • plan_table() decide por tabla según sus filas aproximadas:
+#       - chica   (< SINGLE_FETCH_ROWS)  → un solo fetch
+#       - mediana                        → streaming por lotes (como siempre)
+#       - grande  (>= PARTITION_MIN_ROWS) → rangos en paralelo de la
+#         mejor columna candidata (ROWS_PER_PART filas por rango)
+#   • Columnas: se proyectan todas menos los tipos que el ETL no usa
+#     (binarios, espaciales, xml, rowversion); si no hay ninguno sigue
+#     siendo "SELECT *".
+#   • Tipos: esquema Arrow armado desde los tipos SQL, para cuando el
+#     driver no los informa (sqlite3) → el RAW columnar ya no depende
+#     de lo que traiga el primer lote.
+#   • Tabla sin conteo (sin permisos sobre sys.partitions) → se extrae
+#     como antes.
+# ------------------------------------------------------------
+
+import os
+import json
+import math
+import threading
+import datetime as dt
+import pandas as pd
+import pyarrow as pa
+
+DEFAULT_CATALOG_FILE = os.path.join("data", "state", "catalog.json")
+DEFAULT_TTL_HOURS = 24
+# Versión del formato del JSON: subirla si cambia su estructura
+CATALOG_VERSION = 1
+
+# Umbrales del plan (filas aproximadas)
+SINGLE_FETCH_ROWS = 100_000
+PARTITION_MIN_ROWS = 2_000_000
+ROWS_PER_PART = 1_000_000
+MAX_PARTS = 16
+
+# Tipos SQL normalizados (minúsculas, sin largo) → tipo Arrow
+_INT_TYPES = {"int", "integer", "bigint", "smallint", "tinyint"}
+_FLOAT_TYPES = {"float", "real", "double", "decimal", "numeric", "money", "smallmoney"}
+_DATE_TYPES = {"date"}
+_DATETIME_TYPES = {"datetime", "datetime2", "smalldatetime"}
+_TEXT_TYPES = {"char", "varchar", "nchar", "nvarchar", "text", "ntext", "clob",
+               "uniqueidentifier", "datetimeoffset", "time"}
+# Tipos que no se extraen: Power BI no los usa y son los que más pesan
+SKIP_TYPES = {"binary", "varbinary", "image", "blob", "rowversion", "geography",
+              "geometry", "hierarchyid", "sql_variant", "xml"}
+
+_MSSQL_TABLES = """
+SELECT s.name, t.name, SUM(p.rows)
+FROM sys.tables t
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+GROUP BY s.name, t.name
+"""
+_MSSQL_TABLES_FALLBACK = """
+SELECT TABLE_SCHEMA, TABLE_NAME, NULL
+FROM INFORMATION_SCHEMA.TABLES
+WHERE TABLE_TYPE = 'BASE TABLE'
+"""
+_MSSQL_COLUMNS = """
+SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE
+FROM INFORMATION_SCHEMA.COLUMNS
+ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+"""
+_MSSQL_KEYS = """
+SELECT k.TABLE_SCHEMA, k.TABLE_NAME, k.COLUMN_NAME
+FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS c
+JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE k
+  ON k.CONSTRAINT_NAME = c.CONSTRAINT_NAME AND k.TABLE_SCHEMA = c.TABLE_SCHEMA
+WHERE c.CONSTRAINT_TYPE = 'PRIMARY KEY'
+ORDER BY k.TABLE_SCHEMA, k.TABLE_NAME, k.ORDINAL_POSITION
+"""
+
+# Catálogos introspeccionados en este proceso (ruta absoluta → catálogo:
+# la ruta default es relativa y otra carpeta de trabajo es otro catálogo)
+_introspected = {}
+_lock = threading.Lock()
+
+
+def _norm_type(sql_type):
+    # "NVARCHAR(50)" → "nvarchar"; en SQL Server "timestamp" es rowversion
+    name = (sql_type or "").split("(")[0].strip().lower()
+    return "rowversion" if name == "timestamp" else name
+
+
+def dialect_of(cnxn):
+    """"sqlite" para conexiones sqlite3, "mssql" para el resto (pyodbc)."""
+    return "sqlite" if type(cnxn).__module__.startswith("sqlite3") else "mssql"
+
+
+def _query(cnxn, sql):
+    cursor = cnxn.cursor()
+    try:
+        cursor.execute(sql)
+        return [tuple(r) for r in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _json_value(value):
+    # Límites MIN/MAX → valor serializable (fechas como texto ISO)
+    if hasattr(value, "item"):
+        value = value.item()
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, (dt.date, dt.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _read_mssql(cnxn):
+    try:
+        table_rows = _query(cnxn, _MSSQL_TABLES)
+    except Exception:
+        # Sin permiso sobre sys.* → tablas sin conteo (se extraen como antes)
+        table_rows = _query(cnxn, _MSSQL_TABLES_FALLBACK)
+    tables = {f"{s}.{t}": {"rows": int(n) if n is not None else None,
+                           "columns": [], "primary_key": [], "bounds": {}}
+              for s, t, n in table_rows}
+    for s, t, column, sql_type, nullable in _query(cnxn, _MSSQL_COLUMNS):
+        entry = tables.get(f"{s}.{t}")
+        if entry is not None:
+            entry["columns"].append({"name": column, "type": _norm_type(sql_type),
+                                     "nullable": nullable == "YES"})
+    for s, t, column in _query(cnxn, _MSSQL_KEYS):
+        entry = tables.get(f"{s}.{t}")
+        if entry is not None:
+            entry["primary_key"].append(column)
+    return tables
+
+
+def _read_sqlite(cnxn):
+    tables = {}
+    schemas = [row[1] for row in _query(cnxn, "PRAGMA database_list") if row[1] != "temp"]
+    for schema in schemas:
+        names = _query(cnxn, f"SELECT name FROM {schema}.sqlite_master "
+                             f"WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        for (name,) in names:
+            info = _query(cnxn, f'PRAGMA {schema}.table_info("{name}")')
+            try:
+                # rowid crece con cada insert: buen aproximado sin recorrer la tabla
+                rows = _query(cnxn, f'SELECT MAX(rowid) FROM {schema}."{name}"')[0][0] or 0
+            except Exception:
+                rows = None   # tabla WITHOUT ROWID
+            tables[f"{schema}.{name}"] = {
+                "rows": rows,
+                "columns": [{"name": c[1], "type": _norm_type(c[2]), "nullable": not c[3]}
+                            for c in info],
+                "primary_key": [c[1] for c in sorted(info, key=lambda c: c[5]) if c[5]],
+                "bounds": {},
+            }
+    return tables
+
+
+def find_table(catalog, table):
+    """Entrada del catálogo para "esquema.tabla" (sin distinguir mayúsculas), o None."""
+    tables = catalog.get("tables", {})
+    if table in tables:
+        return tables[table]
+    lowered = table.lower()
+    return next((v for k, v in tables.items() if k.lower() == lowered), None)
+
+
+def _find_column(entry, name):
+    lowered = name.lower()
+    return next((c for c in entry["columns"] if c["name"].lower() == lowered), None)
+
+
+def partition_candidates(entry, hints=()):
+    """
+    Columnas por las que se puede partir la tabla, en orden de
+    preferencia: las indicadas (hints), las de fecha y la clave
+    primaria si es un solo entero.
+    """
+    names = []
+    for hint in hints or ():
+        column = _find_column(entry, hint)
+        if column:
+            names.append(column["name"])
+    names += [c["name"] for c in entry["columns"]
+              if c["type"] in _DATE_TYPES | _DATETIME_TYPES]
+    if len(entry["primary_key"]) == 1:
+        column = _find_column(entry, entry["primary_key"][0])
+        if column and column["type"] in _INT_TYPES:
+            names.append(column["name"])
+    return list(dict.fromkeys(names))
+
+
+def _read_bounds(cnxn, table, columns):
+    # MIN/MAX de todas las candidatas en una sola pasada por la tabla
+    exprs = ", ".join(f"MIN({c}), MAX({c})" for c in columns)
+    row = _query(cnxn, f"SELECT {exprs} FROM {table}")[0]
+    return {c: {"min": _json_value(row[2 * i]), "max": _json_value(row[2 * i + 1])}
+            for i, c in enumerate(columns)}
+
+
+def introspect(cnxn, tables=None, hints=None, source=None, logger=None):
+    """
+    Lee el catálogo de la fuente.
+
+    - tables: tablas a las que calcular MIN/MAX de las candidatas a
+      partición (solo si son grandes); el resto del catálogo se lee igual
+    - hints: {tabla: [columnas]} candidatas extra (ej: la clave incremental)
+    - source: etiqueta de la fuente (servidor/base) guardada en el catálogo
+    """
+    dialect = dialect_of(cnxn)
+    found = _read_sqlite(cnxn) if dialect == "sqlite" else _read_mssql(cnxn)
+    catalog = {"version": CATALOG_VERSION, "dialect": dialect, "source": source,
+               "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+               "tables": found}
+
+    add_bounds(cnxn, catalog, pending_bounds(catalog, tables, hints))
+    if logger:
+        logger.info(f"[CATALOG] {len(found)} tablas leídas de la fuente ({dialect})")
+    return catalog
+
+
+def pending_bounds(catalog, tables, hints=None):
+    """
+    {tabla: columnas} de las tablas pedidas grandes cuyas candidatas a
+    partición todavía no tienen MIN/MAX en el catálogo.
+    """
+    pending = {}
+    for table in tables or ():
+        entry = find_table(catalog, table)
+        if entry is None or (entry["rows"] or 0) < PARTITION_MIN_ROWS:
+            continue
+        columns = [c for c in partition_candidates(entry, (hints or {}).get(table))
+                   if c not in entry["bounds"]]
+        if columns:
+            pending[table] = columns
+    return pending
+
+
+def add_bounds(cnxn, catalog, pending):
+    """Calcula los MIN/MAX pendientes (ver pending_bounds) y los suma al catálogo."""
+    for table, columns in pending.items():
+        find_table(catalog, table)["bounds"].update(_read_bounds(cnxn, table, columns))
+
+
+def read_catalog(path=DEFAULT_CATALOG_FILE):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None   # archivo corrupto → se vuelve a introspeccionar
+
+
+def save_catalog(catalog, path=DEFAULT_CATALOG_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def is_fresh(catalog, ttl_hours=DEFAULT_TTL_HOURS, source=None, tables=()):
+    """True si el catálogo sirve tal cual: versión, antigüedad, fuente y tablas."""
+    if not catalog or catalog.get("version") != CATALOG_VERSION:
+        return False
+    age = dt.datetime.now() - dt.datetime.fromisoformat(catalog["created_at"])
+    if age > dt.timedelta(hours=ttl_hours):
+        return False
+    if source is not None and catalog.get("source") != source:
+        return False
+    return all(find_table(catalog, t) is not None for t in tables or ())
+
+
+def load_catalog(connection, tables=None, path=DEFAULT_CATALOG_FILE,
+                 ttl_hours=DEFAULT_TTL_HOURS, refresh=False, source=None,
+                 hints=None, logger=None):
+    """
+    Devuelve el catálogo desde la caché o, si no sirve, desde la base.
+
+    - connection: función sin argumentos que devuelve un context manager
+      con una conexión (ej: pool.connection); solo se usa si hay que leer la base
+    - tables / hints / source: ver introspect()
+    - ttl_hours: antigüedad máxima de la caché
+    - refresh: ignora la caché (una vez por proceso)
+    """
+    key = os.path.abspath(path)
+    with _lock:
+        catalog = _introspected.get(key)
+        if catalog is None and not refresh:
+            catalog = read_catalog(path)
+            if not is_fresh(catalog, ttl_hours, source):
+                catalog = None
+        if catalog is not None and is_fresh(catalog, ttl_hours, source, tables):
+            if logger:
+                logger.info(f"[CATALOG] Uso la caché {path} (del {catalog['created_at']})")
+            # La caché pudo salir de una llamada con otras tablas: las
+            # grandes de esta que no tienen rango se calculan ahora
+            pending = pending_bounds(catalog, tables, hints)
+            if pending:
+                with connection() as cnxn:
+                    add_bounds(cnxn, catalog, pending)
+                if logger:
+                    logger.info(f"[CATALOG] Rangos de partición agregados: {', '.join(pending)}")
+                save_catalog(catalog, path)
+                _introspected[key] = catalog
+            return catalog
+
+        with connection() as cnxn:
+            catalog = introspect(cnxn, tables, hints, source, logger)
+        save_catalog(catalog, path)
+        _introspected[key] = catalog
+        return catalog
+
+
+# ============================================================
+# Plan de extracción
+# ============================================================
+def _arrow_type(sql_type):
+    if sql_type in _INT_TYPES:
+        return pa.int64()
+    if sql_type in _FLOAT_TYPES:
+        return pa.float64()   # igual que pd.read_sql (coerce_float)
+    if sql_type == "bit":
+        return pa.bool_()
+    if sql_type in _DATE_TYPES:
+        return pa.date32()
+    if sql_type in _DATETIME_TYPES:
+        return pa.timestamp("us")
+    if sql_type in _TEXT_TYPES:
+        return pa.string()
+    return None
+
+
+def arrow_schema(columns):
+    """Esquema Arrow de las columnas del catálogo (None si algún tipo no se conoce)."""
+    fields = []
+    for column in columns:
+        arrow_type = _arrow_type(column["type"])
+        if arrow_type is None:
+            return None
+        fields.append(pa.field(column["name"], arrow_type))
+    return pa.schema(fields)
+
+
+def _quote(name, dialect):
+    return f'"{name}"' if dialect == "sqlite" else f"[{name}]"
+
+
+def _span(bounds):
+    # Valores distintos posibles de la clave (días o enteros): más rangos no sirven
+    lo, hi = bounds.get("min"), bounds.get("max")
+    if lo is None or hi is None:
+        return 0
+    if isinstance(lo, int) and isinstance(hi, int):
+        return hi - lo + 1
+    try:
+        return (pd.Timestamp(hi).normalize() - pd.Timestamp(lo).normalize()).days + 1
+    except (ValueError, TypeError):
+        return None   # clave de otro tipo: sin tope
+
+
+def plan_table(entry, dialect="mssql", partition_hints=()):
+    """
+    Plan de extracción de una tabla del catálogo.
+
+    Devuelve {"rows", "mode" ("single" | "stream" | "partition"),
+              "partition": (clave, n) o None, "select": lista de columnas
+              o "*", "skipped": columnas no extraídas, "schema": esquema Arrow}.
+    """
+    columns = [c for c in entry["columns"] if c["type"] not in SKIP_TYPES]
+    skipped = [c["name"] for c in entry["columns"] if c["type"] in SKIP_TYPES]
+    rows = entry.get("rows")
+    plan = {"rows": rows, "mode": "stream", "partition": None, "skipped": skipped,
+            "select": ", ".join(_quote(c["name"], dialect) for c in columns) if skipped else "*",
+            "schema": arrow_schema(columns) if columns else None}
+
+    if rows is None:
+        return plan
+    if rows < SINGLE_FETCH_ROWS:
+        plan["mode"] = "single"
+    elif rows >= PARTITION_MIN_ROWS:
+        for key in partition_candidates(entry, partition_hints):
+            bounds = entry.get("bounds", {}).get(key)
+            if not bounds:
+                continue
+            span = _span(bounds)
+            n_parts = min(max(2, math.ceil(rows / ROWS_PER_PART)), MAX_PARTS)
+            if span is not None:
+                n_parts = min(n_parts, span)
+            if n_parts >= 2:
+                plan.update(mode="partition", partition=(key, n_parts))
+                break
+    return plan
+
+
+def describe_plan(table, plan):
+    """Una línea de log con la decisión tomada para la tabla."""
+    rows = f"~{plan['rows']:,}" if plan["rows"] is not None else "? (sin conteo)"
+    if plan["mode"] == "partition":
+        key, n_parts = plan["partition"]
+        decision = f"{n_parts} rangos de {key}"
+    elif plan["mode"] == "single":
+        decision = "un solo fetch"
+    else:
+        decision = "streaming por lotes"
+    line = f"{table}: {rows} filas → {decision}"
+    if plan["skipped"]:
+        line += f" (sin columnas {', '.join(plan['skipped'])})"
+    return line
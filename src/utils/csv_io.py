@@ -0,0 +1,184 @@
+# ------------------------------------------------------------
+# Script: csv_io.py
+#
+# Motor de lectura/escritura CSV intercambiable.
+#
+# Los CSV siguen siendo obligatorios (Power BI los consume), pero
+# pd.read_csv / df.to_csv usan un solo núcleo. Aquí hay dos motores:
+#
+#   • "pandas" → como siempre (read_csv / to_csv)
+#   • "arrow"  → pyarrow.csv: parsea y escribe en varios hilos, por
+#                bloques, y sin pasar cada valor por objetos Python
+#
+# Para que los archivos sigan leyéndose igual, el motor arrow imita
+# lo que escribe pandas:
+#   • fechas como "2024-01-31" (o con hora si la tienen), formateando
+#     solo las fechas distintas (utils/dates.py)
+#   • booleanos True/False, categorías como texto, nulos como celda
+#     vacía y BOM utf-8 al inicio
+# Diferencias visibles (CSV válido, se lee igual):
+#   • arrow pone entre comillas todos los textos ("Colombia")
+#   • un decimal entero sale "5" en vez de "5.0"
+#
+# Al leer:
+#   • arrow ya entrega las fechas ISO como datetime (pandas las deja
+#     como texto); la transformación acepta ambas
+#   • arrow convierte cada decimal al double exacto del texto; el
+#     parser por defecto de pandas redondea algunos en el último
+#     dígito (45.647999999999996 → 45.648)
+# ------------------------------------------------------------
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+from utils.dates import format_dates, csv_format
+
+CSV_ENGINES = ("pandas", "arrow")
+DEFAULT_CSV_ENGINE = "pandas"
+BOM = b"\xef\xbb\xbf"
+# Bytes por bloque al leer en streaming con arrow (~ varios miles de filas)
+ARROW_BLOCK_SIZE = 16 << 20
+
+
+def check_engine(engine):
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Motor CSV no soportado: {engine} (opciones: {', '.join(CSV_ENGINES)})")
+    return engine
+
+
+def _arrow_type(dtype):
+    # Solo pedimos categorías al lector (ver schema.read_dtypes)
+    if str(dtype) == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(pd.api.types.pandas_dtype(dtype))
+
+
+def _convert_options(columns, dtypes):
+    return pacsv.ConvertOptions(
+        include_columns=list(columns) if columns is not None else None,
+        column_types={c: _arrow_type(t) for c, t in (dtypes or {}).items()},
+        # Celda vacía → nulo, igual que pandas
+        strings_can_be_null=True,
+    )
+
+
+def _to_pandas(table):
+    return table.to_pandas(date_as_object=False)
+
+
+def read_csv(path, engine=DEFAULT_CSV_ENGINE, columns=None, dtypes=None):
+    """
+    Lee un CSV completo (utf-8, con o sin BOM) a DataFrame.
+
+    - columns: proyección de columnas (nombres reales)
+    - dtypes: tipos a aplicar al leer (ej: {"Brand": "category"})
+    """
+    if check_engine(engine) == "pandas":
+        return pd.read_csv(path, encoding="utf-8-sig", usecols=columns, dtype=dtypes)
+    table = pacsv.read_csv(path, read_options=pacsv.ReadOptions(use_threads=True),
+                           convert_options=_convert_options(columns, dtypes))
+    return _to_pandas(table)
+
+
+def iter_csv(path, engine=DEFAULT_CSV_ENGINE, columns=None, dtypes=None,
+             batch_size=100_000, nrows=None, skip_row=None):
+    """
+    Lee un CSV por lotes de DataFrame.
+
+    Con arrow el tamaño de cada lote lo da el bloque leído (aprox.
+    batch_size filas). nrows / skip_row solo existen en pandas: si se
+    piden, leo con pandas.
+    """
+    if check_engine(engine) == "pandas" or nrows is not None or skip_row is not None:
+        yield from pd.read_csv(path, encoding="utf-8-sig", usecols=columns,
+                               chunksize=batch_size, nrows=nrows, skiprows=skip_row,
+                               dtype=dtypes)
+        return
+    reader = pacsv.open_csv(path, read_options=pacsv.ReadOptions(use_threads=True,
+                                                                 block_size=ARROW_BLOCK_SIZE),
+                            convert_options=_convert_options(columns, dtypes))
+    pending, pending_rows = [], 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= batch_size:
+            yield _to_pandas(pa.Table.from_batches(pending))
+            pending, pending_rows = [], 0
+    if pending:
+        yield _to_pandas(pa.Table.from_batches(pending))
+
+
+def _arrow_table(df):
+    """DataFrame → tabla Arrow con los valores como los escribiría pandas."""
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            # Formato de pandas, calculado solo sobre las fechas distintas
+            columns[name] = pa.array(format_dates(series, csv_format(series)).astype(object),
+                                     type=pa.string(), from_pandas=True)
+            continue
+        array = pa.array(series, from_pandas=True) if not isinstance(series.dtype, pd.CategoricalDtype) \
+            else pa.array(series.astype(object), from_pandas=True)
+        if pa.types.is_boolean(array.type):
+            array = pc.if_else(array, "True", "False")
+        columns[name] = array
+    return pa.table(columns)
+
+
+class CsvWriter:
+    """
+    Escribe un CSV (de una vez o lote a lote) con el motor elegido.
+    Siempre con BOM utf-8 (Excel / Power BI detectan la codificación).
+
+    Uso:
+        with CsvWriter(path, engine="arrow") as w:
+            for df in lotes:
+                w.write(df)
+    """
+
+    def __init__(self, path, engine=DEFAULT_CSV_ENGINE):
+        self.path = path
+        self.engine = check_engine(engine)
+        self._header_written = False
+        self._schema = None
+        self._writer = None
+        self._sink = None
+
+    def write(self, df):
+        if self.engine == "pandas":
+            df.to_csv(self.path, mode="a" if self._header_written else "w",
+                      header=not self._header_written, index=False,
+                      encoding="utf-8" if self._header_written else "utf-8-sig")
+            self._header_written = True
+            return
+        table = _arrow_table(df)
+        if self._writer is None:
+            self._schema = table.schema
+            self._sink = open(self.path, "wb")
+            self._sink.write(BOM)
+            self._writer = pacsv.CSVWriter(self._sink, self._schema,
+                                           write_options=pacsv.WriteOptions(quoting_header="none"))
+        # Un lote con una columna toda nula llega con otro tipo: lo alineo al primero
+        self._writer.write_table(table if table.schema == self._schema else table.cast(self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_csv(df, path, engine=DEFAULT_CSV_ENGINE):
+    """Escribe un DataFrame completo como CSV (utf-8 con BOM)."""
+    with CsvWriter(path, engine) as writer:
+        writer.write(df)
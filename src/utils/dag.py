@@ -0,0 +1,138 @@
+# ------------------------------------------------------------
+# Script: dag.py
+#
+# Mini planificador de tareas con dependencias (un DAG).
+#
+# Cada tarea es una función con un nombre y una lista de tareas
+# de las que depende. Una tarea arranca apenas terminan bien sus
+# dependencias, sin esperar al resto del pipeline:
+#
+#   extract(dim_Customers) → curate(dim_Customers) → load(dim_Customers)
+#   extract(fact_Invoices) → curate(fact_Invoices) → load(fact_Invoices)
+#
+# Así dim_Customers puede estar limpiándose mientras fact_Invoices
+# todavía se descarga.
+#
+# Si una tarea falla, todo lo que depende de ella (directa o
+# indirectamente) se marca como "skipped" y no se ejecuta.
+# ------------------------------------------------------------
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Task:
+    """
+    Nodo del grafo.
+
+    - name: identificador único (ej: "curate:dim_Customers")
+    - fn: función que recibe {dependencia: resultado} y devuelve su resultado.
+      Si devuelve un dict con "ok": False, la tarea cuenta como fallida.
+    - deps: nombres de las tareas que deben terminar bien antes
+    """
+
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+
+
+def _validate(tasks):
+    by_name = {}
+    for task in tasks:
+        if task.name in by_name:
+            raise ValueError(f"Tarea duplicada: {task.name}")
+        by_name[task.name] = task
+    for task in tasks:
+        missing = [d for d in task.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"{task.name} depende de tareas inexistentes: {missing}")
+
+    # Detecto ciclos (orden topológico de Kahn)
+    pending = {t.name: len(t.deps) for t in tasks}
+    ready = [n for n, c in pending.items() if c == 0]
+    seen = 0
+    while ready:
+        name = ready.pop()
+        seen += 1
+        for t in tasks:
+            if name in t.deps:
+                pending[t.name] -= 1
+                if pending[t.name] == 0:
+                    ready.append(t.name)
+    if seen != len(tasks):
+        raise ValueError("El grafo de tareas tiene un ciclo")
+    return by_name
+
+
+def _failed(result):
+    return isinstance(result, dict) and result.get("ok") is False
+
+
+def run_dag(tasks, workers=4, logger=None):
+    """
+    Ejecuta las tareas respetando dependencias, con hasta "workers" a la vez.
+
+    Devuelve {nombre: {"status": ok|failed|skipped, "result", "seconds"}}.
+    Una excepción dentro de una tarea no corta el resto del grafo: solo
+    frena lo que cuelga de ella.
+    """
+    by_name = _validate(tasks)
+    state = {t.name: None for t in tasks}
+    outcome = {}
+
+    def finish(name, status, result=None, seconds=0.0):
+        state[name] = status
+        outcome[name] = {"status": status, "result": result, "seconds": seconds}
+
+    def timed(task, inputs):
+        start = time.perf_counter()
+        result = task.fn(inputs)
+        return result, round(time.perf_counter() - start, 2)
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while True:
+            # Propago fallas: si una dependencia no terminó bien, me salto
+            changed = True
+            while changed:
+                changed = False
+                for task in tasks:
+                    if state[task.name] is None and task.name not in running.values() \
+                            and any(state[d] in (FAILED, SKIPPED) for d in task.deps):
+                        finish(task.name, SKIPPED)
+                        changed = True
+                        if logger:
+                            logger.warning(f"[DAG] {task.name} omitida (falló una dependencia)")
+
+            # Lanzo todo lo que ya tiene sus dependencias OK
+            for task in tasks:
+                if state[task.name] is None and task.name not in running.values() \
+                        and all(state[d] == OK for d in task.deps):
+                    inputs = {d: outcome[d]["result"] for d in task.deps}
+                    running[executor.submit(timed, task, inputs)] = task.name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, seconds = future.result()
+                except Exception:
+                    if logger:
+                        logger.error(f"[DAG] {name} falló", exc_info=True)
+                    finish(name, FAILED)
+                    continue
+                status = FAILED if _failed(result) else OK
+                finish(name, status, result, seconds)
+                if logger:
+                    level = logger.info if status == OK else logger.error
+                    level(f"[DAG] {name}: {status} ({seconds}s)")
+
+    return {name: outcome[name] for name in by_name}
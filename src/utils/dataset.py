@@ -0,0 +1,237 @@
+# ------------------------------------------------------------
+# Script: dataset.py
+#
+# Escritura de la tabla de hechos curated como dataset Parquet
+# particionado estilo Hive (año / mes de la fecha de factura):
+#
+#   data/curated/fact_Invoices_curated/
+#       _manifest.json
+#       year=2024/month=1/part-0.parquet
+#       year=2024/month=2/part-0.parquet
+#       ...
+#
+# ¿Por qué?
+#   • Power BI / Fabric / pyarrow leen solo las carpetas de los meses
+#     que piden (poda de particiones) en vez del archivo entero.
+#   • Dentro de cada archivo los row groups tienen un tamaño fijo y
+#     estadísticas min/max por columna → los filtros por fecha saltan
+#     row groups completos (predicate pushdown).
+#   • Cada partición guarda un hash de su contenido en el manifiesto.
+#     Si en una corrida incremental solo llegaron facturas del último
+#     mes, solo esa carpeta se reescribe; las demás quedan intactas.
+#
+# El manifiesto usa el mismo formato que los parts de RAW ("parts" con
+# "file" y "rows"), así read_raw() / iter_raw_batches() lo leen igual.
+# ------------------------------------------------------------
+
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.raw_io import MANIFEST_NAME, _infer_schema
+
+PARTITION_COLS = ("year", "month")
+# Filas por row group: bastante grande para comprimir bien, bastante
+# chico para que las estadísticas min/max descarten trozos útiles
+DEFAULT_ROW_GROUP_SIZE = 128_000
+# Tope de filas esperando en memoria entre todas las particiones (los
+# restos de menos de un row group), en row groups; al pasarlo bajo a
+# disco los más grandes
+MAX_BUFFERED_ROW_GROUPS = 4
+DEFAULT_COMPRESSION = "snappy"
+STAGING_SUFFIX = ".staging"
+
+
+def partition_path(year, month):
+    return f"year={year}/month={month}"
+
+
+def read_manifest(dataset_dir):
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class PartitionedWriter:
+    """
+    Escribe un DataFrame (entero o lote a lote) como dataset particionado
+    por año/mes de date_col.
+
+    - dataset_dir: carpeta destino del dataset
+    - date_col: columna datetime de la que salen year / month
+    - row_group_size: filas por row group
+    - compression: códec Parquet
+    - max_buffered_rows: tope de filas en memoria entre todas las particiones
+      (default: MAX_BUFFERED_ROW_GROUPS row groups)
+
+    Escribo cada partición en una carpeta de staging; al cerrar comparo
+    el hash de cada una con el del manifiesto anterior y solo reemplazo
+    (os.replace) las que cambiaron. Las particiones que ya no vienen en
+    los datos se borran.
+
+    Cada partición junta filas hasta completar un row group. Los restos
+    no esperan al cierre: cuando llega un lote de un mes posterior, los
+    meses anteriores se bajan a disco (aunque el row group quede más
+    chico), y si el total en memoria pasa max_buffered_rows bajo los
+    restos más grandes.
+
+    Uso:
+        with PartitionedWriter(carpeta, "invoice_date") as w:
+            for df in lotes:
+                w.write(df)
+        resumen = w.summary
+    """
+
+    def __init__(self, dataset_dir, date_col, table=None,
+                 row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=DEFAULT_COMPRESSION,
+                 max_buffered_rows=None):
+        self.dataset_dir = dataset_dir
+        self.staging_dir = dataset_dir + STAGING_SUFFIX
+        self.date_col = date_col
+        self.table = table
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.max_buffered_rows = max_buffered_rows or MAX_BUFFERED_ROW_GROUPS * row_group_size
+        self.schema = None
+        self.summary = None
+        self._parts = {}     # (year, month) → estado de la partición
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+        os.makedirs(self.staging_dir)
+
+    def write(self, df):
+        if df.empty:
+            return
+        if self.schema is None:
+            self.schema = _infer_schema(df)
+        dates = pd.to_datetime(df[self.date_col])
+        keys = pd.DataFrame({"year": dates.dt.year, "month": dates.dt.month})
+        groups = keys.groupby(["year", "month"], sort=True).indices
+        for (year, month), pos in groups.items():
+            self._append(int(year), int(month), df.iloc[pos])
+
+        # Los lotes llegan ordenados por fecha: un mes anterior al de este
+        # lote ya no debería recibir filas, así que bajo su resto a disco
+        first = min((int(y), int(m)) for y, m in groups)
+        for key, part in self._parts.items():
+            if key < first and part["buffered"]:
+                self._flush(part, final=True)
+        buffered = {key: part["buffered"] for key, part in self._parts.items()}
+        total = sum(buffered.values())
+        for key in sorted(buffered, key=buffered.get, reverse=True):
+            if total <= self.max_buffered_rows:
+                break
+            total -= buffered[key]
+            self._flush(self._parts[key], final=True)
+
+    def _append(self, year, month, df):
+        part = self._parts.get((year, month))
+        if part is None:
+            folder = os.path.join(self.staging_dir, partition_path(year, month))
+            os.makedirs(folder)
+            part = self._parts[(year, month)] = {
+                "path": os.path.join(folder, "part-0.parquet"),
+                "writer": None, "buffer": [], "buffered": 0, "rows": 0,
+                "hash": hashlib.sha256(),
+            }
+        # Hash del contenido en orden de llegada (independiente de cómo
+        # se partió en lotes)
+        part["hash"].update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        part["rows"] += len(df)
+        # Cada archivo guarda solo las categorías que usa su partición
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df = df.assign(**{col: df[col].cat.remove_unused_categories()})
+        part["buffer"].append(df)
+        part["buffered"] += len(df)
+        if part["buffered"] >= self.row_group_size:
+            self._flush(part)
+
+    def _flush(self, part, final=False):
+        # Solo escribo row groups completos; el resto espera (final=True
+        # escribe también el resto)
+        if not part["buffer"]:
+            return
+        data = pd.concat(part["buffer"], ignore_index=True)
+        cut = len(data) if final else (len(data) // self.row_group_size) * self.row_group_size
+        if part["writer"] is None:
+            part["writer"] = pq.ParquetWriter(part["path"], self.schema,
+                                              compression=self.compression,
+                                              write_statistics=True)
+        if cut:
+            table = pa.Table.from_pandas(data.iloc[:cut], schema=self.schema, preserve_index=False)
+            part["writer"].write_table(table, row_group_size=self.row_group_size)
+        rest = data.iloc[cut:]
+        part["buffer"] = [rest] if len(rest) else []
+        part["buffered"] = len(rest)
+
+    def close(self):
+        previous = read_manifest(self.dataset_dir) or {}
+        old_parts = {p["file"]: p for p in previous.get("parts", [])}
+        os.makedirs(self.dataset_dir, exist_ok=True)
+
+        written, unchanged, entries = [], [], []
+        for (year, month), part in sorted(self._parts.items()):
+            self._flush(part, final=True)
+            part["writer"].close()
+            rel = f"{partition_path(year, month)}/part-0.parquet"
+            digest = part["hash"].hexdigest()
+            final = os.path.join(self.dataset_dir, rel)
+            old = old_parts.pop(rel, None)
+            if old and old.get("hash") == digest and os.path.exists(final):
+                unchanged.append(rel)
+            else:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(part["path"], final)
+                written.append(rel)
+            entries.append({"file": rel, "rows": part["rows"], "hash": digest,
+                            "partition": {"year": year, "month": month}})
+
+        # Particiones que ya no existen en los datos
+        removed = []
+        for rel in old_parts:
+            folder = os.path.dirname(os.path.join(self.dataset_dir, rel))
+            shutil.rmtree(folder, ignore_errors=True)
+            year_dir = os.path.dirname(folder)
+            if os.path.isdir(year_dir) and not os.listdir(year_dir):
+                os.rmdir(year_dir)
+            removed.append(rel)
+
+        manifest = {
+            "table": self.table,
+            "key": self.date_col,
+            "format": "parquet",
+            "layout": "hive",
+            "partition_by": list(PARTITION_COLS),
+            "rows": sum(e["rows"] for e in entries),
+            "parts": entries,
+        }
+        tmp = os.path.join(self.dataset_dir, MANIFEST_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.dataset_dir, MANIFEST_NAME))
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+        self.summary = {"written": written, "unchanged": unchanged, "removed": removed,
+                        "rows": manifest["rows"]}
+        return self.summary
+
+    def abort(self):
+        for part in self._parts.values():
+            if part["writer"] is not None:
+                part["writer"].close()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
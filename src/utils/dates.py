@@ -0,0 +1,146 @@
+# ------------------------------------------------------------
+# Script: dates.py
+#
+# Parseo y formateo de fechas sobre los valores únicos.
+#
+# Antes transform_fact_invoices hacía:
+#   pd.to_datetime(df[col], errors="coerce")   → sin formato: pandas lo
+#                                                 adivina y parsea fila a fila
+#   df[col].dt.strftime("%Y-%m-%d")            → formatea cada fila
+# Pero una tabla de facturas tiene millones de filas y solo unos pocos
+# miles de fechas distintas. Ahora:
+#   • el formato se detecta una vez (sobre una muestra de valores
+#     únicos) y se recuerda por columna para los lotes siguientes de la
+#     misma corrida (forget_formats lo olvida al empezar otra)
+#   • un formato solo se acepta si parsea todos los valores de la
+#     muestra; los valores que aun así no encajan se parsean uno a uno
+#     (format="mixed", como hacía pandas) en vez de quedar en NaT
+#   • se parsean / formatean solo los valores únicos (factorize) y el
+#     resultado se reparte a las filas con un take
+#   • si el formato recordado deja de servir (otra tabla, otra fuente)
+#     se vuelve a detectar
+# ------------------------------------------------------------
+
+import threading
+import numpy as np
+import pandas as pd
+
+# Formatos que pruebo, en orden (gana el primero que parsea la muestra)
+CANDIDATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y%m%d",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+]
+# Valores únicos que uso para detectar el formato
+SAMPLE_SIZE = 200
+
+# Formato detectado por columna (las tablas se curan en paralelo)
+_formats = {}
+_lock = threading.Lock()
+
+
+def detect_format(values):
+    """
+    Primer formato de CANDIDATE_FORMATS que parsea todas las fechas de una
+    muestra de los valores (None si ninguno). Un valor que ningún formato
+    parsea (basura, no una fecha) no cuenta en contra.
+    """
+    sample = pd.Series(values).dropna().astype(str).head(SAMPLE_SIZE)
+    if sample.empty:
+        return None
+    matches = {fmt: pd.to_datetime(sample, format=fmt, errors="coerce").notna().to_numpy()
+               for fmt in CANDIDATE_FORMATS}
+    dates = np.logical_or.reduce(list(matches.values()))
+    if not dates.any():
+        return None
+    for fmt in CANDIDATE_FORMATS:
+        if matches[fmt][dates].all():
+            return fmt
+    return None
+
+
+def _fill_mixed(uniques, parsed):
+    """
+    Los valores que el formato no parseó (o todos, si no hay formato) se
+    parsean uno a uno: pandas infiere el formato de cada valor.
+    """
+    if parsed is None:
+        return pd.DatetimeIndex(pd.to_datetime(uniques, format="mixed", errors="coerce"))
+    missing = np.asarray(parsed.isna())
+    if not missing.any():
+        return parsed
+    values = pd.Series(parsed)
+    values[missing] = pd.to_datetime(uniques[missing], format="mixed", errors="coerce")
+    return pd.DatetimeIndex(values)
+
+
+def forget_formats(table):
+    """Olvida los formatos recordados de una tabla (al empezar a curarla)."""
+    with _lock:
+        for key in [k for k in _formats if k.startswith(f"{table}.")]:
+            del _formats[key]
+
+
+def parse_dates(series, key=None, stats=None):
+    """
+    Equivalente a pd.to_datetime(series, errors="coerce") parseando
+    solo los valores distintos.
+
+    - key: nombre con que recordar el formato detectado (ej: "fact_Invoices.invoice_date");
+      sin key se detecta en cada llamada
+    - stats: dict donde sumo en "coerced" las filas con valor que no es
+      fecha (quedan en NaT)
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Index(uniques).astype(str) if len(uniques) else pd.Index([], dtype=object)
+
+    fmt = _formats.get(key) if key else None
+    parsed = pd.to_datetime(uniques, format=fmt, errors="coerce") if fmt else None
+    if parsed is None or parsed.isna().any():
+        # Sin formato recordado, o el recordado ya no parsea todo → detecto de nuevo
+        detected = detect_format(uniques)
+        # Si no aparece un formato mejor, sigo con el recordado y lo que
+        # no parseó se completa valor a valor
+        if parsed is None or (detected and detected != fmt):
+            parsed = (pd.to_datetime(uniques, format=detected, errors="coerce")
+                      if detected else None)
+        if key and detected:
+            with _lock:
+                _formats[key] = detected
+    parsed = _fill_mixed(uniques, parsed)
+
+    values = pd.api.extensions.take(parsed.array, codes, allow_fill=True)
+    if stats is not None:
+        failed = np.flatnonzero(pd.isna(parsed))
+        coerced = int(np.isin(codes, failed).sum()) if len(failed) else 0
+        stats["coerced"] = stats.get("coerced", 0) + coerced
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def format_dates(series, fmt="%Y-%m-%d"):
+    """Equivalente a series.dt.strftime(fmt) formateando solo las fechas distintas."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    texts = pd.Index(uniques).strftime(fmt) if len(uniques) else pd.Index([], dtype=object)
+    values = pd.api.extensions.take(texts.array, codes, allow_fill=True)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def csv_format(series):
+    """
+    Formato con que pandas.to_csv escribe una columna datetime: solo la
+    fecha si todas son a medianoche, si no fecha y hora (y microsegundos
+    si hacen falta).
+    """
+    values = series.dropna()
+    if values.empty or (values == values.dt.normalize()).all():
+        return "%Y-%m-%d"
+    if (values.dt.microsecond == 0).all() and (values.dt.nanosecond == 0).all():
+        return "%Y-%m-%d %H:%M:%S"
+    return "%Y-%m-%d %H:%M:%S.%f"
@@ -0,0 +1,110 @@
+# ------------------------------------------------------------
+# Script: db.py
+#
+# Ayudante de conexiones. Aquí armo la cadena ODBC desde el .env
+# y dejo un "pool" pequeño de conexiones reutilizables.
+#
+# ¿Por qué un pool?
+#   pyodbc no permite compartir una misma conexión entre hilos.
+#   Si quiero extraer varias tablas en paralelo, cada hilo necesita
+#   su propia conexión, pero sin abrir una nueva por cada tabla
+#   ni saturar la base con conexiones de más.
+# ------------------------------------------------------------
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+
+def build_conn_str():
+    """
+    Arma la cadena de conexión ODBC con las variables del .env
+    (ODBC_DRIVER, AZURE_SQL_SERVER, AZURE_SQL_USER, AZURE_SQL_PASSWORD, AZURE_SQL_DB).
+    """
+    driver = os.getenv("ODBC_DRIVER")
+    server = os.getenv("AZURE_SQL_SERVER")
+    user = os.getenv("AZURE_SQL_USER")
+    password = os.getenv("AZURE_SQL_PASSWORD")
+    database = os.getenv("AZURE_SQL_DB")
+    return (
+        f"DRIVER={{{driver}}};"
+        f"SERVER={server};"
+        f"UID={user};PWD={password};"
+        f"DATABASE={database};"
+        f"Encrypt=yes;TrustServerCertificate=yes"
+    )
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones DB-API.
+
+    - factory: función sin argumentos que abre una conexión nueva
+      (ej: lambda: pyodbc.connect(conn_str, timeout=10) o sqlite3.connect)
+    - size: máximo de conexiones abiertas al mismo tiempo
+
+    Las conexiones se abren bajo demanda (lazy) hasta llegar a "size".
+    Si todas están ocupadas, el hilo espera a que otro devuelva una.
+    """
+
+    def __init__(self, factory, size=4):
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser >= 1")
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        if self._closed:
+            raise RuntimeError("El pool ya fue cerrado")
+
+        # Reutilizo una conexión libre si la hay
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Si no llegué al máximo, abro una nueva
+        with self._lock:
+            if len(self._all) < self.size:
+                cnxn = self.factory()
+                self._all.append(cnxn)
+                return cnxn
+
+        # Pool lleno → espero a que se libere alguna
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No hay conexiones libres en el pool") from None
+
+    def release(self, cnxn):
+        self._idle.put(cnxn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Uso: with pool.connection() as cnxn: ..."""
+        cnxn = self.acquire(timeout=timeout)
+        try:
+            yield cnxn
+        finally:
+            self.release(cnxn)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for cnxn in self._all:
+                try:
+                    cnxn.close()
+                except Exception:
+                    pass
+            self._all.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
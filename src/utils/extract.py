@@ -0,0 +1,475 @@
+# ------------------------------------------------------------
+# Script: extract.py
+#
+# Ayudante para la fase Extract. Aquí dejo la lógica de
+# descarga "en streaming": en vez de traer una tabla completa
+# a memoria con pd.read_sql, leo filas por lotes (fetchmany)
+# y cada lote lo agrego de inmediato al archivo RAW.
+#
+# Así el consumo de memoria depende del tamaño del lote y no
+# del tamaño de la tabla (clave para fact.Invoices).
+#
+# El formato de salida (CSV, Parquet o Arrow) lo resuelve
+# utils/raw_io.py; aquí solo me ocupo de traer los lotes.
+#
+# Funciona con cualquier conexión DB-API (pyodbc en producción,
+# sqlite3 para pruebas locales).
+#
+# También dejo aquí la extracción particionada por rangos de clave
+# (ver sección más abajo).
+# ------------------------------------------------------------
+
+import os
+import json
+import math
+import shutil
+import time
+import contextvars
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow.parquet as pq
+import pyarrow.ipc as ipc
+from utils.raw_io import (RawBatchWriter, schema_from_description, count_raw_rows,
+                          format_of, read_raw_file, iter_raw_batches, raw_columns,
+                          resolve_columns, EXTENSIONS, MANIFEST_NAME, DEFAULT_READ_BATCH)
+
+# Tamaño de lote por defecto (filas por fetchmany)
+DEFAULT_BATCH_SIZE = 50_000
+
+
+def _execute(cursor, query, params=None):
+    # sqlite3 no acepta params=None, por eso separo ambos casos
+    if params:
+        cursor.execute(query, params)
+    else:
+        cursor.execute(query)
+    return cursor.description
+
+
+def _fetch_batches(cursor, columns, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        # pyodbc devuelve objetos Row → los paso a tupla. coerce_float: los
+        # DECIMAL/MONEY llegan como Decimal y pasan a float (como pd.read_sql);
+        # si no, Arrow no los puede escribir con el esquema float64
+        yield pd.DataFrame.from_records([tuple(r) for r in rows], columns=columns,
+                                        coerce_float=True)
+
+
+def iter_query_batches(cnxn, query, batch_size=DEFAULT_BATCH_SIZE, params=None):
+    """
+    Ejecuta una consulta y devuelve sus filas por lotes como DataFrames.
+
+    - cnxn: conexión DB-API (pyodbc, sqlite3, ...)
+    - query: consulta SQL a ejecutar
+    - batch_size: filas por lote (fetchmany)
+    - params: parámetros opcionales de la consulta
+
+    Nunca tengo en memoria más de un lote a la vez.
+    """
+    cursor = cnxn.cursor()
+    try:
+        description = _execute(cursor, query, params)
+        columns = [col[0] for col in description]
+        yield from _fetch_batches(cursor, columns, batch_size)
+    finally:
+        cursor.close()
+
+
+def stream_query_to_file(cnxn, query, file_path, batch_size=DEFAULT_BATCH_SIZE,
+                         params=None, logger=None, on_batch=None,
+                         fmt="csv", compression=None, schema=None):
+    """
+    Descarga el resultado de una consulta directo a archivo, lote por lote.
+
+    Escribo primero en un archivo temporal (".part") y al terminar lo
+    renombro: si la extracción falla a mitad, no queda un RAW
+    incompleto que parezca válido.
+
+    - fmt / compression: formato RAW ("csv", "parquet", "arrow") y códec
+    - on_batch: callback opcional que recibe cada lote (ej: para llevar
+      el máximo de la clave incremental sin releer el archivo)
+    - schema: esquema Arrow a usar si el driver no informa tipos
+      (ej: el del catálogo, ver utils/catalog.py)
+
+    Devuelve el total de filas escritas.
+    """
+    tmp_path = file_path + ".part"
+    total_rows = 0
+
+    cursor = cnxn.cursor()
+    try:
+        description = _execute(cursor, query, params)
+        columns = [col[0] for col in description]
+
+        # Si el driver informa tipos, el esquema queda fijo desde el inicio;
+        # si no, uso el recibido (solo si trae las mismas columnas)
+        if schema is not None and schema.names != columns:
+            schema = None
+        with RawBatchWriter(tmp_path, fmt, compression, columns=columns,
+                            schema=schema_from_description(description) or schema) as writer:
+            for batch_num, df in enumerate(_fetch_batches(cursor, columns, batch_size), start=1):
+                writer.write(df)
+                total_rows += len(df)
+                if on_batch:
+                    on_batch(df)
+                if logger:
+                    logger.info(f"[BATCH] {os.path.basename(file_path)} "
+                                f"lote {batch_num}: {len(df)} filas (acumulado: {total_rows})")
+
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cursor.close()
+
+    return total_rows
+
+
+# ============================================================
+# Extracción particionada por rangos de clave
+# ============================================================
+# Para tablas grandes (fact.Invoices) divido la tabla en N rangos
+# sobre una columna numérica o de fecha y bajo cada rango en su
+# propio archivo "part". Cada rango es una consulta independiente:
+#   - se pueden bajar en paralelo (una conexión por rango)
+#   - si un rango falla, se reintenta solo ese rango
+#
+# Los parts quedan en una carpeta con un _manifest.json que lista
+# los archivos y sus rangos → así se leen luego como un solo dataset.
+# ------------------------------------------------------------
+
+def get_key_bounds(cnxn, table, key):
+    """Devuelve (MIN(key), MAX(key)) de la tabla."""
+    cursor = cnxn.cursor()
+    try:
+        cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+        row = cursor.fetchone()
+        return row[0], row[1]
+    finally:
+        cursor.close()
+
+
+def count_key_value(cnxn, table, key, value):
+    """Filas de la tabla con key == value."""
+    cursor = cnxn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} = ?", (value,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def _as_param(ts, sample):
+    # Devuelvo el límite en el mismo "tipo" que trae la base:
+    # texto (sqlite), date o datetime (pyodbc)
+    if isinstance(sample, str):
+        return ts.strftime("%Y-%m-%d") if len(sample) == 10 else ts.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(sample, dt.date) and not isinstance(sample, dt.datetime):
+        return ts.date()
+    return ts.to_pydatetime()
+
+
+def compute_key_ranges(min_value, max_value, n_parts):
+    """
+    Divide [min_value, max_value] en hasta n_parts rangos contiguos.
+
+    Devuelve una lista de tuplas (desde, hasta). Todos los rangos son
+    [desde, hasta) salvo el último, que es [desde, hasta] (incluye el máximo).
+    Soporta claves numéricas y de fecha.
+    """
+    if min_value is None or max_value is None:
+        return []
+    n_parts = max(1, n_parts)
+
+    # Claves enteras: cortes enteros (nunca rangos vacíos de más)
+    if isinstance(min_value, int) and isinstance(max_value, int):
+        step = max(1, math.ceil((max_value - min_value + 1) / n_parts))
+        bounds = list(range(min_value, max_value + 1, step)) + [max_value]
+        return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)] or [(min_value, max_value)]
+
+    # Claves decimales
+    if isinstance(min_value, float) or isinstance(max_value, float):
+        step = (max_value - min_value) / n_parts
+        if step == 0:
+            return [(min_value, max_value)]
+        bounds = [min_value + i * step for i in range(n_parts)] + [max_value]
+        return [(bounds[i], bounds[i + 1]) for i in range(n_parts)]
+
+    # Claves de fecha (datetime, date o texto ISO)
+    lo, hi = pd.Timestamp(min_value), pd.Timestamp(max_value)
+    if lo == hi:
+        return [(min_value, max_value)]
+    cuts = pd.date_range(lo, hi, periods=n_parts + 1)
+    # Si la clave es de día (sin hora) redondeo los cortes al día
+    if lo == lo.normalize() and hi == hi.normalize():
+        cuts = cuts.normalize().unique()
+    params = [_as_param(ts, min_value) for ts in cuts]
+    params[0], params[-1] = min_value, max_value
+    return [(params[i], params[i + 1]) for i in range(len(params) - 1)]
+
+
+def build_range_queries(table, key, ranges, select="*"):
+    """
+    Arma una consulta parametrizada por rango. El primer rango también
+    trae las filas con clave NULL para no perder nada.
+
+    - select: columnas a traer ("*" o lista ya armada)
+    """
+    queries = []
+    for i, (lo, hi) in enumerate(ranges):
+        upper = "<=" if i == len(ranges) - 1 else "<"
+        where = f"({key} >= ? AND {key} {upper} ?)"
+        if i == 0:
+            where += f" OR {key} IS NULL"
+        queries.append((f"SELECT {select} FROM {table} WHERE {where}", (lo, hi)))
+    return queries
+
+
+def read_manifest(parts_dir):
+    with open(os.path.join(parts_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(parts_dir, manifest):
+    tmp_path = os.path.join(parts_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(parts_dir, MANIFEST_NAME))
+
+
+def extract_partitioned(pool, table, key, n_parts, parts_dir,
+                        batch_size=DEFAULT_BATCH_SIZE, workers=None,
+                        retries=2, logger=None, on_batch=None,
+                        fmt="csv", compression=None, select="*", schema=None):
+    """
+    Extrae una tabla en n_parts rangos de "key" en paralelo.
+
+    - pool: ConnectionPool (utils/db.py); cada rango usa su propia conexión
+    - parts_dir: carpeta destino (un archivo por rango + _manifest.json)
+    - fmt / compression: formato RAW de cada part
+    - workers: rangos en paralelo (default: tamaño del pool)
+    - retries: reintentos por rango antes de darlo por perdido
+    - select / schema: columnas a traer y esquema Arrow de respaldo
+      (ver stream_query_to_file)
+
+    Devuelve el total de filas. Si algún rango falla tras los reintentos,
+    lanza RuntimeError y NO escribe el manifest (el dataset queda inválido).
+    """
+    # Los límites se leen en vivo (no del catálogo en caché): con un
+    # máximo viejo el último rango dejaría afuera las filas nuevas
+    with pool.connection() as cnxn:
+        min_value, max_value = get_key_bounds(cnxn, table, key)
+    ranges = compute_key_ranges(min_value, max_value, n_parts)
+    # Tabla vacía o clave toda NULL → un único "rango" sin filtro
+    queries = build_range_queries(table, key, ranges, select) or \
+        [(f"SELECT {select} FROM {table}", None)]
+
+    # Limpio parts de corridas anteriores
+    if os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    def fetch_slice(idx):
+        query, params = queries[idx]
+        file_path = os.path.join(parts_dir, f"part-{idx:05d}{EXTENSIONS[fmt]}")
+        for attempt in range(1, retries + 2):
+            start = time.perf_counter()
+            try:
+                with pool.connection() as cnxn:
+                    n_rows = stream_query_to_file(cnxn, query, file_path,
+                                                  batch_size=batch_size, params=params,
+                                                  on_batch=on_batch, fmt=fmt,
+                                                  compression=compression, schema=schema)
+                if logger:
+                    logger.info(f"[PART] {table} rango {idx} {params}: {n_rows} filas "
+                                f"en {time.perf_counter() - start:.2f}s")
+                return {"file": os.path.basename(file_path), "rows": n_rows,
+                        "range": [str(p) for p in params] if params else None}
+            except Exception:
+                if logger:
+                    logger.warning(f"[RETRY] {table} rango {idx} falló "
+                                   f"(intento {attempt}/{retries + 1})", exc_info=True)
+        raise RuntimeError(f"El rango {idx} de {table} falló tras {retries + 1} intentos")
+
+    with ThreadPoolExecutor(max_workers=workers or pool.size) as executor:
+        # copy_context: los rangos heredan la tabla/etapa del log del hilo que los lanza
+        futures = [executor.submit(contextvars.copy_context().run, fetch_slice, i)
+                   for i in range(len(queries))]
+        parts, errors = [], []
+        for f in futures:
+            try:
+                parts.append(f.result())
+            except Exception as e:
+                errors.append(str(e))
+
+    if errors:
+        raise RuntimeError("; ".join(errors))
+
+    manifest = {"table": table, "key": key, "format": fmt,
+                "rows": sum(p["rows"] for p in parts), "parts": parts}
+    _write_manifest(parts_dir, manifest)
+
+    return manifest["rows"]
+
+
+# ============================================================
+# Agregar filas nuevas (extracción incremental)
+# ============================================================
+def _key_mask(series, value):
+    # Filas con clave == value, sin importar cómo quedó escrita la clave
+    # (texto en CSV, fecha/timestamp en columnares)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return pd.to_numeric(series, errors="coerce") == value
+    if isinstance(value, (dt.date, dt.datetime)) or pd.api.types.is_datetime64_any_dtype(series):
+        return pd.to_datetime(series, errors="coerce") == pd.Timestamp(value)
+    return series.astype(str) == str(value)
+
+
+def _file_schema(file_path, fmt):
+    if fmt == "parquet":
+        return pq.read_schema(file_path)
+    with open(file_path, "rb") as source:
+        return ipc.open_file(source).schema
+
+
+def remove_key_rows(files, key, value, compression=None):
+    """
+    Borra de archivos RAW las filas con key == value (ej: el día de la
+    marca de agua, antes de agregarlo de nuevo completo).
+
+    Primero leo solo la columna clave: únicamente se reescriben los
+    archivos que tienen alguna fila a borrar. El CSV se relee como texto
+    para escribir las filas que quedan exactamente como estaban.
+    Devuelve {nombre de archivo: filas borradas}.
+    """
+    removed = {}
+    for file_path in files:
+        col = resolve_columns(file_path, [key])[0]
+        n_rows = int(_key_mask(read_raw_file(file_path, columns=[col])[col], value).sum())
+        if not n_rows:
+            continue
+
+        fmt = format_of(file_path)
+        tmp_path = file_path + ".tmp"
+        if fmt == "csv":
+            batches = pd.read_csv(file_path, dtype=str, keep_default_na=False,
+                                  chunksize=DEFAULT_READ_BATCH)
+            writer = RawBatchWriter(tmp_path, fmt, columns=raw_columns(file_path))
+        else:
+            batches = iter_raw_batches(file_path)
+            writer = RawBatchWriter(tmp_path, fmt, compression,
+                                    schema=_file_schema(file_path, fmt))
+        try:
+            with writer:
+                for df in batches:
+                    writer.write(df[~_key_mask(df[col], value)])
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        removed[os.path.basename(file_path)] = n_rows
+    return removed
+
+
+def append_query_to_csv(cnxn, query, file_path, batch_size=DEFAULT_BATCH_SIZE,
+                        params=None, logger=None, on_batch=None, replace=None):
+    """
+    Baja el delta de una consulta y lo agrega al final de un CSV existente.
+
+    Primero bajo el delta completo a un archivo aparte y recién después
+    lo agrego al RAW: si la descarga falla, el RAW queda intacto.
+
+    - replace: (clave, valor) cuyas filas ya en RAW se reemplazan por
+      las del delta (el delta trae "clave >= valor")
+
+    Devuelve la cantidad de filas agregadas.
+
+    (Parquet/Arrow no admiten "append": para esos formatos ver
+    promote_to_parts + append_query_to_parts.)
+    """
+    delta_path = file_path + ".delta"
+    try:
+        n_rows = stream_query_to_file(cnxn, query, delta_path, batch_size=batch_size,
+                                      params=params, logger=logger, on_batch=on_batch)
+        if replace:
+            removed = remove_key_rows([file_path], *replace)
+            if logger and removed:
+                logger.info(f"[REPLACE] {os.path.basename(file_path)}: quito "
+                            f"{sum(removed.values())} filas con {replace[0]} = {replace[1]}")
+        if n_rows:
+            with open(delta_path, "rb") as src, open(file_path, "ab") as dst:
+                src.readline()  # salto el encabezado
+                shutil.copyfileobj(src, dst)
+    finally:
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+    return n_rows
+
+
+def promote_to_parts(file_path, parts_dir, table, key):
+    """
+    Convierte un RAW de archivo único en un dataset de parts con un
+    solo part (el archivo original, movido sin copiar). Así un RAW
+    columnar puede recibir deltas como parts nuevos.
+    """
+    fmt = format_of(file_path)
+    os.makedirs(parts_dir, exist_ok=True)
+    file_name = f"part-00000{EXTENSIONS[fmt]}"
+    n_rows = count_raw_rows(file_path)
+    os.replace(file_path, os.path.join(parts_dir, file_name))
+    _write_manifest(parts_dir, {"table": table, "key": key, "format": fmt, "rows": n_rows,
+                                "parts": [{"file": file_name, "rows": n_rows, "range": None}]})
+    return parts_dir
+
+
+def append_query_to_parts(cnxn, query, parts_dir, batch_size=DEFAULT_BATCH_SIZE,
+                          params=None, logger=None, on_batch=None, compression=None,
+                          replace=None):
+    """
+    Baja el delta de una consulta como un part nuevo de un dataset
+    particionado y lo registra en el manifest.
+
+    El part solo "existe" para los lectores cuando el manifest se
+    reescribe (rename atómico) al final.
+
+    - replace: (clave, valor) cuyas filas en los parts existentes se
+      reemplazan por las del delta (ver append_query_to_csv)
+
+    Devuelve la cantidad de filas agregadas.
+    """
+    manifest = read_manifest(parts_dir)
+    fmt = manifest.get("format", "csv")
+    next_idx = len(manifest["parts"])
+    file_name = f"part-{next_idx:05d}{EXTENSIONS[fmt]}"
+    file_path = os.path.join(parts_dir, file_name)
+
+    n_rows = stream_query_to_file(cnxn, query, file_path, batch_size=batch_size,
+                                  params=params, logger=logger, on_batch=on_batch,
+                                  fmt=fmt, compression=compression)
+
+    if replace:
+        removed = remove_key_rows([os.path.join(parts_dir, p["file"]) for p in manifest["parts"]],
+                                  *replace, compression=compression)
+        for part in manifest["parts"]:
+            part["rows"] -= removed.get(part["file"], 0)
+        manifest["rows"] -= sum(removed.values())
+        if logger and removed:
+            logger.info(f"[REPLACE] {os.path.basename(parts_dir)}: quito "
+                        f"{sum(removed.values())} filas con {replace[0]} = {replace[1]}")
+
+    if n_rows:
+        manifest["parts"].append({"file": file_name, "rows": n_rows,
+                                  "range": [f"{'>=' if replace else '>'} {params[0]}"]
+                                  if params else None})
+        manifest["rows"] += n_rows
+    else:
+        os.remove(file_path)
+    if n_rows or replace:
+        _write_manifest(parts_dir, manifest)
+    return n_rows
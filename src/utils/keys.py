@@ -0,0 +1,293 @@
+# ------------------------------------------------------------
+# Script: keys.py
+#
+# Índice de claves de las dimensiones (clave de negocio → clave
+# sustituta int32) para resolver las claves foráneas de fact_Invoices.
+#
+# Antes nadie revisaba que cada factura apuntara a un cliente y a un
+# producto que existen, y las claves de negocio viajaban tal cual
+# (en la fuente real pueden ser textos anchos). Ahora:
+#   • cada dimensión curated actualiza su índice: claves nuevas reciben
+#     el siguiente entero; las existentes conservan el suyo (estable
+#     entre corridas, así el modelo de Power BI no se desordena)
+#   • el índice se guarda en data/state/keys/<dimensión>.parquet (o en
+#     state/keys junto a otra carpeta curated: ver keys_dir_for)
+#   • los hechos se resuelven en bloque, sin bucles ni merge:
+#       - claves enteras en un rango razonable → arreglo denso
+#         (lookup = una indexación de numpy)
+#       - cualquier otra clave → índice hash de pandas (get_indexer)
+#   • las facturas cuyo cliente/producto no está en la dimensión actual
+#     quedan marcadas como huérfanas y se cuentan en el perfil. Cada clave
+#     del índice recuerda si hoy existe en la dimensión ("active"): un
+#     cliente borrado conserva su clave sustituta pero ya no cuenta como
+#     miembro, así sus facturas vuelven a aparecer como huérfanas
+#   • con claves sustitutas, una clave de negocio que no está en el índice
+#     entra como miembro inferido (active = False): recibe su propia
+#     clave sustituta y la clave de negocio queda guardada en el índice.
+#     Si el cliente aparece después en la dimensión, conserva esa clave
+#     y las facturas viejas quedan bien unidas
+# ------------------------------------------------------------
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+DEFAULT_KEYS_DIR = os.path.join("data", "state", "keys")
+# Clave sustituta de una factura sin cliente/producto (clave de negocio nula)
+ORPHAN_SK = -1
+# Claves enteras con (max - min) hasta este valor usan arreglo denso
+# (4 bytes por posición: 10M → ~40 MB como máximo)
+DENSE_MAX_RANGE = 10_000_000
+# Claves huérfanas de ejemplo que guardo en el perfil
+ORPHAN_SAMPLE = 10
+
+# Dimensiones con índice
+#   - key: clave de negocio en la dimensión curated
+#   - sk: columna de la clave sustituta
+#   - fact_key: columna de fact_Invoices que apunta a la dimensión
+DIMENSION_KEYS = {
+    "dim_Customers": {"key": "id_cliente", "sk": "customer_sk", "fact_key": "customerid"},
+    "dim_Products": {"key": "productkey", "sk": "product_sk", "fact_key": "productkey"},
+}
+
+# Un índice por archivo: las tablas se curan en paralelo en main_etl
+_locks = {name: threading.Lock() for name in DIMENSION_KEYS}
+
+
+def keys_dir_for(curated_folder):
+    """
+    Carpeta de índices que acompaña a una carpeta curated: <padre>/state/keys
+    (data/curated → data/state/keys, el default). Otra carpeta curated
+    (pruebas, escalas del benchmark) → otros índices, sin mezclar claves.
+    """
+    return os.path.join(os.path.dirname(os.path.normpath(curated_folder)), "state", "keys")
+
+
+def index_path(dimension, keys_dir=DEFAULT_KEYS_DIR):
+    return os.path.join(keys_dir, f"{dimension}.parquet")
+
+
+class KeyIndex:
+    """
+    Mapa clave de negocio → clave sustituta (int32, desde 1) de una
+    dimensión.
+
+    - dimension: tabla curated (ej: "dim_Customers")
+    - keys / sks: contenido inicial (ej: lo leído del archivo)
+    - active: si cada clave existe hoy en la dimensión (default: todas)
+
+    Uso:
+        idx = KeyIndex.load("dim_Customers")
+        idx.sync(dim_df["id_cliente"])
+        sk = idx.resolve(fact_df["customerid"])   # -1 = no está en el índice
+        ok = idx.members(fact_df["customerid"])   # False = huérfana
+        idx.save()
+    """
+
+    def __init__(self, dimension, keys=None, sks=None, active=None):
+        self.dimension = dimension
+        self.keys = pd.Series([] if keys is None else keys).reset_index(drop=True)
+        self.sks = np.asarray([] if sks is None else sks, dtype=np.int32)
+        self.active = (np.ones(len(self.sks), dtype=bool) if active is None
+                       else np.asarray(active, dtype=bool))
+        self.changed = False
+        self._lookup = None
+
+    @classmethod
+    def load(cls, dimension, keys_dir=DEFAULT_KEYS_DIR):
+        path = index_path(dimension, keys_dir)
+        if not os.path.exists(path):
+            return cls(dimension)
+        df = pd.read_parquet(path)
+        # Índices de antes de "active": todas sus claves venían de la dimensión
+        active = df["active"].to_numpy() if "active" in df.columns else None
+        return cls(dimension, df["key"], df["sk"].to_numpy(), active)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, values, active=True):
+        """
+        Agrega las claves que no estaban. Devuelve cuántas fueron nuevas.
+        - active: False para miembros inferidos (vistos solo en los hechos)
+        """
+        values = pd.Series(values).dropna().drop_duplicates()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(values.cat.categories.dtype)
+        if len(self.keys):
+            values = values[self._positions(values) < 0]
+        if values.empty:
+            return 0
+        start = int(self.sks.max()) + 1 if len(self.sks) else 1
+        new_sks = np.arange(start, start + len(values), dtype=np.int32)
+        # Índice vacío: tomo el tipo de las claves (no el object de una Series vacía)
+        self.keys = (pd.concat([self.keys, values], ignore_index=True) if len(self.keys)
+                     else values.reset_index(drop=True))
+        self.sks = np.concatenate([self.sks, new_sks])
+        self.active = np.concatenate([self.active, np.full(len(values), active, dtype=bool)])
+        self.changed = True
+        self._lookup = None
+        return len(values)
+
+    def sync(self, values):
+        """
+        Deja el índice al día con todas las claves actuales de la dimensión:
+        agrega las nuevas, reactiva las que vuelven (o eran inferidas) y
+        desactiva las que ya no están. Devuelve (nuevas, desactivadas).
+        """
+        values = pd.Series(values).dropna()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(values.cat.categories.dtype)
+        added = self.update(values)
+        active = np.zeros(len(self.keys), dtype=bool)
+        pos = self._positions(values)
+        active[pos[pos >= 0]] = True
+        removed = int((self.active & ~active).sum())
+        if (active != self.active).any():
+            self.active = active
+            self.changed = True
+        return added, removed
+
+    def _build_lookup(self):
+        keys = self.keys
+        if pd.api.types.is_integer_dtype(keys) and len(keys) and \
+                int(keys.max()) - int(keys.min()) <= DENSE_MAX_RANGE:
+            low = int(keys.min())
+            dense = np.full(int(keys.max()) - low + 1, -1, dtype=np.int64)
+            dense[keys.to_numpy(dtype=np.int64) - low] = np.arange(len(keys))
+            self._lookup = ("dense", low, dense)
+        else:
+            self._lookup = ("hash", pd.Index(keys))
+
+    def _positions(self, values):
+        """Posición de cada valor en self.keys (-1 si no está)."""
+        if self._lookup is None:
+            self._build_lookup()
+        values = pd.Series(values)
+        if self._lookup[0] == "dense":
+            _, low, dense = self._lookup
+            if not (pd.api.types.is_integer_dtype(values) or pd.api.types.is_float_dtype(values)):
+                values = pd.to_numeric(values.astype(object), errors="coerce")
+            raw = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = ~np.isnan(raw) & (raw == np.floor(raw))
+            offsets = np.where(valid, raw, low).astype(np.int64) - low
+            valid &= (offsets >= 0) & (offsets < len(dense))
+            pos = np.full(len(values), -1, dtype=np.int64)
+            pos[valid] = dense[offsets[valid]]
+            return pos
+        return self._lookup[1].get_indexer(values)
+
+    def resolve(self, values):
+        """Claves sustitutas (int32) de values; ORPHAN_SK si no están en el índice."""
+        pos = self._positions(values)
+        sk = np.full(len(pos), ORPHAN_SK, dtype=np.int32)
+        found = pos >= 0
+        sk[found] = self.sks[pos[found]]
+        return sk
+
+    def members(self, values):
+        """True donde el valor es una clave de la dimensión actual."""
+        pos = self._positions(values)
+        found = pos >= 0
+        member = np.zeros(len(pos), dtype=bool)
+        member[found] = self.active[pos[found]]
+        return member
+
+    def save(self, keys_dir=DEFAULT_KEYS_DIR):
+        os.makedirs(keys_dir, exist_ok=True)
+        path = index_path(self.dimension, keys_dir)
+        tmp = path + ".tmp"
+        pd.DataFrame({"key": self.keys, "sk": self.sks,
+                      "active": self.active}).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self.changed = False
+        return path
+
+
+def update_dimension(dimension, df, keys_dir=DEFAULT_KEYS_DIR, add_sk=False):
+    """
+    Sincroniza el índice con las claves de la dimensión curated (df trae
+    la dimensión completa) y lo guarda si cambió.
+    Con add_sk, devuelve df con la columna de clave sustituta agregada.
+    Devuelve (df, claves nuevas, claves que ya no están en la dimensión).
+    """
+    spec = DIMENSION_KEYS[dimension]
+    if spec["key"] not in df.columns:
+        return df, 0, 0
+    with _locks[dimension]:
+        index = KeyIndex.load(dimension, keys_dir)
+        added, removed = index.sync(df[spec["key"]])
+        if index.changed or not os.path.exists(index_path(dimension, keys_dir)):
+            index.save(keys_dir)
+    if add_sk:
+        df = df.assign(**{spec["sk"]: index.resolve(df[spec["key"]])})
+    return df, added, removed
+
+
+def load_indexes(keys_dir=DEFAULT_KEYS_DIR):
+    """Índices guardados de todas las dimensiones (vacíos si no existen)."""
+    indexes = {}
+    for dimension in DIMENSION_KEYS:
+        with _locks[dimension]:
+            indexes[dimension] = KeyIndex.load(dimension, keys_dir)
+    return indexes
+
+
+def save_indexes(indexes, keys_dir=DEFAULT_KEYS_DIR):
+    """Guarda los índices que cambiaron (ej: miembros inferidos desde los hechos)."""
+    saved = []
+    for dimension, index in indexes.items():
+        if index.changed:
+            with _locks[dimension]:
+                index.save(keys_dir)
+            saved.append(dimension)
+    return saved
+
+
+class OrphanCounter:
+    """Acumula huérfanas por columna de la tabla de hechos (lote a lote)."""
+
+    def __init__(self):
+        self.rows = {}
+        self.samples = {}
+
+    def add(self, column, values):
+        self.rows[column] = self.rows.get(column, 0) + len(values)
+        sample = self.samples.setdefault(column, [])
+        if len(sample) < ORPHAN_SAMPLE:
+            for v in pd.unique(pd.Series(values).dropna()):
+                if v not in sample and len(sample) < ORPHAN_SAMPLE:
+                    sample.append(v.item() if hasattr(v, "item") else v)
+
+    def result(self):
+        return {c: {"rows": n, "sample": self.samples.get(c, [])} for c, n in self.rows.items()}
+
+
+def resolve_fact_keys(df, indexes, counter, replace=False):
+    """
+    Resuelve las claves foráneas de un lote de hechos contra los índices.
+
+    - indexes: {dimensión: KeyIndex} (ver load_indexes)
+    - counter: OrphanCounter donde se suman las huérfanas (clave nula o
+      que no está en la dimensión actual)
+    - replace: si True, reemplaza customerid / productkey por
+      customer_sk / product_sk (int32). Una clave que no está en el índice
+      entra como miembro inferido (ver save_indexes); solo las nulas
+      quedan con ORPHAN_SK
+    """
+    for dimension, spec in DIMENSION_KEYS.items():
+        index = indexes.get(dimension)
+        if index is None or not len(index) or spec["fact_key"] not in df.columns:
+            continue
+        values = df[spec["fact_key"]]
+        orphans = ~index.members(values)
+        counter.add(spec["fact_key"], values.to_numpy()[orphans])
+        if replace:
+            if orphans.any():
+                index.update(values[orphans], active=False)
+            sk = index.resolve(values)
+            position = df.columns.get_loc(spec["fact_key"])
+            df = df.drop(columns=[spec["fact_key"]])
+            df.insert(position, spec["sk"], sk)
+    return df
@@ -8,23 +8,204 @@
 #
 # Así tengo trazabilidad del proceso: sé qué corrió,
 # a qué hora, y si hubo errores.
+#
+# [SIN BLOQUEAR A LOS WORKERS]
+#   • Antes cada logger tenía su propio FileHandler y StreamHandler:
+#     cada logger.info() de un lote escribía a disco en el mismo hilo
+#     que estaba extrayendo o limpiando.
+#   • Ahora todos los loggers comparten un solo handler de entrada. En
+#     modo asíncrono (default) el registro va a una cola y un hilo
+#     aparte (QueueListener) lo escribe en consola y archivo; el hilo
+#     que loguea solo arma el mensaje y sigue.
+#   • Al salir del proceso (atexit) se vacía la cola.
+#
+# [ROTACIÓN]
+#   • logs/etl.log rota por tamaño (10 MB, 5 respaldos por default:
+#     etl.log.1 ... etl.log.5). Se cambia con ETL_LOG_MAX_MB /
+#     ETL_LOG_BACKUPS o con configure_logging().
+#
+# [JSON]
+#   • Con json_format=True (o ETL_LOG_FORMAT=json) cada línea de
+#     logs/etl.log es un objeto JSON con time, level, logger, message,
+#     run_id, table y stage. La consola sigue en texto.
+#   • table / stage salen de log_context() (por hilo/tarea) o de
+#     extra={"table": ...}; run_id de set_run_id().
+#
+# [PROCESOS HIJOS]
+#   • Un proceso lanzado con ETL_LOG_CHILD=1 no escribe el archivo (dos
+#     procesos rotando el mismo archivo se pisan): manda sus líneas por
+#     stdout y el padre las re-emite con forward_child_line().
 # ------------------------------------------------------------
 
-import logging
 import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import contextlib
+import contextvars
+import logging.handlers
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Formato del hijo: sin fecha, la pone el padre al re-emitir
+CHILD_FORMAT = "%(name)s - %(levelname)s - %(message)s"
+DEFAULT_LOG_FILE = os.path.join("logs", "etl.log")
+DEFAULT_MAX_MB = 10
+DEFAULT_BACKUPS = 5
+CONTEXT_FIELDS = ("run_id", "table", "stage")
+
+# Campos de contexto del hilo/tarea actual (table, stage)
+_context = contextvars.ContextVar("log_context", default={})
+_run_id = None
+
+
+def _env_flag(name, default):
+    value = os.getenv(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "json")
+
+
+def set_run_id(run_id):
+    """Identificador de corrida que llevan todos los registros desde ahora."""
+    global _run_id
+    _run_id = run_id
+
 
-def get_logger(name="ETL", log_file="logs/etl.log"):
+@contextlib.contextmanager
+def log_context(**fields):
+    """
+    Agrega campos (table, stage) a los registros emitidos dentro del bloque.
+
+    Uso:
+        with log_context(table="fact_Invoices", stage="curate"):
+            logger.info("...")
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Completa run_id / table / stage en el hilo que loguea (no en el listener)."""
+
+    def filter(self, record):
+        fields = _context.get()
+        for name in CONTEXT_FIELDS:
+            if getattr(record, name, None) is None:
+                setattr(record, name, _run_id if name == "run_id" else fields.get(name))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro."""
+
+    def format(self, record):
+        data = {"time": self.formatTime(record), "level": record.levelname,
+                "logger": record.name, "message": record.getMessage()}
+        for name in CONTEXT_FIELDS:
+            data[name] = getattr(record, name, None)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _Dispatcher(logging.Handler):
+    """
+    Handler único que comparten todos los loggers del proyecto.
+
+    En modo asíncrono encola el registro (con el mensaje ya armado, por
+    si los argumentos cambian después); si no, lo pasa directo a los
+    destinos. configure_logging() cambia los destinos sin tocar los
+    loggers ya creados.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.addFilter(ContextFilter())
+        self.sinks = []
+        self.queue = None
+        self.listener = None
+
+    def emit(self, record):
+        if self.queue is not None:
+            record.msg = record.getMessage()
+            record.args = None
+            self.queue.put_nowait(record)
+            return
+        for sink in self.sinks:
+            if record.levelno >= sink.level:
+                sink.handle(record)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()   # escribe lo que quedaba en la cola
+            self.listener = None
+        self.queue = None
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+
+
+_dispatcher = _Dispatcher()
+atexit.register(_dispatcher.stop)
+
+
+def configure_logging(async_mode=None, json_format=None, log_file=DEFAULT_LOG_FILE,
+                      max_mb=None, backups=None):
+    """
+    Arma (o rearma) los destinos de todos los loggers del proyecto.
+
+    - async_mode: escribir desde un hilo aparte (default: ETL_LOG_ASYNC, sí)
+    - json_format: archivo en JSON (default: ETL_LOG_FORMAT=json, no)
+    - log_file: archivo de log (None = solo consola)
+    - max_mb / backups: rotación por tamaño (default: ETL_LOG_MAX_MB / ETL_LOG_BACKUPS)
+    """
+    child = _env_flag("ETL_LOG_CHILD", False)
+    async_mode = _env_flag("ETL_LOG_ASYNC", True) if async_mode is None else async_mode
+    json_format = (os.getenv("ETL_LOG_FORMAT", "").lower() == "json"
+                   if json_format is None else json_format)
+    max_mb = float(os.getenv("ETL_LOG_MAX_MB", DEFAULT_MAX_MB)) if max_mb is None else max_mb
+    backups = int(os.getenv("ETL_LOG_BACKUPS", DEFAULT_BACKUPS)) if backups is None else backups
+
+    _dispatcher.stop()
+    sinks = []
+
+    # Handler para mandar a consola (el hijo manda a stdout, que lee el padre)
+    console_handler = logging.StreamHandler(sys.stdout if child else None)
+    console_handler.setFormatter(logging.Formatter(CHILD_FORMAT if child else LOG_FORMAT))
+    sinks.append(console_handler)
+
+    # Handler para mandar a archivo, con rotación por tamaño
+    if log_file and not child:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=int(max_mb * 1024 ** 2), backupCount=backups, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+        sinks.append(file_handler)
+
+    for sink in sinks:
+        sink.setLevel(logging.INFO)
+    _dispatcher.sinks = sinks
+    # El hijo escribe directo: sus líneas tienen que llegar al padre en orden y sin demora
+    if async_mode and not child:
+        _dispatcher.queue = queue.SimpleQueue()
+        _dispatcher.listener = logging.handlers.QueueListener(
+            _dispatcher.queue, *sinks, respect_handler_level=True)
+        _dispatcher.listener.start()
+
+
+def get_logger(name="ETL", log_file=DEFAULT_LOG_FILE):
     """
     Devuelve un objeto logger configurado para este proyecto.
-    
+
     - name: permite distinguir de qué script viene el mensaje
-    - log_file: a dónde se guardará el log en disco
-    
+    - log_file: a dónde se guardará el log en disco (lo toma el primer
+      logger que se crea; para cambiarlo después, configure_logging())
+
     El logger soporta niveles de mensajes: INFO, ERROR, WARNING.
     """
-    # Me aseguro que la carpeta "logs" exista
-    os.makedirs("logs", exist_ok=True)
-
     # Creo un "logger" con el nombre que yo quiera (ej: ETL-SpaceParts)
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
@@ -33,23 +214,25 @@ def get_logger(name="ETL", log_file="logs/etl.log"):
     if logger.handlers:
         return logger
 
-    # Handler para mandar a archivo
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.INFO)
+    # Los destinos (consola + archivo) se arman una sola vez por proceso
+    if not _dispatcher.sinks:
+        configure_logging(log_file=log_file)
 
-    # Handler para mandar a consola
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+    logger.addHandler(_dispatcher)
+    return logger
 
-    # Defino formato uniforme: fecha, nombre, nivel, mensaje
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
 
-    # Agrego ambos destinos al logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-    return logger
\ No newline at end of file
+def forward_child_line(line, fallback):
+    """
+    Re-emite una línea de un proceso hijo (formato CHILD_FORMAT) con el
+    logger y el nivel originales. Lo que no tiene ese formato (prints,
+    trazas de excepciones) sale por el logger fallback.
+    """
+    line = line.rstrip("\n")
+    if not line:
+        return
+    parts = line.split(" - ", 2)
+    if len(parts) == 3 and parts[1] in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+        get_logger(parts[0]).log(getattr(logging, parts[1]), parts[2])
+    else:
+        fallback.info(line)
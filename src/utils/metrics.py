@@ -0,0 +1,195 @@
+# ------------------------------------------------------------
+# Script: metrics.py
+#
+# Métricas por etapa y tabla (tiempo, CPU, memoria, filas, bytes).
+#
+# Hasta ahora lo único que había eran las líneas de texto de
+# logs/etl.log y los tiempos se sacaban restando timestamps a mano.
+# Ahora cada tarea del pipeline (extract / curate / load / sql por
+# tabla) se mide con un context manager:
+#
+#   with metrics.measure("curate", "fact_Invoices") as m:
+#       ...
+#       m.rows_out = 1000
+#       m.bytes_written = 123456
+#
+# y queda una línea JSON por medición en logs/metrics/run_<id>.jsonl:
+#   • wall_seconds           → tiempo de reloj
+#   • cpu_seconds            → CPU del hilo que llamó a measure(); no
+#                              incluye hilos del pool (extract por rangos,
+#                              lectores): sirve solo para tareas de un hilo
+#   • process_cpu_seconds    → CPU de todo el proceso en ese lapso, con
+#                              los hilos de la tarea (exacto con
+#                              --workers 1; con tareas en paralelo
+#                              incluye lo de las demás)
+#   • process_peak_rss_mb    → pico de memoria del PROCESO hasta ese
+#                              momento (marca de agua: no baja)
+#   • peak_growth_mb         → cuánto subió ese pico durante la tarea: la
+#                              etapa que agranda la memoria lo muestra,
+#                              las que corren debajo del pico dan 0
+#   • rows_in / rows_out, bytes_read / bytes_written, rows_per_sec
+#
+# Al final main_etl.py imprime una tabla resumen con la CPU del
+# proceso, la subida del pico por etapa y el pico final.
+# ------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import datetime as dt
+
+DEFAULT_METRICS_DIR = os.path.join("logs", "metrics")
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso (MB); None si no se puede medir."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa KB; macOS, bytes
+        return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return round(counters.PeakWorkingSetSize / 1024 ** 2, 1)
+    return None
+
+
+def path_bytes(paths):
+    """Bytes en disco de archivos o carpetas (las que no existen cuentan 0)."""
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(folder, n)) for n in names)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+class StageRecord:
+    """Lo que se mide en un bloque measure(); la tarea completa filas y bytes."""
+
+    def __init__(self, stage, table=None):
+        self.stage = stage
+        self.table = table
+        self.status = "ok"
+        self.cached = False
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.process_cpu_seconds = 0.0
+        self.process_peak_rss_mb = None
+        self.peak_growth_mb = None
+        self.started_at = dt.datetime.now().isoformat(timespec="seconds")
+
+    @property
+    def rows_per_sec(self):
+        # Desde caché no hubo trabajo real: el ritmo no significa nada
+        rows = self.rows_out if self.rows_out is not None else self.rows_in
+        if self.cached or not rows or not self.wall_seconds:
+            return None
+        return round(rows / self.wall_seconds, 1)
+
+    def as_dict(self):
+        data = {k: v for k, v in vars(self).items()}
+        data["rows_per_sec"] = self.rows_per_sec
+        return data
+
+
+class RunMetrics:
+    """
+    Métricas de una corrida.
+
+    - run_id: identificador de la corrida (default: fecha y hora)
+    - metrics_dir: carpeta donde queda run_<id>.jsonl
+
+    Thread-safe: las tareas del grafo se miden en paralelo. Cada medición
+    se agrega al archivo apenas termina (si el proceso se cae, lo medido
+    hasta ahí queda).
+    """
+
+    def __init__(self, run_id=None, metrics_dir=DEFAULT_METRICS_DIR):
+        self.run_id = run_id or dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = os.path.join(metrics_dir, f"run_{self.run_id}.jsonl")
+        self.records = []
+        self._lock = threading.Lock()
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    @contextlib.contextmanager
+    def measure(self, stage, table=None):
+        record = StageRecord(stage, table)
+        wall, cpu, proc = time.perf_counter(), time.thread_time(), time.process_time()
+        peak = peak_rss_mb()
+        try:
+            yield record
+        except BaseException:
+            record.status = "error"
+            raise
+        finally:
+            record.wall_seconds = round(time.perf_counter() - wall, 3)
+            record.cpu_seconds = round(time.thread_time() - cpu, 3)
+            record.process_cpu_seconds = round(time.process_time() - proc, 3)
+            record.process_peak_rss_mb = peak_rss_mb()
+            if peak is not None and record.process_peak_rss_mb is not None:
+                record.peak_growth_mb = round(record.process_peak_rss_mb - peak, 1)
+            self.add(record)
+
+    def add(self, record):
+        line = json.dumps(dict(record.as_dict(), run_id=self.run_id), ensure_ascii=False)
+        with self._lock:
+            self.records.append(record)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def summary_lines(self):
+        """Tabla resumen (una línea por medición) para el log."""
+        def num(value, fmt):
+            return "-" if value is None else format(value, fmt)
+
+        def mb(value):
+            return None if value is None else value / 1024 ** 2
+
+        # CPU del proceso (la del hilo no ve los workers) y subida del pico
+        header = (f"{'etapa':<8} {'tabla':<16} {'estado':<7} {'wall s':>8} {'cpu s':>8} "
+                  f"{'+pico MB':>8} {'filas in':>10} {'filas out':>10} {'MB leídos':>10} "
+                  f"{'MB escritos':>11} {'filas/s':>10}")
+        lines = [header, "-" * len(header)]
+        with self._lock:
+            records = list(self.records)
+        for r in records:
+            status = "cache" if r.cached and r.status == "ok" else r.status
+            lines.append(
+                f"{r.stage:<8} {(r.table or '-'):<16} {status:<7} {r.wall_seconds:>8.2f} "
+                f"{r.process_cpu_seconds:>8.2f} {num(r.peak_growth_mb, '>8.1f'):>8} "
+                f"{num(r.rows_in, ','):>10} {num(r.rows_out, ','):>10} "
+                f"{num(mb(r.bytes_read), '.2f'):>10} {num(mb(r.bytes_written), '.2f'):>11} "
+                f"{num(r.rows_per_sec, ',.0f'):>10}")
+        peaks = [r.process_peak_rss_mb for r in records if r.process_peak_rss_mb is not None]
+        if peaks:
+            lines.append(f"Pico de memoria del proceso: {max(peaks):.1f} MB")
+        return lines
@@ -0,0 +1,314 @@
+# ------------------------------------------------------------
+# Script: profiling.py
+#
+# Perfilado de calidad de datos en una sola pasada por lote.
+#
+# quick_profile() recorría cada DataFrame varias veces
+# (isna().sum().sum(), isna().mean(), df.duplicated() sobre TODAS
+# las columnas). En tablas anchas como fact_Invoices el duplicated()
+# de fila completa era lo más lento del curated.
+#
+# Profiler recorre cada columna una vez por lote y acumula:
+#   • nulos por columna
+#   • min / max (numéricos y fechas)
+#   • valores negativos (numéricos)
+#   • distintos estimados (sketch KMV: k valores de hash mínimos)
+#   • duplicados sobre la clave de negocio declarada en utils/schema.py
+#     (o, si se pide, sobre la fila completa): conteo exacto con un hash
+#     de 8 bytes por fila; pasado DUP_MEMORY_HASHES los hashes se
+#     reparten por sus primeros bits en archivos temporales y al final se
+#     cuentan de a un archivo (memoria acotada también con 1e8 filas)
+#
+# Se alimenta lote a lote (modo --stream) o con la tabla entera, y dos
+# perfiles se pueden combinar con merge(). El resultado se guarda como
+# JSON (y un CSV por columna) junto al curated.
+# ------------------------------------------------------------
+
+import os
+import json
+import shutil
+import weakref
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Tamaño del sketch de distintos: error típico ~ 1/sqrt(k) (≈3% con 1024)
+DISTINCT_SKETCH_SIZE = 1024
+
+_HASH_SPACE = float(2 ** 64)
+
+# Hashes de fila que guardo en memoria antes de pasar a disco (8 bytes c/u)
+DUP_MEMORY_HASHES = 4_000_000
+# Archivos en disco: 2 ** DUP_BUCKET_BITS (por los primeros bits del hash)
+DUP_BUCKET_BITS = 6
+
+
+def _hash(obj):
+    # hash de pandas: vectorizado, uint64, no depende del índice
+    return pd.util.hash_pandas_object(obj, index=False).to_numpy()
+
+
+class DistinctSketch:
+    """
+    Estimador de valores distintos "k minimum values": guarda los k
+    hashes más chicos vistos. Si hay menos de k distintos, el conteo es
+    exacto. Se puede combinar con otro sketch (merge).
+    """
+
+    def __init__(self, k=DISTINCT_SKETCH_SIZE):
+        self.k = k
+        self.values = np.empty(0, dtype=np.uint64)
+
+    def update(self, hashes):
+        if len(hashes) == 0:
+            return
+        smallest = np.unique(hashes)[:self.k]
+        self.values = np.union1d(self.values, smallest)[:self.k]
+
+    def merge(self, other):
+        self.update(other.values)
+
+    def estimate(self):
+        if len(self.values) < self.k:
+            return int(len(self.values))
+        kth = float(self.values[self.k - 1])
+        return int(round((self.k - 1) / (kth / _HASH_SPACE)))
+
+
+def _repeats(hashes):
+    # Ordeno y comparo vecinos: mucho más rápido que np.unique en
+    # numpy >= 2.3 (que arma una tabla hash) y sin otra copia
+    hashes = np.sort(hashes)
+    return int(np.count_nonzero(hashes[1:] == hashes[:-1]))
+
+
+class DuplicateCounter:
+    """
+    Cuenta filas repetidas (mismo hash) entre todos los lotes, con la
+    memoria acotada.
+
+    - max_memory: hashes en memoria antes de pasar a disco
+    - spill_dir: carpeta para los temporales (default: la del sistema)
+
+    Mientras entren en max_memory cuento en memoria. Si no, ordeno los
+    hashes y los reparto por sus primeros DUP_BUCKET_BITS bits en un
+    archivo por bucket: dos hashes iguales caen siempre en el mismo
+    archivo, así que al final cuento repetidos de a un archivo
+    (≈ total / 64 hashes en memoria). El conteo sigue siendo exacto.
+    """
+
+    def __init__(self, max_memory=DUP_MEMORY_HASHES, spill_dir=None):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self._pending = []
+        self._pending_len = 0
+        self._folder = None
+
+    @property
+    def spilled(self):
+        return self._folder is not None
+
+    def _bucket_path(self, bucket):
+        return os.path.join(self._folder, f"{bucket:03d}.u64")
+
+    def add(self, hashes):
+        if len(hashes) == 0:
+            return
+        self._pending.append(np.asarray(hashes, dtype=np.uint64))
+        self._pending_len += len(hashes)
+        if self._pending_len > self.max_memory:
+            self._spill()
+
+    def _spill(self):
+        if self._folder is None:
+            self._folder = tempfile.mkdtemp(prefix="dups_", dir=self.spill_dir)
+            # Se borra cuando el contador deja de usarse
+            weakref.finalize(self, shutil.rmtree, self._folder, True)
+        hashes = np.sort(np.concatenate(self._pending))
+        self._pending, self._pending_len = [], 0
+        # Ordenados por valor también quedan ordenados por bucket
+        shift = np.uint64(64 - DUP_BUCKET_BITS)
+        edges = np.searchsorted(hashes, np.arange(1, 2 ** DUP_BUCKET_BITS, dtype=np.uint64) << shift)
+        for bucket, part in enumerate(np.split(hashes, edges)):
+            if len(part):
+                with open(self._bucket_path(bucket), "ab") as f:
+                    part.tofile(f)
+
+    def _buckets(self):
+        # Cada bucket en disco, de a uno
+        for bucket in range(2 ** DUP_BUCKET_BITS):
+            path = self._bucket_path(bucket)
+            if os.path.exists(path):
+                yield np.fromfile(path, dtype=np.uint64)
+
+    def merge(self, other):
+        for hashes in other._pending:
+            self.add(hashes)
+        if other.spilled:
+            for hashes in other._buckets():
+                self.add(hashes)
+
+    def count(self):
+        if self.spilled and self._pending:
+            self._spill()
+        parts = self._buckets() if self.spilled else \
+            ([np.concatenate(self._pending)] if self._pending else [])
+        return sum(_repeats(h) for h in parts)
+
+
+class ColumnStats:
+    """Acumulados de una columna (mergeables entre lotes)."""
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.negatives = None
+        self.distinct = DistinctSketch()
+
+    def update(self, series):
+        nulls = series.isna()
+        n_null = int(nulls.sum())
+        self.nulls += n_null
+        values = series[~nulls] if n_null else series
+        if values.empty:
+            return
+
+        is_numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+        if is_numeric or pd.api.types.is_datetime64_any_dtype(values):
+            self._update_range(values.min(), values.max())
+        if is_numeric:
+            self.negatives = (self.negatives or 0) + int((values.to_numpy() < 0).sum())
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Categorías: hasheo solo las usadas, no cada fila
+            used = values.cat.remove_unused_categories().cat.categories
+            self.distinct.update(_hash(pd.Series(used)))
+        else:
+            self.distinct.update(_hash(values))
+
+    def _update_range(self, lo, hi):
+        self.min = lo if self.min is None or lo < self.min else self.min
+        self.max = hi if self.max is None or hi > self.max else self.max
+
+    def merge(self, other):
+        self.nulls += other.nulls
+        if other.min is not None:
+            self._update_range(other.min, other.max)
+        if other.negatives is not None:
+            self.negatives = (self.negatives or 0) + other.negatives
+        self.distinct.merge(other.distinct)
+
+
+class Profiler:
+    """
+    Perfil de calidad de una tabla, acumulado lote a lote.
+
+    - table: nombre de la tabla (solo informativo)
+    - key: columnas de la clave de negocio para contar duplicados;
+      si es None o no están en los datos, uso la fila completa
+    - full_row: fuerza duplicados sobre la fila completa
+    - dup_memory / spill_dir: hashes de fila en memoria antes de pasar
+      a disco y carpeta de los temporales (ver DuplicateCounter)
+
+    Uso:
+        p = Profiler("fact_Invoices", key=["invoice_key"])
+        for chunk in lotes:
+            p.update(chunk)
+        perfil = p.result()
+    """
+
+    def __init__(self, table, key=None, full_row=False, dup_memory=DUP_MEMORY_HASHES,
+                 spill_dir=None):
+        self.table = table
+        self.key = list(key or [])
+        self.full_row = full_row
+        self.rows = 0
+        self.columns = {}
+        self._dups = DuplicateCounter(dup_memory, spill_dir)
+
+    def _dup_basis(self, df):
+        if self.full_row or not self.key or any(k not in df.columns for k in self.key):
+            return None
+        return self.key
+
+    def update(self, df):
+        self.rows += len(df)
+        for col in df.columns:
+            stats = self.columns.get(col)
+            if stats is None:
+                stats = self.columns[col] = ColumnStats(str(df[col].dtype))
+            stats.update(df[col])
+
+        # Duplicados: un hash de 8 bytes por fila; al final cuento
+        # repetidos entre TODOS los lotes (no solo dentro de cada uno)
+        basis = self._dup_basis(df)
+        if len(df):
+            self._dups.add(_hash(df[basis] if basis else df))
+        if basis is None and self.key and not self.full_row:
+            self.key = []   # la clave no vino en los datos: paso a fila completa
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        for col, stats in other.columns.items():
+            if col in self.columns:
+                self.columns[col].merge(stats)
+            else:
+                self.columns[col] = stats
+        self._dups.merge(other._dups)
+        return self
+
+    def duplicates(self):
+        return self._dups.count()
+
+    def result(self):
+        """Perfil final como dict serializable a JSON."""
+        columns = {}
+        for col, s in self.columns.items():
+            columns[col] = {
+                "dtype": s.dtype,
+                "nulls": s.nulls,
+                "null_percent": round(s.nulls / self.rows * 100, 2) if self.rows else 0.0,
+                "min": s.min,
+                "max": s.max,
+                "negatives": s.negatives,
+                "distinct_estimate": s.distinct.estimate(),
+            }
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "cols": len(self.columns),
+            "null_total": sum(s.nulls for s in self.columns.values()),
+            "duplicates": self.duplicates(),
+            "duplicate_basis": "key:" + ",".join(self.key) if self.key and not self.full_row
+                               else "full_row",
+            "columns": columns,
+        }
+
+
+def _json_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def write_profile(profile, json_path, csv_path=None):
+    """
+    Guarda el perfil como JSON (y opcionalmente un CSV con una fila por
+    columna). Escritura atómica: temporal + os.replace.
+    """
+    tmp = json_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False, default=_json_value)
+    os.replace(tmp, json_path)
+
+    if csv_path:
+        rows = [dict(column=c, **{k: _json_value(v) for k, v in stats.items()})
+                for c, stats in profile["columns"].items()]
+        tmp = csv_path + ".tmp"
+        pd.DataFrame(rows).to_csv(tmp, index=False, encoding="utf-8-sig")
+        os.replace(tmp, csv_path)
@@ -0,0 +1,149 @@
+# ------------------------------------------------------------
+# Script: publish.py
+#
+# Publicación atómica de la capa "load".
+#
+# Antes la carga copiaba (shutil.copy2) todo data/curated a data/load:
+#   • duplicaba disco e I/O (CSV + Parquet grandes),
+#   • quien leía data/load podía ver un archivo a medio copiar,
+#   • y los archivos de corridas viejas nunca se borraban.
+#
+# Ahora cada corrida arma un "snapshot" versionado con hard links
+# (mismo archivo en disco, cero bytes copiados):
+#
+#   data/load/snapshots/20250101_120000/dim_Customers_curated.csv ...
+#   data/load/current  → snapshots/20250101_120000   (symlink)
+#   data/load/CURRENT  → "20250101_120000"            (texto, por si no hay symlinks)
+#
+# El snapshot se arma en una carpeta ".staging" y recién al final se
+# renombra y se mueve el puntero "current" (os.replace = atómico).
+# Un lector ve el snapshot anterior completo o el nuevo completo.
+# Publicar tarda lo mismo con 1 MB o con 100 GB.
+# ------------------------------------------------------------
+
+import os
+import shutil
+import datetime as dt
+
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_LINK = "current"
+CURRENT_FILE = "CURRENT"
+STAGING_SUFFIX = ".staging"
+# Snapshots publicados que conservo (para volver atrás si hace falta)
+DEFAULT_KEEP = 3
+
+
+def link_file(src, dst):
+    """
+    Hard link de src en dst (reemplazando lo que hubiera).
+    Si el sistema no lo permite (otro disco, FAT...), copio.
+    Si src es una carpeta (dataset particionado), enlazo cada archivo.
+    Devuelve "link" o "copy" según lo que se pudo hacer.
+    """
+    if os.path.isdir(src):
+        hows = []
+
+        def _link(s, d):
+            hows.append(link_file(s, d))
+
+        if os.path.isdir(dst):
+            shutil.rmtree(dst)
+        shutil.copytree(src, dst, copy_function=_link)
+        return "copy" if "copy" in hows else "link"
+
+    tmp = dst + ".tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        how = "link"
+    except OSError:
+        shutil.copy2(src, tmp)
+        how = "copy"
+    os.replace(tmp, dst)
+    return how
+
+
+def new_snapshot(load_dir, run_id=None):
+    """
+    Crea la carpeta de staging para un snapshot nuevo y la devuelve.
+    - run_id: nombre del snapshot (default: fecha y hora de la corrida)
+    """
+    run_id = run_id or dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(load_dir, SNAPSHOTS_DIR)
+    name, n = run_id, 1
+    while os.path.exists(os.path.join(base, name)) or \
+            os.path.exists(os.path.join(base, name + STAGING_SUFFIX)):
+        n += 1
+        name = f"{run_id}_{n}"
+    staging = os.path.join(base, name + STAGING_SUFFIX)
+    os.makedirs(staging)
+    return staging
+
+
+def current_snapshot(load_dir):
+    """Ruta del snapshot publicado (o None si todavía no hay ninguno)."""
+    path = os.path.join(load_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        name = f.read().strip()
+    return os.path.join(load_dir, SNAPSHOTS_DIR, name) if name else None
+
+
+def _replace_pointer(load_dir, name):
+    # Archivo de texto: funciona en cualquier sistema
+    tmp_file = os.path.join(load_dir, CURRENT_FILE + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp_file, os.path.join(load_dir, CURRENT_FILE))
+
+    # Symlink "current": cómodo para Power BI / Fabric / scripts.
+    # En Windows sin permisos de symlink me quedo solo con CURRENT.
+    link = os.path.join(load_dir, CURRENT_LINK)
+    tmp_link = link + ".tmp"
+    try:
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(os.path.join(SNAPSHOTS_DIR, name), tmp_link, target_is_directory=True)
+        os.replace(tmp_link, link)
+    except OSError:
+        pass
+
+
+def publish(staging, keep=DEFAULT_KEEP):
+    """
+    Publica un snapshot armado en staging: lo renombra a su nombre final
+    y mueve el puntero "current". Borra los snapshots más viejos que
+    los últimos "keep". Devuelve la ruta final del snapshot.
+    """
+    final = staging[:-len(STAGING_SUFFIX)]
+    os.replace(staging, final)
+
+    snapshots_dir = os.path.dirname(final)
+    load_dir = os.path.dirname(snapshots_dir)
+    _replace_pointer(load_dir, os.path.basename(final))
+    prune(load_dir, keep=keep)
+    return final
+
+
+def discard(staging):
+    """Borra un staging que no se va a publicar (ej: falló una tabla)."""
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def prune(load_dir, keep=DEFAULT_KEEP):
+    """Borra snapshots viejos, dejando los "keep" más recientes y el vigente."""
+    base = os.path.join(load_dir, SNAPSHOTS_DIR)
+    current = current_snapshot(load_dir)
+    published = sorted(d for d in os.listdir(base)
+                       if not d.endswith(STAGING_SUFFIX)
+                       and os.path.isdir(os.path.join(base, d)))
+    removed = []
+    for name in published[:-keep] if keep else published:
+        path = os.path.join(base, name)
+        if current and os.path.abspath(path) == os.path.abspath(current):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed
@@ -0,0 +1,469 @@
+# ------------------------------------------------------------
+# Script: raw_io.py
+#
+# Ayudante de lectura/escritura de la capa RAW.
+#
+# Originalmente RAW era solo CSV: cada valor se convertía a texto
+# al extraer y se volvía a parsear en etl_curated.py (perdiendo los
+# tipos SQL por el camino). Aquí agrego formatos columnares:
+#
+#   • csv      → como siempre (trazabilidad, se abre en Excel)
+#   • parquet  → columnar comprimido (snappy/zstd/gzip/...)
+#   • arrow    → Arrow IPC (Feather v2), lectura casi sin parseo
+#
+# Los formatos columnares guardan el tipo de cada columna tal como
+# viene de la base (int, float, fecha, texto).
+#
+# La lectura empuja límite de filas, proyección de columnas y muestreo
+# al lector: una prueba con "--limit 5000" ya no parsea el archivo entero.
+# ------------------------------------------------------------
+
+import os
+import json
+import shutil
+import datetime as dt
+import decimal
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.ipc as ipc
+from utils.csv_io import read_csv, iter_csv, DEFAULT_CSV_ENGINE
+
+RAW_FORMATS = ("csv", "parquet", "arrow")
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+MANIFEST_NAME = "_manifest.json"
+
+# Filas por lote al leer RAW en modo streaming
+DEFAULT_READ_BATCH = 100_000
+
+# Compresión por defecto según formato
+DEFAULT_COMPRESSION = {"csv": None, "parquet": "snappy", "arrow": None}
+
+# Tipo Python que reporta el driver (cursor.description) → tipo Arrow
+_PY_TO_ARROW = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    decimal.Decimal: pa.float64(),   # igual que pd.read_sql (coerce_float)
+    dt.datetime: pa.timestamp("us"),
+    dt.date: pa.date32(),
+    bytes: pa.binary(),
+    bytearray: pa.binary(),
+}
+
+
+def schema_from_description(description):
+    """
+    Arma un esquema Arrow a partir de cursor.description.
+
+    pyodbc informa el tipo Python de cada columna, así que puedo fijar
+    el esquema antes de leer la primera fila. sqlite3 no lo informa
+    (type_code = None) → devuelvo None y el esquema se infiere del
+    primer lote.
+    """
+    fields = []
+    for col in description:
+        arrow_type = _PY_TO_ARROW.get(col[1]) if isinstance(col[1], type) else None
+        if arrow_type is None:
+            return None
+        fields.append(pa.field(col[0], arrow_type))
+    return pa.schema(fields)
+
+
+def _infer_schema(df):
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    fields = []
+    for f in schema:
+        # Columnas vacías en el primer lote (todo NULL) → las dejo como texto
+        if pa.types.is_null(f.type):
+            f = pa.field(f.name, pa.string())
+        # Categorías: índices int32 fijos (un lote con más valores
+        # distintos no debe romper el esquema del archivo)
+        elif pa.types.is_dictionary(f.type):
+            f = pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type))
+        fields.append(f)
+    return pa.schema(fields)
+
+
+class RawBatchWriter:
+    """
+    Escribe un archivo RAW lote por lote, en el formato elegido.
+
+    - path: archivo destino
+    - fmt: "csv", "parquet" o "arrow"
+    - compression: códec (parquet: snappy/zstd/gzip/brotli/lz4/none;
+      arrow: lz4/zstd/none). CSV no se comprime.
+    - schema: esquema Arrow opcional (ver schema_from_description)
+
+    Uso:
+        with RawBatchWriter(path, "parquet") as w:
+            for df in lotes:
+                w.write(df)
+    """
+
+    def __init__(self, path, fmt="csv", compression=None, schema=None, columns=None):
+        if fmt not in RAW_FORMATS:
+            raise ValueError(f"Formato RAW no soportado: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.compression = compression or DEFAULT_COMPRESSION[fmt]
+        if self.compression == "none":
+            self.compression = None
+        self.schema = schema
+        self.columns = columns
+        self._writer = None
+        self._sink = None
+        self._header_written = False
+
+    def _open(self, df):
+        if self.schema is None:
+            self.schema = _infer_schema(df)
+        if self.fmt == "parquet":
+            self._writer = pq.ParquetWriter(self.path, self.schema,
+                                            compression=self.compression or "none")
+        else:
+            self._sink = pa.OSFile(self.path, "wb")
+            options = ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = ipc.new_file(self._sink, self.schema, options=options)
+
+    def write(self, df):
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="a" if self._header_written else "w",
+                      header=not self._header_written, index=False)
+            self._header_written = True
+            return
+        if self._writer is None:
+            self._open(df)
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        # Archivo sin lotes → igual lo dejo creado con sus columnas
+        if self.fmt == "csv" and not self._header_written:
+            pd.DataFrame(columns=self.columns or []).to_csv(self.path, index=False)
+        elif self.fmt != "csv" and self._writer is None:
+            if self.schema is None:
+                self.schema = pa.schema([pa.field(c, pa.string()) for c in self.columns or []])
+            self._open(None)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================
+# Ubicar y leer datasets RAW
+# ============================================================
+def raw_file_path(raw_folder, base_name, fmt="csv"):
+    return os.path.join(raw_folder, base_name + EXTENSIONS[fmt])
+
+
+def find_raw(raw_folder, base_name):
+    """
+    Devuelve la ruta del RAW de una tabla (archivo o carpeta de parts),
+    o None si no existe. Los parts (con manifest) tienen prioridad.
+    """
+    parts_dir = os.path.join(raw_folder, base_name)
+    if os.path.exists(os.path.join(parts_dir, MANIFEST_NAME)):
+        return parts_dir
+    for fmt in RAW_FORMATS:
+        path = raw_file_path(raw_folder, base_name, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def clear_raw(raw_folder, base_name, keep=None):
+    """
+    Borra todas las variantes RAW de una tabla (CSV, Parquet, Arrow,
+    carpeta de parts) excepto "keep". Evita que etl_curated.py lea
+    un archivo viejo de una corrida con otro formato.
+    """
+    candidates = [os.path.join(raw_folder, base_name)] + \
+                 [raw_file_path(raw_folder, base_name, f) for f in RAW_FORMATS]
+    for path in candidates:
+        if keep and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def format_of(path):
+    for fmt, ext in EXTENSIONS.items():
+        if path.endswith(ext):
+            return fmt
+    raise ValueError(f"No reconozco el formato de {path}")
+
+
+def _apply_dtypes(df, dtypes):
+    # En columnares el tipo ya viene del archivo; solo ajusto lo pedido
+    if not dtypes:
+        return df
+    present = {c: t for c, t in dtypes.items() if c in df.columns}
+    return df.astype(present) if present else df
+
+
+def read_raw_file(path, columns=None, dtypes=None, csv_engine=DEFAULT_CSV_ENGINE):
+    """
+    Lee un archivo RAW (CSV, Parquet o Arrow) a DataFrame.
+    En los formatos columnares solo se leen las columnas pedidas.
+
+    - dtypes: tipos a aplicar al leer (ej: {"Brand": "category"});
+      en CSV se pasan al parser y se evita inferirlos
+    - csv_engine: "pandas" o "arrow" (multihilo), ver utils/csv_io.py
+    """
+    fmt = format_of(path)
+    if fmt == "csv":
+        return read_csv(path, engine=csv_engine, columns=columns, dtypes=dtypes)
+    if fmt == "parquet":
+        return _apply_dtypes(pq.read_table(path, columns=columns).to_pandas(), dtypes)
+    with pa.memory_map(path, "r") as source:
+        table = ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return _apply_dtypes(table.to_pandas(), dtypes)
+
+
+def count_raw_rows(path):
+    """Cuenta filas de un archivo RAW (en columnares, solo con metadatos)."""
+    fmt = format_of(path)
+    if fmt == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "arrow":
+        with pa.memory_map(path, "r") as source:
+            reader = ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    with open(path, "rb") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+def list_raw_files(path):
+    """Archivo único → [path]; carpeta de parts → parts del manifest."""
+    if not os.path.isdir(path):
+        return [path]
+    with open(os.path.join(path, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    return [os.path.join(path, p["file"]) for p in manifest["parts"]]
+
+
+def raw_columns(path):
+    """Nombres de columnas de un RAW, leyendo solo el encabezado/esquema."""
+    first = list_raw_files(path)[0]
+    fmt = format_of(first)
+    if fmt == "csv":
+        return list(pd.read_csv(first, encoding="utf-8-sig", nrows=0).columns)
+    if fmt == "parquet":
+        return pq.ParquetFile(first).schema_arrow.names
+    with pa.memory_map(first, "r") as source:
+        return ipc.open_file(source).schema.names
+
+
+def empty_raw_frame(path):
+    """
+    DataFrame vacío con las columnas del RAW (en columnares, también los
+    tipos), leyendo solo el encabezado/esquema. None si no hay archivos
+    (dataset particionado sin parts).
+    """
+    files = list_raw_files(path)
+    if not files:
+        return None
+    first = files[0]
+    fmt = format_of(first)
+    if fmt == "csv":
+        return pd.read_csv(first, encoding="utf-8-sig", nrows=0)
+    if fmt == "parquet":
+        return pq.ParquetFile(first).schema_arrow.empty_table().to_pandas()
+    with pa.memory_map(first, "r") as source:
+        return ipc.open_file(source).schema.empty_table().to_pandas()
+
+
+def normalize_name(col):
+    # Misma regla que etl_curated.py: "Invoice Date" → "invoice_date"
+    return col.strip().replace(" ", "_").lower()
+
+
+def resolve_columns(path, wanted):
+    """
+    Traduce nombres "curated" (snake_case) a los nombres reales del RAW.
+    Así puedo pedir "invoice_date" aunque la fuente diga "Invoice_Date".
+    """
+    if not wanted:
+        return None
+    by_norm = {normalize_name(c): c for c in raw_columns(path)}
+    missing = [w for w in wanted if normalize_name(w) not in by_norm]
+    if missing:
+        raise ValueError(f"Columnas inexistentes en {path}: {missing}")
+    return [by_norm[normalize_name(w)] for w in wanted]
+
+
+def iter_raw_batches(path, columns=None, batch_size=DEFAULT_READ_BATCH, limit=None,
+                     skip_row=None, dtypes=None, csv_engine=DEFAULT_CSV_ENGINE):
+    """
+    Recorre un RAW (archivo o parts) por lotes de DataFrame.
+
+    - columns: proyección (solo se leen/parsean esas columnas)
+    - limit: deja de leer al llegar a N filas (no se toca el resto del archivo)
+    - skip_row: solo CSV; función fila→bool para descartar líneas sin parsearlas
+    - dtypes: tipos a aplicar al leer (ver read_raw_file)
+    - csv_engine: motor CSV (con limit o skip_row se usa pandas)
+    """
+    remaining = limit
+    for file_path in list_raw_files(path):
+        if remaining is not None and remaining <= 0:
+            return
+        fmt = format_of(file_path)
+        if fmt == "csv":
+            batches = iter_csv(file_path, engine=csv_engine, columns=columns, dtypes=dtypes,
+                               batch_size=batch_size, nrows=remaining, skip_row=skip_row)
+        elif fmt == "parquet":
+            batches = (b.to_pandas() for b in
+                       pq.ParquetFile(file_path).iter_batches(batch_size=batch_size,
+                                                              columns=columns))
+        else:
+            batches = _iter_arrow_file(file_path, columns)
+
+        for df in batches:
+            if fmt != "csv":
+                df = _apply_dtypes(df, dtypes)
+            if remaining is not None:
+                df = df.head(remaining)
+                remaining -= len(df)
+            if len(df):
+                yield df
+            if remaining is not None and remaining <= 0:
+                break
+
+
+def _iter_arrow_file(file_path, columns):
+    with pa.memory_map(file_path, "r") as source:
+        reader = ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            yield batch.to_pandas()
+
+
+def sample_mask(df, fraction, rng, strata=None):
+    """
+    Máscara booleana para muestrear "fraction" de las filas de un lote.
+
+    - strata: Serie opcional (ej: mes de la fecha). Si viene, tomo la
+      misma fracción dentro de cada grupo y al menos 1 fila por grupo,
+      así ningún mes queda fuera de la muestra.
+    """
+    u = pd.Series(rng.random(len(df)), index=df.index)
+    if strata is None:
+        return u < fraction
+    grouped = u.groupby(strata, dropna=False)
+    rank = grouped.rank(method="first")
+    size = grouped.transform("size")
+    return rank <= (size * fraction).round().clip(lower=1)
+
+
+def read_raw(path, columns=None, limit=None, sample=None, stratify_by=None, seed=None,
+             dtypes=None, csv_engine=DEFAULT_CSV_ENGINE):
+    """
+    Lee un RAW (archivo único o dataset de parts) como un DataFrame.
+
+    - columns: proyección de columnas (nombres curated o reales)
+    - limit: máximo de filas; se aplica en el lector (nrows), no con head()
+    - sample: fracción (0-1] para una muestra aleatoria
+    - stratify_by: columna de fecha para muestrear estratificado por mes
+    - seed: semilla para que la muestra sea reproducible
+    - dtypes: tipos a aplicar al leer (nombre real de columna → tipo)
+    - csv_engine: "pandas" o "arrow" (ver utils/csv_io.py)
+    """
+    columns = resolve_columns(path, columns)
+    files = list_raw_files(path)
+
+    # Camino rápido: sin límite ni muestra → lectura completa
+    if not limit and not sample:
+        frames = [read_raw_file(p, columns=columns, dtypes=dtypes, csv_engine=csv_engine)
+                  for p in files]
+        # Un part vacío (rango sin filas) no trae tipos reales: si lo
+        # concateno, las columnas terminan como object
+        frames = [f for f in frames if len(f)] or frames[:1]
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    if not sample:
+        return _concat(iter_raw_batches(path, columns=columns, limit=limit, dtypes=dtypes,
+                                        csv_engine=csv_engine), path, columns)
+
+    rng = np.random.default_rng(seed)
+    if stratify_by:
+        df = _stratified(files, resolve_columns(path, [stratify_by])[0], sample, rng,
+                         columns, dtypes, csv_engine)
+        df = _concat(df, path, columns)
+        return df.head(limit).reset_index(drop=True) if limit else df.reset_index(drop=True)
+
+    # Muestra aleatoria simple sobre CSV: descarto las líneas no elegidas
+    # antes de parsearlas (fila 0 = encabezado)
+    skip_row = None
+    if all(format_of(p) == "csv" for p in files):
+        skip_row = lambda i: i > 0 and rng.random() >= sample
+
+    def sampled():
+        for df in iter_raw_batches(path, columns=columns, skip_row=skip_row, dtypes=dtypes,
+                                   csv_engine=csv_engine):
+            yield df if skip_row is not None else df[sample_mask(df, sample, rng)]
+
+    df = _concat(sampled(), path, columns)
+    return df.head(limit).reset_index(drop=True) if limit else df.reset_index(drop=True)
+
+
+def _stratified(files, strat_col, fraction, rng, columns, dtypes, csv_engine):
+    """
+    Muestra estratificada por mes en dos pasadas:
+      1. solo la columna de estratos de todo el RAW → qué filas entran
+         (la fracción se aplica por mes sobre el archivo entero, no por lote)
+      2. las columnas pedidas, solo de esas filas (en CSV las demás líneas
+         ni se parsean)
+    La columna de estratos no se agrega a la salida si no se pidió.
+    """
+    # Mes de cada fila (año * 12 + mes; NaN si la fecha no parsea), por archivo
+    months = []
+    for file_path in files:
+        parts = []
+        for df in iter_raw_batches(file_path, columns=[strat_col], csv_engine=csv_engine):
+            dates = pd.to_datetime(df[strat_col], errors="coerce")
+            parts.append((dates.dt.year * 12 + dates.dt.month).astype("float32").to_numpy())
+        months.append(np.concatenate(parts) if parts else np.array([], dtype="float32"))
+    strata = pd.Series(np.concatenate(months))
+    keep = sample_mask(strata, fraction, rng, strata).to_numpy()
+
+    offset = 0
+    for file_path, file_months in zip(files, months):
+        chosen = keep[offset:offset + len(file_months)]
+        offset += len(file_months)
+        if format_of(file_path) == "csv":
+            yield from iter_raw_batches(file_path, columns=columns, dtypes=dtypes,
+                                        skip_row=lambda i, c=chosen: i > 0 and not c[i - 1],
+                                        csv_engine=csv_engine)
+            continue
+        start = 0
+        for df in iter_raw_batches(file_path, columns=columns, dtypes=dtypes):
+            mask = chosen[start:start + len(df)]
+            start += len(df)
+            if mask.any():
+                yield df[mask]
+
+
+def _concat(frames, path, columns):
+    frames = list(frames)
+    if not frames:
+        # Nada que leer → DataFrame vacío con las columnas correctas
+        return pd.DataFrame(columns=columns or raw_columns(path))
+    return pd.concat(frames, ignore_index=True)
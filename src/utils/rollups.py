@@ -0,0 +1,346 @@
+# ------------------------------------------------------------
+# Script: rollups.py
+#
+# Tablas resumen (pre-agregadas) sobre fact_Invoices curated.
+#
+# Power BI sumaba gross_invoice_value, net_invoice_cogs y profit
+# sobre la tabla de hechos fila a fila en cada refresh. Con estas
+# tablas los tableros leen miles de filas en vez de millones:
+#
+#   rollup_sales_by_date.parquet      → por día (invoice_date)
+#   rollup_sales_by_month.parquet     → por año / mes
+#   rollup_sales_by_customer.parquet  → por cliente (+ nombre, país)
+#   rollup_sales_by_product.parquet   → por producto (+ nombre, marca)
+#
+# Las medidas son sumas (y conteo de facturas), así que se pueden
+# combinar: si desde la última corrida solo se agregaron filas al final
+# de la tabla de hechos, agrego únicamente esas filas y las sumo a lo
+# que ya había. Para saberlo guardo una huella del contenido de cada
+# archivo/partición (filas + hash de las columnas que uso): un archivo
+# con el mismo tamaño y fecha de modificación no se vuelve a leer; uno
+# que cambió se relee y sus primeras filas tienen que dar el mismo hash
+# que la vez anterior (prefijo verificado). Si algo no cuadra (cambió un
+# valor ya agregado, desapareció un archivo, otra versión del código)
+# reconstruyo todo.
+#
+# Los atributos de las dimensiones se vuelven a unir en cada corrida:
+# un cambio de nombre o país de un cliente no obliga a re-agregar.
+# ------------------------------------------------------------
+
+import os
+import json
+import hashlib
+import datetime as dt
+import pandas as pd
+from utils.raw_io import (iter_raw_batches, read_raw, list_raw_files, count_raw_rows,
+                          format_of, raw_columns)
+
+DEFAULT_STATE_FILE = os.path.join("data", "state", "rollups.json")
+# Si cambia la definición de las tablas resumen, subo este número y la
+# próxima corrida las reconstruye completas
+ROLLUP_VERSION = 2
+
+DATE_COL = "invoice_date"
+MEASURES = ["quantity", "gross_invoice_value", "net_invoice_value", "net_invoice_cogs", "profit"]
+COUNT_COL = "invoices"
+
+# Definición de cada tabla resumen
+#   - keys: columnas de agrupación
+#   - sk: clave sustituta que reemplaza a keys si el curated se generó
+#     con --surrogate-keys (utils/keys.py)
+#   - dim: (tabla curated, clave en la dimensión, atributos) para unir
+ROLLUPS = {
+    "sales_by_date": {"keys": [DATE_COL]},
+    "sales_by_month": {"keys": ["year", "month"]},
+    "sales_by_customer": {"keys": ["customerid"], "sk": "customer_sk",
+                          "dim": ("dim_Customers", "id_cliente", ["nombre", "apellido", "country"])},
+    "sales_by_product": {"keys": ["productkey"], "sk": "product_sk",
+                         "dim": ("dim_Products", "productkey", ["product_name", "brand"])},
+}
+
+
+def rollup_path(folder, name):
+    return os.path.join(folder, f"rollup_{name}.parquet")
+
+
+def find_curated(folder, table):
+    """Parquet (archivo o dataset particionado) o, si no hay, el CSV curated."""
+    for name in (f"{table}_curated.parquet", f"{table}_curated", f"{table}_curated.csv"):
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class _PrefixChanged(Exception):
+    """Un archivo ya agregado cambió por delante de sus filas nuevas."""
+
+
+def _row_hash(df):
+    # Hash por fila (no depende de cómo se partió el archivo en lotes)
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _iter_fact(files, columns, prints, previous=None):
+    """
+    Lotes de la tabla de hechos (solo las columnas necesarias) y, de paso,
+    la huella de cada archivo en prints ({archivo: size, mtime_ns, rows, hash}).
+
+    - files: [(nombre relativo, ruta)]
+    - previous: huellas de la corrida anterior. De un archivo que ya estaba
+      solo devuelvo las filas que siguen a las ya agregadas, después de
+      comprobar que las primeras dan el mismo hash; si no, _PrefixChanged
+    """
+    previous = previous or {}
+    for rel, path in files:
+        old = previous.get(rel)
+        skip = old["rows"] if old else 0
+        digest, seen = hashlib.sha256(), 0
+        if old and skip == 0 and digest.hexdigest() != old["hash"]:
+            raise _PrefixChanged(rel)
+        for df in iter_raw_batches(path, columns=columns):
+            start, seen = seen, seen + len(df)
+            if seen <= skip:
+                digest.update(_row_hash(df))
+                if seen == skip and digest.hexdigest() != old["hash"]:
+                    raise _PrefixChanged(rel)
+                continue
+            if start < skip:
+                # Lote que cruza el final de lo ya agregado
+                digest.update(_row_hash(df.iloc[:skip - start]))
+                if digest.hexdigest() != old["hash"]:
+                    raise _PrefixChanged(rel)
+                df = df.iloc[skip - start:]
+            digest.update(_row_hash(df))
+            yield df
+        if seen < skip:
+            raise _PrefixChanged(rel)
+        prints[rel] = dict(_stat(path), rows=seen, hash=digest.hexdigest())
+
+
+def group_keys(fact_columns):
+    """
+    Columnas de agrupación de cada rollup según lo que trae el curated:
+    la clave de negocio o, si fue reemplazada, la clave sustituta.
+    """
+    keys = {}
+    for name, spec in ROLLUPS.items():
+        if spec.get("sk") in fact_columns and not set(spec["keys"]) <= set(fact_columns):
+            keys[name] = [spec["sk"]]
+        else:
+            keys[name] = list(spec["keys"])
+    return keys
+
+
+def _aggregate(batches, keys):
+    """
+    Suma las medidas por día, cliente y producto lote a lote (memoria
+    acotada). Devuelve {rollup: DataFrame con claves + medidas}, filas
+    leídas y la fecha máxima vista.
+    """
+    partials = {name: [] for name in ROLLUPS}
+    rows, max_date = 0, None
+    for df in batches:
+        # quantity viene en int32: sumada sobre años de facturas puede desbordar
+        df = df.assign(**{DATE_COL: pd.to_datetime(df[DATE_COL]).dt.normalize(), COUNT_COL: 1,
+                          "quantity": df["quantity"].astype("int64")})
+        rows += len(df)
+        batch_max = df[DATE_COL].max()
+        max_date = batch_max if max_date is None or batch_max > max_date else max_date
+        for name in ROLLUPS:
+            if name == "sales_by_month":
+                continue   # sale de sales_by_date, sin volver a recorrer las filas
+            partials[name].append(_sum_by(df, keys[name]))
+
+    result = {}
+    for name in ROLLUPS:
+        if name == "sales_by_month":
+            continue
+        frames = partials[name]
+        result[name] = (_sum_by(pd.concat(frames, ignore_index=True), keys[name]) if frames
+                        else pd.DataFrame(columns=keys[name] + MEASURES + [COUNT_COL]))
+    result["sales_by_month"] = _month_from_dates(result["sales_by_date"])
+    return result, rows, max_date
+
+
+def _sum_by(df, keys):
+    return df.groupby(keys, as_index=False, observed=True, sort=True)[MEASURES + [COUNT_COL]].sum()
+
+
+def _month_from_dates(by_date):
+    dates = pd.to_datetime(by_date[DATE_COL])
+    frame = by_date.drop(columns=[DATE_COL]).assign(year=dates.dt.year.astype("int32"),
+                                                    month=dates.dt.month.astype("int32"))
+    return _sum_by(frame, ["year", "month"])
+
+
+def _merge(old, new, keys):
+    """Suma dos versiones de un rollup (claves + medidas)."""
+    if old is None or old.empty:
+        return new
+    if new.empty:
+        return old
+    return _sum_by(pd.concat([old[keys + MEASURES + [COUNT_COL]], new], ignore_index=True), keys)
+
+
+def _load_dims(folder):
+    dims = {}
+    for spec in ROLLUPS.values():
+        if "dim" not in spec:
+            continue
+        table, key, attrs = spec["dim"]
+        path = find_curated(folder, table)
+        if path is None:
+            dims[table] = None
+            continue
+        available = set(raw_columns(path))
+        wanted = [key, spec["sk"]] + attrs
+        dims[table] = read_raw(path, columns=[c for c in wanted if c in available])
+    return dims
+
+
+def _attach(df, spec, keys, dims):
+    # Left join: una venta de un cliente/producto que no está en la
+    # dimensión igual suma (con atributos vacíos)
+    if "dim" not in spec:
+        return df
+    table, key, attrs = spec["dim"]
+    dim = dims.get(table)
+    # Con claves sustitutas uno por customer_sk / product_sk (la
+    # dimensión trae las dos y la clave de negocio queda como atributo)
+    dim_key = spec["sk"] if keys == [spec["sk"]] else key
+    if dim is None or dim_key not in dim.columns:
+        return df
+    dim = dim.drop_duplicates(subset=[dim_key], keep="last")
+    if dim_key == key:
+        dim = dim.drop(columns=[spec["sk"]], errors="ignore")
+    dim = dim.rename(columns={dim_key: keys[0]})
+    dim[keys[0]] = dim[keys[0]].astype(df[keys[0]].dtype)
+    return df.merge(dim, on=keys, how="left")
+
+
+def _write(df, path):
+    tmp = path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _read_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(state, state_file):
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    tmp = state_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, state_file)
+
+
+def build_rollups(curated_folder, out_folder=None, state_file=DEFAULT_STATE_FILE,
+                  full_rebuild=False, logger=None):
+    """
+    Genera o actualiza las tablas resumen a partir de los curated.
+
+    - curated_folder: carpeta con fact_Invoices / dim_* curated
+    - out_folder: dónde dejar los rollup_*.parquet (default: curated_folder)
+    - state_file: huella de la tabla de hechos ya agregada (para el modo incremental)
+    - full_rebuild: ignora el estado y re-agrega todo
+
+    Devuelve {"ok", "mode" (full | incremental | unchanged), "rows_read",
+    "outputs", "rows": {rollup: filas}}.
+    """
+    out_folder = out_folder or curated_folder
+    fact = find_curated(curated_folder, "fact_Invoices")
+    if fact is None:
+        raise FileNotFoundError(f"No hay fact_Invoices curated en {curated_folder}")
+    fact_columns = raw_columns(fact)
+    keys = group_keys(fact_columns)
+    columns = [DATE_COL] + keys["sales_by_customer"] + keys["sales_by_product"] + MEASURES
+    missing = [c for c in columns if c not in fact_columns]
+    if missing:
+        raise ValueError(f"fact_Invoices curated no tiene {missing} (¿se usó --columns?)")
+
+    outputs = [rollup_path(out_folder, name) for name in ROLLUPS]
+    files = [(os.path.relpath(f, fact) if os.path.isdir(fact) else os.path.basename(f), f)
+             for f in list_raw_files(fact)]
+    state = _read_state(state_file)
+    previous = state.get("files") or {}
+    can_append = (not full_rebuild
+                  and state.get("version") == ROLLUP_VERSION
+                  and state.get("folder") == os.path.abspath(out_folder)
+                  and state.get("keys") == keys
+                  and set(previous) <= {rel for rel, _ in files}
+                  and all(os.path.exists(p) for p in outputs))
+
+    mode = "full"
+    if can_append:
+        # Sin cambios de tamaño ni fecha → no lo leo; el resto se relee
+        # y solo se agrega lo que sigue al prefijo verificado
+        prints = {rel: previous[rel] for rel, f in files
+                  if rel in previous and {k: previous[rel][k] for k in ("size", "mtime_ns")} == _stat(f)}
+        changed = [(rel, f) for rel, f in files if rel not in prints]
+        try:
+            new, rows_read, max_date = _aggregate(_iter_fact(changed, columns, prints, previous), keys)
+            mode = "incremental" if rows_read else "unchanged"
+            if state.get("max_date") is not None:
+                old_max = pd.Timestamp(state["max_date"])
+                max_date = old_max if max_date is None or max_date < old_max else max_date
+        except _PrefixChanged as e:
+            if logger:
+                logger.info(f"[ROLLUP] {e} cambió respecto de lo ya agregado → reconstruyo todo.")
+    if mode == "full":
+        prints = {}
+        new, rows_read, max_date = _aggregate(_iter_fact(files, columns, prints), keys)
+
+    dims = _load_dims(curated_folder)
+    dims_hash = {t: (None if d is None else
+                     str(pd.util.hash_pandas_object(d, index=False).sum()))
+                 for t, d in dims.items()}
+    if mode == "unchanged" and dims_hash == state.get("dims"):
+        if prints != previous:
+            # Archivos reescritos con el mismo contenido: guardo su fecha
+            # nueva para no releerlos en la próxima corrida
+            _save_state(dict(state, files=prints), state_file)
+        if logger:
+            logger.info("[ROLLUP] Sin facturas nuevas ni cambios en dimensiones. No reescribo.")
+        return {"ok": True, "mode": mode, "rows_read": 0, "outputs": outputs,
+                "rows": state.get("rows", {})}
+
+    os.makedirs(out_folder, exist_ok=True)
+    rows = {}
+    for name, spec in ROLLUPS.items():
+        path = rollup_path(out_folder, name)
+        if mode == "full":
+            df = new[name]
+        else:
+            old = pd.read_parquet(path)
+            df = old[keys[name] + MEASURES + [COUNT_COL]] if mode == "unchanged" \
+                else _merge(old, new[name], keys[name])
+        df = _attach(df, spec, keys[name], dims)
+        _write(df, path)
+        rows[name] = len(df)
+
+    _save_state({
+        "version": ROLLUP_VERSION,
+        "folder": os.path.abspath(out_folder),
+        "fact_rows": sum(p["rows"] for p in prints.values()),
+        "files": prints,
+        "max_date": None if max_date is None else pd.Timestamp(max_date).isoformat(),
+        "dims": dims_hash,
+        "keys": keys,
+        "rows": rows,
+        "updated_at": dt.datetime.now().isoformat(timespec="seconds"),
+    }, state_file)
+    if logger:
+        logger.info(f"[ROLLUP] {mode}: {rows_read} filas de hechos leídas → "
+                    + ", ".join(f"{n}={r}" for n, r in rows.items()))
+    return {"ok": True, "mode": mode, "rows_read": rows_read, "outputs": outputs, "rows": rows}
@@ -0,0 +1,196 @@
+# ------------------------------------------------------------
+# Script: schema.py
+#
+# Registro de esquemas (tipos de datos) de las tablas curated.
+#
+# Antes los tipos eran "lo que pandas adivinara" + algún astype(int)
+# suelto: textos como object, enteros chicos como int64, etc.
+# Aquí declaro por tabla qué tipo debe tener cada columna:
+#   • enteros compactos (int32 en vez de int64)
+#   • categorías para textos con pocos valores distintos
+#   • fechas como datetime64
+#   • montos en float64 (no bajo a float32: perdería centavos)
+#
+# El esquema se usa en dos momentos:
+#   1. Al leer RAW → los textos categóricos se leen directo como category.
+#   2. Al escribir curated → enforce_schema() castea y valida.
+#
+# Columnas no declaradas siguen una política automática (enteros a
+# int32 si caben, textos repetitivos a category). En modo streaming el
+# plan se arma con el primer lote y vale para lotes que todavía no vi:
+# ahí los enteros no declarados no se achican (un lote posterior podría
+# no caber en int32); solo se usan tipos que no dependen del rango.
+# ------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+# Versión del esquema: subirla cuando cambien las declaraciones
+SCHEMA_VERSION = 1
+
+# Un texto pasa a category si (valores distintos / filas) <= este ratio
+CATEGORY_MAX_RATIO = 0.5
+# ...y solo si el lote tiene al menos estas filas (en lotes chicos el ratio engaña)
+CATEGORY_MIN_ROWS = 100
+
+# ------------------------------------------------------------
+# Declaración por tabla
+#   - dtypes: columna curated → tipo destino (se aplica si la columna existe)
+#   - required: columnas que sí o sí deben existir al escribir
+#   - key: clave de negocio (se usa para contar duplicados al perfilar;
+#     si no viene en los datos, el perfil usa la fila completa)
+# ------------------------------------------------------------
+CURATED_SCHEMAS = {
+    "dim_Customers": {
+        "dtypes": {
+            "id_cliente": "int32",
+            "nombre": "object",
+            "apellido": "object",
+            "country": "category",
+            "state": "category",
+            "city": "category",
+            "region": "category",
+            "segment": "category",
+            "gender": "category",
+            "account_manager": "category",
+        },
+        "required": ["id_cliente"],
+        "key": ["id_cliente"],
+    },
+    "dim_Products": {
+        "dtypes": {
+            "price": "float64",
+            "brand": "category",
+            "sub_brand": "category",
+            "category": "category",
+            "subcategory": "category",
+            "product_type": "category",
+            "class": "category",
+            "color": "category",
+            "size": "category",
+        },
+        "required": [],
+        "key": ["productkey"],
+    },
+    "fact_Invoices": {
+        "dtypes": {
+            "invoice_date": "datetime64[ns]",
+            "date_iso": "category",          # una fecha se repite en muchas filas
+            "quantity": "int32",
+            "unitprice": "float64",
+            "net_invoice_value": "float64",
+            "net_invoice_cogs": "float64",
+            "gross_invoice_value": "float64",
+            "profit": "float64",
+            "currency": "category",
+            "invoice_type": "category",
+        },
+        "required": ["gross_invoice_value"],
+        "key": ["invoice_key"],
+    },
+}
+
+
+class SchemaError(ValueError):
+    """El DataFrame no cumple el esquema declarado de la tabla."""
+
+
+def _norm(col):
+    return col.strip().replace(" ", "_").lower()
+
+
+def business_key(table):
+    """Columnas de la clave de negocio declarada (lista vacía si no hay)."""
+    return list(CURATED_SCHEMAS.get(table, {}).get("key", []))
+
+
+def read_dtypes(table, raw_columns):
+    """
+    Tipos a pedir al lector RAW (nombre real de columna → tipo).
+
+    Solo pido al lector las categorías: los numéricos los sigue
+    limpiando la transformación con to_numeric(errors="coerce"),
+    que tolera valores sucios.
+    """
+    declared = CURATED_SCHEMAS.get(table, {}).get("dtypes", {})
+    return {c: "category" for c in raw_columns if declared.get(_norm(c)) == "category"}
+
+
+def _auto_dtype(series, streaming=False):
+    # Política para columnas no declaradas
+    if pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_integer_dtype(series):
+        if streaming:
+            return None
+        if series.empty:
+            return "int32"
+        info = np.iinfo(np.int32)
+        return "int32" if info.min <= series.min() and series.max() <= info.max else None
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        n = len(series)
+        if n >= CATEGORY_MIN_ROWS and series.nunique(dropna=True) / n <= CATEGORY_MAX_RATIO:
+            return "category"
+    return None
+
+
+def plan_dtypes(df, table, streaming=False):
+    """
+    Resuelve el tipo destino de cada columna de df (declarado o automático).
+    Devuelve un dict columna → tipo. En modo streaming el plan se calcula
+    con el primer lote y se reutiliza, así todos los lotes salen iguales.
+
+    - streaming: el plan se va a aplicar a lotes que todavía no vi; los
+      enteros no declarados conservan su tipo en vez de pasar a int32
+    """
+    declared = CURATED_SCHEMAS.get(table, {}).get("dtypes", {})
+    plan = {}
+    for col in df.columns:
+        target = declared.get(col) or _auto_dtype(df[col], streaming)
+        if target:
+            plan[col] = target
+    return plan
+
+
+def _cast(series, target, col, table):
+    if str(series.dtype) == target:
+        return series
+    if target.startswith("int"):
+        # astype de numpy "da la vuelta" en overflow → valido el rango antes
+        info = np.iinfo(target)
+        if series.isna().any():
+            raise SchemaError(f"{table}.{col}: tiene nulos y el esquema pide {target}")
+        if len(series) and (series.min() < info.min or series.max() > info.max):
+            raise SchemaError(f"{table}.{col}: valores fuera de rango para {target}")
+        return series.astype(target)
+    if target.startswith("datetime64"):
+        return pd.to_datetime(series, errors="coerce").astype(target)
+    return series.astype(target)
+
+
+def enforce_schema(df, table, plan=None, streaming=False):
+    """
+    Castea df al esquema de la tabla y valida columnas obligatorias.
+
+    - plan: tipos ya resueltos (ver plan_dtypes); si es None se calcula
+    - streaming: df es el primer lote de varios (ver plan_dtypes)
+    Devuelve (df, plan). Lanza SchemaError si algo no cumple.
+    """
+    required = CURATED_SCHEMAS.get(table, {}).get("required", [])
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise SchemaError(f"{table}: faltan columnas obligatorias {missing}")
+
+    if plan is None:
+        plan = plan_dtypes(df, table, streaming)
+
+    df = df.copy(deep=False)
+    for col, target in plan.items():
+        if col in df.columns:
+            try:
+                df[col] = _cast(df[col], target, col, table)
+            except SchemaError:
+                raise
+            except (TypeError, ValueError) as e:
+                raise SchemaError(f"{table}.{col}: no se pudo convertir a {target} ({e})") from e
+    return df, plan
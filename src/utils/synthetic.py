@@ -0,0 +1,302 @@
+# ------------------------------------------------------------
+# Script: synthetic.py
+#
+# Generador de datos sintéticos con la forma de SpacePartsCoDW
+# (dim.Customers, dim.Products, fact.Invoices) para medir el pipeline
+# sin depender de la base de Azure.
+#
+# [QUÉ IMITA]
+#   • Mismos nombres de columnas que la fuente (CustomerID, FirstName,
+#     ProductKey, Invoice_Date, Net_Invoice_Value, ...), así
+#     etl_curated.py las transforma igual que a las reales. fact.Invoices
+#     trae también las columnas de documento, moneda y tipo de factura
+#     (18 en total): el ancho de la fila pesa en extracción y curated
+#     tanto como el número de filas.
+#   • Las rarezas que ya encontramos:
+#       - clientes con CustomerID nulo (~2%) → sus facturas quedan
+#         huérfanas al curar (las dimensiones los descartan)
+#       - Net_Invoice_Value / Net_Invoice_COGS negativos en una parte
+#         de las facturas (ver sql/exploration.sql, chequeo 4)
+#   • Facturas en orden de fecha (como crecen en la fuente): sirve para
+#     probar el incremental por invoice_date.
+#
+# [ESCALA]
+#   • scale = filas de fact.Invoices (1e4 ... 1e8). Clientes y
+#     productos crecen con ella (con un mínimo), como en un negocio real.
+#   • Todo se genera con numpy en bloques de CHUNK_ROWS filas: la
+#     memoria no depende de la escala.
+#   • Misma semilla → mismos datos (las corridas son comparables).
+#
+# [DESTINOS]
+#   • SQLite: tres archivos (main.db, dim.db, fact.db) adjuntados como
+#     esquemas "dim" y "fact", así "SELECT * FROM dim.Customers" funciona
+#     sin tocar las consultas. sqlite_connect() sirve como "connect"
+#     de run_extract().
+#   • RAW: archivos en data/raw con RawBatchWriter (csv/parquet/arrow),
+#     para medir curated sin pasar por la extracción.
+# ------------------------------------------------------------
+
+import os
+import json
+import sqlite3
+import datetime as dt
+import numpy as np
+import pandas as pd
+from utils.raw_io import RawBatchWriter, raw_file_path
+
+# Filas por bloque generado (y por executemany en SQLite)
+CHUNK_ROWS = 500_000
+DEFAULT_SEED = 42
+# Si cambia la forma de los datos generados, subo este número: una
+# fuente generada con otra versión no se reutiliza
+SYNTHETIC_VERSION = 2
+# Fracción de clientes sin CustomerID y de facturas con montos negativos
+NULL_CUSTOMER_RATIO = 0.02
+NEGATIVE_VALUE_RATIO = 0.35
+# Rango de fechas de las facturas
+START_DATE = dt.date(2021, 1, 1)
+DAYS = 4 * 365
+
+SQLITE_FILES = {"main": "main.db", "dim": "dim.db", "fact": "fact.db"}
+MARKER_NAME = "synthetic.json"
+
+COUNTRIES = ["Colombia", "Mexico", "United States", "Spain", "Chile", "Peru", "Argentina"]
+REGIONS = ["North", "South", "East", "West", "Central"]
+SEGMENTS = ["Retail", "Wholesale", "Government", "Online"]
+GENDERS = ["F", "M"]
+BRANDS = ["Astra", "Orbital", "Nebula", "Quasar", "Zenith", "Apogee"]
+CATEGORIES = ["Propulsion", "Navigation", "Hull", "Life Support", "Electronics"]
+PRODUCT_TYPES = ["Part", "Kit", "Module"]
+CLASSES = ["A", "B", "C"]
+COLORS = ["Black", "White", "Silver", "Red", "Blue"]
+SIZES = ["S", "M", "L", "XL"]
+CURRENCIES = ["USD", "EUR", "COP", "MXN"]
+EXCHANGE_RATES = [1.0, 1.08, 0.00025, 0.058]   # a USD, una por moneda
+INVOICE_TYPES = ["Standard", "Credit Note"]     # los montos negativos son notas crédito
+CHANNELS = ["Direct", "Distributor", "Online"]
+
+# Columnas de cada tabla (en el orden de la fuente) y su tipo en SQLite
+TABLE_COLUMNS = {
+    "dim.Customers": [
+        ("CustomerID", "INTEGER"), ("FirstName", "TEXT"), ("LastName", "TEXT"),
+        ("Country", "TEXT"), ("State", "TEXT"), ("City", "TEXT"), ("Region", "TEXT"),
+        ("Segment", "TEXT"), ("Gender", "TEXT"), ("Account_Manager", "TEXT"),
+    ],
+    "dim.Products": [
+        ("ProductKey", "INTEGER"), ("Product_Name", "TEXT"), ("Price", "REAL"),
+        ("Brand", "TEXT"), ("Sub_Brand", "TEXT"), ("Category", "TEXT"),
+        ("Subcategory", "TEXT"), ("Product_Type", "TEXT"), ("Class", "TEXT"),
+        ("Color", "TEXT"), ("Size", "TEXT"),
+    ],
+    "fact.Invoices": [
+        ("Invoice_Key", "INTEGER"), ("Invoice_Date", "TEXT"), ("CustomerID", "INTEGER"),
+        ("ProductKey", "INTEGER"), ("Quantity", "INTEGER"), ("UnitPrice", "REAL"),
+        ("Net_Invoice_Value", "REAL"), ("Net_Invoice_COGS", "REAL"),
+        ("Invoice_Doc_Number", "TEXT"), ("Invoice_Line", "INTEGER"),
+        ("Sales_Order_Number", "TEXT"), ("Sales_Order_Line", "INTEGER"),
+        ("Ship_Date", "TEXT"), ("Currency", "TEXT"), ("Exchange_Rate", "REAL"),
+        ("Invoice_Type", "TEXT"), ("Discount_Pct", "REAL"), ("Sales_Channel", "TEXT"),
+    ],
+}
+
+
+def table_sizes(scale):
+    """Filas por tabla para una escala (scale = filas de fact.Invoices)."""
+    scale = int(scale)
+    return {
+        "dim.Customers": min(max(scale // 50, 1_000), 5_000_000),
+        "dim.Products": min(max(scale // 5_000, 200), 50_000),
+        "fact.Invoices": scale,
+    }
+
+
+def _labels(prefix, values):
+    return prefix + pd.Series(values).astype(str)
+
+
+def _customers(start, stop, rng):
+    ids = np.arange(start + 1, stop + 1)
+    n = len(ids)
+    country = rng.choice(COUNTRIES, n)
+    customer_id = pd.Series(ids, dtype="Int64")
+    customer_id[rng.random(n) < NULL_CUSTOMER_RATIO] = pd.NA
+    return pd.DataFrame({
+        "CustomerID": customer_id,
+        "FirstName": _labels("Name", ids),
+        "LastName": _labels("Surname", rng.integers(1, 5_000, n)),
+        "Country": country,
+        "State": pd.Series(country) + "-" + pd.Series(rng.integers(1, 20, n)).astype(str),
+        "City": _labels("City", rng.integers(1, 500, n)),
+        "Region": rng.choice(REGIONS, n),
+        "Segment": rng.choice(SEGMENTS, n),
+        "Gender": rng.choice(GENDERS, n),
+        "Account_Manager": _labels("Manager", rng.integers(1, 60, n)),
+    })
+
+
+def _products(n, rng):
+    keys = np.arange(1, n + 1)
+    category = rng.choice(CATEGORIES, n)
+    brand = rng.choice(BRANDS, n)
+    return pd.DataFrame({
+        "ProductKey": keys,
+        "Product_Name": _labels("Part ", keys),
+        "Price": np.round(rng.gamma(2.0, 60.0, n) + 1, 2),
+        "Brand": brand,
+        "Sub_Brand": pd.Series(brand) + " " + pd.Series(rng.choice(["Pro", "Lite", "Max"], n)),
+        "Category": category,
+        "Subcategory": pd.Series(category) + " " + pd.Series(rng.integers(1, 6, n)).astype(str),
+        "Product_Type": rng.choice(PRODUCT_TYPES, n),
+        "Class": rng.choice(CLASSES, n),
+        "Color": rng.choice(COLORS, n),
+        "Size": rng.choice(SIZES, n),
+    })
+
+
+def _invoices(start, stop, total, sizes, prices, rng):
+    keys = np.arange(start + 1, stop + 1)
+    n = len(keys)
+    # Fecha creciente con la clave: la factura i cae en el día i * DAYS / total
+    days = (np.arange(start, stop) * DAYS) // max(total, 1)
+    dates = pd.Timestamp(START_DATE) + pd.to_timedelta(days, unit="D")
+    product = rng.integers(1, sizes["dim.Products"] + 1, n)
+    quantity = rng.integers(1, 21, n)
+    unit_price = prices[product - 1]
+    discount = rng.uniform(0, 0.15, n)
+    value = np.round(quantity * unit_price * (1 - discount), 2)
+    cogs = np.round(value * rng.uniform(0.45, 0.75, n), 2)
+    # Montos negativos como los de la fuente (mismo signo en valor y costo)
+    negative = rng.random(n) < NEGATIVE_VALUE_RATIO
+    sign = np.where(negative, -1.0, 1.0)
+    # Documento: varias líneas por factura y por pedido
+    doc = start + 1 + np.arange(n) // 3
+    currency = rng.integers(0, len(CURRENCIES), n)
+    return pd.DataFrame({
+        "Invoice_Key": keys,
+        "Invoice_Date": dates.strftime("%Y-%m-%d"),
+        "CustomerID": rng.integers(1, sizes["dim.Customers"] + 1, n),
+        "ProductKey": product,
+        "Quantity": quantity,
+        "UnitPrice": unit_price,
+        "Net_Invoice_Value": value * sign,
+        "Net_Invoice_COGS": cogs * sign,
+        "Invoice_Doc_Number": _labels("INV", doc).to_numpy(),
+        "Invoice_Line": np.arange(n) % 3 + 1,
+        "Sales_Order_Number": _labels("SO", doc // 2).to_numpy(),
+        "Sales_Order_Line": np.arange(n) % 6 + 1,
+        "Ship_Date": (dates + pd.to_timedelta(rng.integers(0, 10, n), unit="D")).strftime("%Y-%m-%d"),
+        "Currency": np.asarray(CURRENCIES)[currency],
+        "Exchange_Rate": np.asarray(EXCHANGE_RATES)[currency],
+        "Invoice_Type": np.asarray(INVOICE_TYPES)[negative.astype(int)],
+        "Discount_Pct": np.round(discount * 100, 2),
+        "Sales_Channel": rng.choice(CHANNELS, n),
+    })
+
+
+def iter_tables(scale, seed=DEFAULT_SEED, chunk_rows=CHUNK_ROWS):
+    """
+    Genera las tres tablas por bloques.
+
+    Devuelve un iterador de (tabla, DataFrame); cada tabla puede venir en
+    varios bloques, siempre en orden (primero las dimensiones).
+    """
+    sizes = table_sizes(scale)
+    rng = np.random.default_rng(seed)
+
+    for start in range(0, sizes["dim.Customers"], chunk_rows):
+        yield "dim.Customers", _customers(start, min(start + chunk_rows, sizes["dim.Customers"]), rng)
+
+    products = _products(sizes["dim.Products"], rng)
+    prices = products["Price"].to_numpy()
+    yield "dim.Products", products
+
+    total = sizes["fact.Invoices"]
+    for start in range(0, total, chunk_rows):
+        yield "fact.Invoices", _invoices(start, min(start + chunk_rows, total), total,
+                                         sizes, prices, rng)
+
+
+def sqlite_connect(folder):
+    """Conexión a la base sintética con los esquemas dim y fact adjuntados."""
+    cnxn = sqlite3.connect(os.path.join(folder, SQLITE_FILES["main"]), check_same_thread=False)
+    for schema in ("dim", "fact"):
+        path = os.path.join(folder, SQLITE_FILES[schema]).replace("'", "''")
+        cnxn.execute(f"ATTACH DATABASE '{path}' AS {schema}")
+    return cnxn
+
+
+def read_marker(folder):
+    """Parámetros con los que se generó la carpeta (None si no hay)."""
+    path = os.path.join(folder, MARKER_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_marker(folder, info):
+    with open(os.path.join(folder, MARKER_NAME), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+
+def write_sqlite(folder, scale, seed=DEFAULT_SEED, logger=None):
+    """
+    Crea la base SQLite sintética en folder (reemplaza la anterior).
+    Devuelve {tabla: filas}.
+    """
+    os.makedirs(folder, exist_ok=True)
+    for name in list(SQLITE_FILES.values()) + [MARKER_NAME]:
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    rows = {}
+    cnxn = sqlite_connect(folder)
+    try:
+        for schema in SQLITE_FILES:
+            # Base desechable: sin journal ni fsync, carga mucho más rápida
+            cnxn.execute(f"PRAGMA {schema}.journal_mode = OFF")
+            cnxn.execute(f"PRAGMA {schema}.synchronous = OFF")
+        for table, columns in TABLE_COLUMNS.items():
+            cols = ", ".join(f"{name} {kind}" for name, kind in columns)
+            cnxn.execute(f"CREATE TABLE {table} ({cols})")
+
+        for table, df in iter_tables(scale, seed):
+            marks = ", ".join("?" * len(df.columns))
+            # NA → None y enteros de numpy → int de Python (sqlite3 no los acepta)
+            values = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+            cnxn.executemany(f"INSERT INTO {table} VALUES ({marks})", values)
+            cnxn.commit()
+            rows[table] = rows.get(table, 0) + len(df)
+            if logger:
+                logger.info(f"[SYNTH] {table}: {rows[table]:,} filas")
+        cnxn.execute("CREATE INDEX fact.ix_invoices_date ON Invoices (Invoice_Date)")
+        cnxn.commit()
+    finally:
+        cnxn.close()
+
+    _write_marker(folder, {"target": "sqlite", "scale": int(scale), "seed": seed,
+                           "version": SYNTHETIC_VERSION, "rows": rows})
+    return rows
+
+
+def write_raw(raw_folder, scale, fmt="csv", seed=DEFAULT_SEED, logger=None):
+    """
+    Escribe las tablas sintéticas directo como RAW (data/raw/<tabla>.<fmt>).
+    Devuelve {tabla: filas}.
+    """
+    os.makedirs(raw_folder, exist_ok=True)
+    rows, writers = {}, {}
+    try:
+        for table, df in iter_tables(scale, seed):
+            if table not in writers:
+                path = raw_file_path(raw_folder, table.replace(".", "_"), fmt)
+                writers[table] = RawBatchWriter(path, fmt)
+            writers[table].write(df)
+            rows[table] = rows.get(table, 0) + len(df)
+            if logger:
+                logger.info(f"[SYNTH] {table}: {rows[table]:,} filas")
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return rows
@@ -0,0 +1,214 @@
+# ------------------------------------------------------------
+# Script: validation.py
+#
+# Suite declarativa de validaciones de la fuente (antes eran las
+# consultas de sql/exploration.sql que corría a mano).
+#
+# Cada chequeo es una agregación barata que corre EN EL SERVIDOR:
+#   • count      → COUNT(*)
+#   • nulls      → nulos de una columna
+#   • min / max  → rango de una columna (ej: invoice_date)
+#   • negatives  → valores < 0 (ej: Net_Invoice_Value)
+#
+# La extracción los corre antes y después de bajar la tabla, y los
+# mismos agregados se calculan sobre los lotes que van llegando
+# (sin releer el RAW ni hacer otra pasada en pandas). Al final comparo:
+#   • servidor antes vs. después → ¿la fuente cambió mientras extraía?
+#   • servidor vs. local         → ¿llegó todo lo que había?
+#   • expectativas (ej: 0 nulos en CustomerID) → problemas de calidad
+#
+# El reporte queda en data/state/validation/<tabla>.json.
+# ------------------------------------------------------------
+
+import os
+import json
+import math
+import threading
+import datetime as dt
+import pandas as pd
+
+DEFAULT_REPORT_DIR = os.path.join("data", "state", "validation")
+VALIDATION_MODES = ("off", "warn", "strict")
+
+# Chequeos por tabla origen (mismos de sql/exploration.sql)
+#   - name: nombre del chequeo en el reporte
+#   - kind: count | nulls | min | max | negatives
+#   - column: columna (no aplica a count)
+#   - expect_max: si el valor del servidor lo supera → aviso de calidad
+VALIDATION_SUITE = {
+    "dim.Customers": [
+        {"name": "total_customers", "kind": "count"},
+        {"name": "null_customerid", "kind": "nulls", "column": "CustomerID", "expect_max": 0},
+    ],
+    "dim.Products": [
+        {"name": "total_products", "kind": "count"},
+    ],
+    "fact.Invoices": [
+        {"name": "total_invoices", "kind": "count"},
+        {"name": "min_date", "kind": "min", "column": "invoice_date"},
+        {"name": "max_date", "kind": "max", "column": "invoice_date"},
+        # Negativos conocidos (notas de crédito): se informan, curated aplica ABS()
+        {"name": "negativos", "kind": "negatives", "column": "Net_Invoice_Value"},
+    ],
+}
+
+_SQL = {
+    "count": "COUNT(*)",
+    "nulls": "SUM(CASE WHEN {col} IS NULL THEN 1 ELSE 0 END)",
+    "min": "MIN({col})",
+    "max": "MAX({col})",
+    "negatives": "SUM(CASE WHEN {col} < 0 THEN 1 ELSE 0 END)",
+}
+# Sumas: sobre una tabla vacía SQL devuelve NULL → lo trato como 0
+_ADDITIVE = {"count", "nulls", "negatives"}
+
+
+def build_query(table, checks, where=None):
+    """Un solo SELECT con todas las agregaciones de la tabla."""
+    exprs = [f"{_SQL[c['kind']].format(col=c.get('column'))} AS {c['name']}" for c in checks]
+    query = f"SELECT {', '.join(exprs)} FROM {table}"
+    if where:
+        query += f" WHERE {where}"
+    return query
+
+
+def run_server_checks(cnxn, table, checks, where=None, params=()):
+    """Ejecuta la consulta de agregados y devuelve {chequeo: valor}."""
+    cursor = cnxn.cursor()
+    query = build_query(table, checks, where)
+    if params:
+        cursor.execute(query, params)
+    else:
+        cursor.execute(query)
+    row = cursor.fetchone()
+    values = {}
+    for check, value in zip(checks, row):
+        if value is None and check["kind"] in _ADDITIVE:
+            value = 0
+        values[check["name"]] = value
+    return values
+
+
+class LocalAggregates:
+    """
+    Calcula los mismos agregados sobre los lotes que llegan de la
+    extracción (se usa como callback on_batch). Thread-safe: los rangos
+    de una extracción particionada llaman en paralelo.
+    """
+
+    def __init__(self, checks):
+        self.checks = checks
+        self.values = {c["name"]: (0 if c["kind"] in _ADDITIVE else None) for c in checks}
+        self._lock = threading.Lock()
+
+    def _column(self, df, name):
+        # Sin importar mayúsculas (CustomerID vs customerid)
+        return next((c for c in df.columns if c.lower() == name.lower()), None)
+
+    def __call__(self, df):
+        partial = {}
+        for check in self.checks:
+            kind = check["kind"]
+            if kind == "count":
+                partial[check["name"]] = len(df)
+                continue
+            col = self._column(df, check["column"])
+            if col is None:
+                continue
+            series = df[col]
+            if kind == "nulls":
+                partial[check["name"]] = int(series.isna().sum())
+            elif kind == "negatives":
+                partial[check["name"]] = int((pd.to_numeric(series, errors="coerce") < 0).sum())
+            else:
+                values = series.dropna()
+                if len(values):
+                    partial[check["name"]] = values.min() if kind == "min" else values.max()
+
+        with self._lock:
+            for check in self.checks:
+                name, kind = check["name"], check["kind"]
+                if name not in partial:
+                    continue
+                value, current = partial[name], self.values[name]
+                if kind in _ADDITIVE:
+                    self.values[name] = current + value
+                elif current is None or (value < current if kind == "min" else value > current):
+                    self.values[name] = value
+
+
+def _normalize(value):
+    # Fechas como texto (SQLite) o datetime (pyodbc) → Timestamp comparable
+    if isinstance(value, (dt.date, dt.datetime, pd.Timestamp)):
+        return pd.Timestamp(value)
+    if isinstance(value, str):
+        try:
+            return pd.Timestamp(value)
+        except ValueError:
+            return value
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def _same(a, b):
+    a, b = _normalize(a), _normalize(b)
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def compare(table, checks, before, after, local):
+    """
+    Arma el reporte de una tabla.
+
+    - before / after: valores del servidor antes y después de extraer
+    - local: valores calculados sobre las filas que llegaron
+
+    Un chequeo es "ok" si lo local coincide con el servidor. Si la fuente
+    cambió durante la extracción (drift), para los conteos basta con que
+    lo local quede entre antes y después.
+    """
+    results, ok, warnings = [], True, []
+    drift = any(not _same(before[c["name"]], after[c["name"]]) for c in checks)
+    for check in checks:
+        name, kind = check["name"], check["kind"]
+        b, a, l = before[name], after[name], local.get(name)
+        if _same(a, l) or _same(b, l):
+            status = "ok"
+        elif drift and kind in _ADDITIVE and l is not None and min(a, b) <= l <= max(a, b):
+            status = "ok"
+        else:
+            status = "mismatch"
+            ok = False
+        if "expect_max" in check and a is not None and a > check["expect_max"]:
+            warnings.append(f"{name} = {a} (se esperaba <= {check['expect_max']})")
+        results.append({"name": name, "kind": kind, "column": check.get("column"),
+                        "server_before": b, "server_after": a, "local": l, "status": status})
+    return {
+        "table": table,
+        "ok": ok,
+        "drift": drift,
+        "quality_warnings": warnings,
+        "checks": results,
+        "checked_at": dt.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _json_value(value):
+    if isinstance(value, (dt.date, dt.datetime, pd.Timestamp)):
+        return pd.Timestamp(value).isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def save_report(report, report_dir=DEFAULT_REPORT_DIR):
+    """Guarda el reporte en <report_dir>/<tabla>.json (escritura atómica)."""
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"{report['table']}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=_json_value)
+    os.replace(tmp, path)
+    return path
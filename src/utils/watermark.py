@@ -0,0 +1,142 @@
+# ------------------------------------------------------------
+# Script: watermark.py
+#
+# Ayudante para la extracción incremental. Guardo por tabla una
+# "marca de agua" (high-water mark): el valor máximo de una columna
+# que solo crece (ej: invoice_date o un id) que ya quedó en RAW.
+#
+# En la siguiente corrida solo pido a la base las filas con
+# clave > marca, y las agrego al RAW existente.
+#
+# El estado vive en un JSON local (data/state/watermarks.json):
+#   {
+#     "fact.Invoices": {"key": "invoice_date", "value": "2024-05-14", "type": "str",
+#                       "count": 812, "updated_at": "..."}
+#   }
+#
+# "count" son las filas con clave == marca que ya están en RAW. La
+# clave puede repetirse (invoice_date es por día): si después llegan
+# más facturas de ese mismo día, "clave > marca" nunca las traería.
+# Comparando ese conteo con el de la fuente sé si hay que volver a
+# bajar el día de la marca (ver extract_with_pool en etl_spaceparts.py).
+# ------------------------------------------------------------
+
+import os
+import json
+import threading
+import datetime as dt
+import pandas as pd
+
+DEFAULT_STATE_FILE = os.path.join("data", "state", "watermarks.json")
+
+
+def _encode(value):
+    # Valor → (texto/número serializable, tipo para reconstruirlo)
+    if isinstance(value, (pd.Timestamp, dt.datetime)):
+        return pd.Timestamp(value).isoformat(), "datetime"
+    if isinstance(value, dt.date):
+        return value.isoformat(), "date"
+    if hasattr(value, "item"):  # escalares numpy → python
+        value = value.item()
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return value, "int"
+    if isinstance(value, float):
+        return value, "float"
+    return str(value), "str"
+
+
+def _decode(value, kind):
+    if kind == "datetime":
+        return dt.datetime.fromisoformat(value)
+    if kind == "date":
+        return dt.date.fromisoformat(value)
+    return value
+
+
+class WatermarkStore:
+    """
+    Lee y escribe las marcas de agua por tabla en un archivo JSON.
+
+    - path: ruta del archivo de estado
+
+    La escritura es atómica (archivo temporal + rename), así un corte
+    a mitad de guardado no deja el estado corrupto.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._state = json.load(f)
+
+    def get(self, table, key):
+        """Devuelve la marca guardada para table/key, o None si no hay."""
+        entry = self._state.get(table)
+        if not entry or entry.get("key") != key:
+            return None
+        return _decode(entry["value"], entry["type"])
+
+    def get_count(self, table, key):
+        """Filas con clave == marca ya bajadas (None si no se guardó)."""
+        entry = self._state.get(table)
+        if not entry or entry.get("key") != key:
+            return None
+        return entry.get("count")
+
+    def set(self, table, key, value, count=None):
+        encoded, kind = _encode(value)
+        with self._lock:
+            self._state[table] = {
+                "key": key,
+                "value": encoded,
+                "type": kind,
+                "count": int(count) if count is not None else None,
+                "updated_at": dt.datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save()
+
+    def clear(self, table):
+        with self._lock:
+            if self._state.pop(table, None) is not None:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class MaxTracker:
+    """
+    Lleva el máximo de una columna (y cuántas filas lo tienen) a medida
+    que pasan los lotes. Se usa como callback "on_batch" de la
+    extracción en streaming; es thread-safe para los rangos en paralelo.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.value = None
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, df):
+        # Busco la columna sin importar mayúsculas (Invoice_Date vs invoice_date)
+        col = next((c for c in df.columns if c.lower() == self.key.lower()), None)
+        if col is None:
+            return
+        batch_max = df[col].dropna().max() if len(df) else None
+        if batch_max is None or pd.isna(batch_max):
+            return
+        at_max = int((df[col] == batch_max).sum())
+        with self._lock:
+            if self.value is None or batch_max > self.value:
+                self.value = batch_max
+                self.count = at_max
+            elif batch_max == self.value:
+                self.count += at_max
@@ -0,0 +1,45 @@
+# ------------------------------------------------------------
+# Pruebas del ETL contra la fuente sintética en SQLite
+# (utils/synthetic.py), sin Azure ni driver ODBC.
+#
+# Cada prueba corre en su propia carpeta temporal: los scripts usan
+# rutas relativas (data/raw, data/state, ...) y así no tocan las reales.
+# ------------------------------------------------------------
+
+import pytest
+from utils.logger import configure_logging
+
+# Log solo a consola y sin hilo aparte: nada de logs/etl.log en las pruebas
+configure_logging(async_mode=False, log_file=None)
+
+from utils import synthetic  # noqa: E402
+
+SCALE = 3_000
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def source_dir(tmp_path_factory):
+    """Carpeta de la base sintética (se genera una vez por sesión)."""
+    folder = str(tmp_path_factory.mktemp("source"))
+    synthetic.write_sqlite(folder, SCALE)
+    return folder
+
+
+@pytest.fixture
+def connect(source_dir):
+    return lambda: synthetic.sqlite_connect(source_dir)
+
+
+@pytest.fixture
+def own_source(source_dir, tmp_path):
+    """Copia de la base sintética que la prueba puede modificar."""
+    import shutil
+    folder = str(tmp_path / "own_source")
+    shutil.copytree(source_dir, folder)
+    return folder
@@ -0,0 +1,91 @@
+import os
+import json
+import shutil
+import datetime as dt
+from utils.cache import StageCache, fingerprint
+from etl_curated import run_curated
+from etl_spaceparts import run_extract
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    # Como las salidas del ETL: se reemplazan, no se reescriben en el lugar
+    os.replace(path + ".tmp", path)
+
+
+def test_hit_miss_and_restore():
+    cache = StageCache("cache")
+    out = os.path.join("curated", "dim_Products_curated.csv")
+    fp = fingerprint("curate", "dim_Products", "v1")
+    assert cache.lookup("curate", "dim_Products", fp, [out]) is None
+
+    _write(out, "a,b\n1,2\n")
+    cache.store("curate", "dim_Products", fp, [out], meta={"rows": 1})
+    assert cache.lookup("curate", "dim_Products", fp, [out]) == {"rows": 1}
+    # Otra huella (cambió la entrada) → no
+    assert cache.lookup("curate", "dim_Products", fingerprint("otra"), [out]) is None
+
+    # Salida tocada a mano → no sirve; volver a la huella vieja la restaura
+    fp2 = fingerprint("curate", "dim_Products", "v2")
+    _write(out, "a,b\n3,4\n")
+    cache.store("curate", "dim_Products", fp2, [out], meta={"rows": 1})
+    assert cache.lookup("curate", "dim_Products", fp, [out]) == {"rows": 1}
+    with open(out, encoding="utf-8") as f:
+        assert f.read() == "a,b\n1,2\n"
+
+    # Sin la salida ni su copia en objects/ → no hay acierto
+    os.remove(out)
+    shutil.rmtree(os.path.join("cache", "objects"))
+    assert cache.lookup("curate", "dim_Products", fp2, [out]) is None
+
+    # El manifiesto sobrevive al proceso
+    _write(out, "a,b\n3,4\n")
+    cache.store("curate", "dim_Products", fp2, [out], meta={"rows": 1})
+    assert StageCache("cache").lookup("curate", "dim_Products", fp2, [out]) == {"rows": 1}
+
+
+def _manifest():
+    with open(os.path.join("cache", "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_eviction_by_size_and_age():
+    cache = StageCache("cache", max_bytes=250, max_age_days=30)
+    out = os.path.join("curated", "t.csv")
+    fps = []
+    for i in range(4):
+        _write(out, str(i) * 100)
+        fps.append(fingerprint("curate", "t", i))
+        cache.store("curate", "t", fps[-1], [out])
+
+    # 400 bytes en objects/ con tope 250: se van los menos usados, nunca
+    # la copia vigente
+    assert cache.evict() == fps[:2]
+    assert sorted(_manifest()["objects"]) == sorted(fps[2:])
+    assert not os.path.exists(os.path.join("cache", "objects", fps[0]))
+
+    # Viejo por fecha aunque entre en el tope (otra corrida, 31 días después)
+    manifest = _manifest()
+    manifest["objects"][fps[2]]["last_used"] = \
+        (dt.datetime.now() - dt.timedelta(days=31)).isoformat(timespec="seconds")
+    with open(os.path.join("cache", "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    cache = StageCache("cache", max_bytes=250, max_age_days=30)
+    assert cache.evict() == [fps[2]]
+    assert list(_manifest()["objects"]) == [fps[3]]
+
+
+def test_curate_skipped_when_raw_unchanged(connect):
+    assert run_extract(connect=connect, tables=["dim.Products"])["ok"]
+
+    def curate():
+        return run_curated(tables=["dim_Products"])["tables"][0]
+
+    assert not curate()["cached"]
+    assert curate()["cached"]
+    # El RAW cambia → se vuelve a curar
+    assert run_extract(connect=connect, tables=["dim.Products"], full_refresh=True,
+                       format="parquet")["ok"]
+    assert not curate()["cached"]
@@ -0,0 +1,150 @@
+import os
+import json
+import contextlib
+import datetime as dt
+import pytest
+from utils import synthetic, catalog
+from utils.catalog import (DEFAULT_CATALOG_FILE, load_catalog, read_catalog, find_table,
+                           plan_table)
+from etl_spaceparts import run_extract
+
+TABLES = ["dim.Customers", "fact.Invoices"]
+
+
+@pytest.fixture
+def opened(source_dir, monkeypatch):
+    """Conexión contada: cuántas veces load_catalog fue a la base."""
+    # Cada prueba arranca como un proceso nuevo: sin catálogos en memoria
+    monkeypatch.setattr(catalog, "_introspected", {})
+    calls = []
+
+    @contextlib.contextmanager
+    def connection():
+        calls.append(1)
+        cnxn = synthetic.sqlite_connect(source_dir)
+        try:
+            yield cnxn
+        finally:
+            cnxn.close()
+
+    connection.calls = calls
+    return connection
+
+
+def _age(hours):
+    # Simula un catálogo guardado hace "hours" horas por otro proceso
+    saved = read_catalog()
+    saved["created_at"] = (dt.datetime.now() - dt.timedelta(hours=hours)).isoformat(timespec="seconds")
+    with open(DEFAULT_CATALOG_FILE, "w", encoding="utf-8") as f:
+        json.dump(saved, f)
+    catalog._introspected.clear()
+
+
+def test_catalog_cache_within_ttl(opened):
+    first = load_catalog(opened, TABLES)
+    assert len(opened.calls) == 1
+    assert os.path.exists(DEFAULT_CATALOG_FILE)
+
+    # Otro proceso, caché de hace 2 horas: no se consulta la base
+    _age(2)
+    assert load_catalog(opened, TABLES, ttl_hours=24)["tables"] == first["tables"]
+    assert len(opened.calls) == 1
+
+
+@pytest.mark.parametrize("ttl", [1, 24])
+def test_catalog_expired_is_reread(opened, ttl):
+    load_catalog(opened, TABLES)
+    _age(ttl + 1)
+    fresh = load_catalog(opened, TABLES, ttl_hours=ttl)
+    assert len(opened.calls) == 2
+    # La caché nueva reemplaza a la vencida
+    assert read_catalog()["created_at"] == fresh["created_at"]
+    age = dt.datetime.now() - dt.datetime.fromisoformat(fresh["created_at"])
+    assert age < dt.timedelta(hours=ttl)
+
+
+def test_catalog_expires_in_long_process(opened):
+    # Un proceso que vive más que el TTL no se queda con el de memoria
+    load_catalog(opened, TABLES)
+    (cached,) = catalog._introspected.values()
+    cached["created_at"] = (dt.datetime.now() - dt.timedelta(hours=25)).isoformat(timespec="seconds")
+    load_catalog(opened, TABLES, ttl_hours=24)
+    assert len(opened.calls) == 2
+
+
+def test_catalog_reread_on_refresh_missing_table_or_corrupt(opened):
+    load_catalog(opened, ["dim.Customers"])
+    catalog._introspected.clear()
+    load_catalog(opened, ["dim.Customers"], refresh=True)
+    assert len(opened.calls) == 2
+
+    # Tabla pedida que no está en la caché
+    saved = read_catalog()
+    saved["tables"] = {k: v for k, v in saved["tables"].items() if "Invoices" not in k}
+    with open(DEFAULT_CATALOG_FILE, "w", encoding="utf-8") as f:
+        json.dump(saved, f)
+    catalog._introspected.clear()
+    load_catalog(opened, TABLES)
+    assert len(opened.calls) == 3
+
+    # Archivo corrupto → se vuelve a introspeccionar
+    with open(DEFAULT_CATALOG_FILE, "w", encoding="utf-8") as f:
+        f.write("{roto")
+    catalog._introspected.clear()
+    load_catalog(opened, TABLES)
+    assert len(opened.calls) == 4
+
+
+def test_catalog_ttl_from_run_extract(connect, monkeypatch, caplog):
+    monkeypatch.setattr(catalog, "_introspected", {})
+
+    def introspections():
+        return sum("tablas leídas de la fuente" in r.getMessage() for r in caplog.records)
+
+    options = dict(tables=["dim.Products"], connect=connect, full_refresh=True)
+    with caplog.at_level("INFO", logger="ETL-SpaceParts"):
+        assert run_extract(**options)["ok"]
+        assert run_extract(**options)["ok"]
+        assert introspections() == 1
+
+        # Caché de hace una hora con --catalog-ttl 0.5: vencida
+        _age(1)
+        assert run_extract(catalog_ttl=0.5, **options)["ok"]
+        assert introspections() == 2
+        # --refresh-catalog en un proceso nuevo ignora la caché fresca
+        catalog._introspected.clear()
+        assert run_extract(refresh_catalog=True, **options)["ok"]
+        assert introspections() == 3
+
+
+def test_catalog_per_working_dir(opened, tmp_path, monkeypatch):
+    # Mismo proceso, otra carpeta de trabajo: otro catálogo, no el de memoria
+    load_catalog(opened, TABLES)
+    other = tmp_path / "other"
+    other.mkdir()
+    monkeypatch.chdir(other)
+    load_catalog(opened, TABLES)
+    assert len(opened.calls) == 2
+    assert os.path.exists(DEFAULT_CATALOG_FILE)
+
+
+def test_catalog_adds_bounds_for_later_tables(opened, monkeypatch):
+    # Como main_etl: un run_extract por tabla, cada uno con su llamada
+    monkeypatch.setattr(catalog, "PARTITION_MIN_ROWS", 500)
+    monkeypatch.setattr(catalog, "SINGLE_FETCH_ROWS", 100)
+    first = load_catalog(opened, ["dim.Customers"])
+    assert find_table(first, "fact.Invoices")["bounds"] == {}
+
+    # En SQLite la candidata sale de la pista (la clave, como en run_extract)
+    hints = {"fact.Invoices": ["Invoice_Key"]}
+    second = load_catalog(opened, ["fact.Invoices"], hints=hints)
+    assert len(opened.calls) == 2
+    bounds = find_table(second, "fact.Invoices")["bounds"]
+    assert bounds["Invoice_Key"] == {"min": 1, "max": 3000}
+    plan = plan_table(find_table(second, "fact.Invoices"), "sqlite", ["Invoice_Key"])
+    assert plan["mode"] == "partition"
+    # Los rangos quedan en la caché: otro proceso no vuelve a la base
+    assert find_table(read_catalog(), "fact.Invoices")["bounds"] == bounds
+    catalog._introspected.clear()
+    load_catalog(opened, TABLES, hints=hints)
+    assert len(opened.calls) == 2
@@ -0,0 +1,68 @@
+import threading
+import pytest
+from utils.dag import Task, run_dag, OK, FAILED, SKIPPED
+
+
+def _status(outcome):
+    return {name: o["status"] for name, o in outcome.items()}
+
+
+def test_failed_task_skips_dependents():
+    ran = []
+
+    def step(name, result=None):
+        def fn(inputs):
+            ran.append(name)
+            return result if result is not None else {"ok": True, "inputs": sorted(inputs)}
+        return fn
+
+    def boom(inputs):
+        raise RuntimeError("se cayó la extracción")
+
+    tasks = [
+        Task("extract:a", step("extract:a")),
+        Task("curate:a", step("curate:a", {"ok": False}), deps=["extract:a"]),
+        Task("load:a", step("load:a"), deps=["curate:a"]),
+        Task("extract:b", boom),
+        Task("curate:b", step("curate:b"), deps=["extract:b"]),
+        Task("load:b", step("load:b"), deps=["curate:b"]),
+        Task("extract:c", step("extract:c")),
+        Task("load:c", step("load:c"), deps=["extract:c"]),
+        # Depende de una rama que falló y de otra que anduvo
+        Task("publish", step("publish"), deps=["load:a", "load:c"]),
+    ]
+    outcome = run_dag(tasks, workers=2)
+
+    assert _status(outcome) == {
+        "extract:a": OK, "curate:a": FAILED, "load:a": SKIPPED,
+        "extract:b": FAILED, "curate:b": SKIPPED, "load:b": SKIPPED,
+        "extract:c": OK, "load:c": OK, "publish": SKIPPED,
+    }
+    assert not {"load:a", "curate:b", "load:b", "publish"} & set(ran)
+    # Cada tarea recibe los resultados de sus dependencias
+    assert outcome["load:c"]["result"]["inputs"] == ["extract:c"]
+    assert list(outcome) == [t.name for t in tasks]
+
+
+def test_independent_tasks_run_concurrently():
+    # Si no corren a la vez, la barrera vence y las tareas fallan
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_other(inputs):
+        barrier.wait()
+        return {"ok": True}
+
+    outcome = run_dag([Task("extract:a", wait_other), Task("extract:b", wait_other)], workers=2)
+    assert set(_status(outcome).values()) == {OK}
+
+
+@pytest.mark.parametrize("tasks,message", [
+    ([Task("a", None, deps=["c"]), Task("b", None, deps=["a"]), Task("c", None, deps=["b"])],
+     "ciclo"),
+    ([Task("a", None, deps=["a"])], "ciclo"),
+    ([Task("a", None, deps=["x"])], "inexistentes"),
+    ([Task("a", None), Task("a", None)], "duplicada"),
+])
+def test_invalid_graph_rejected(tasks, message):
+    with pytest.raises(ValueError, match=message):
+        run_dag(tasks)
@@ -0,0 +1,41 @@
+import pandas as pd
+from utils import dates
+from utils.dates import parse_dates, detect_format, forget_formats
+
+
+def test_detect_requires_every_date():
+    iso = [f"2024-01-{d:02d}" for d in range(1, 29)]
+    assert detect_format(iso) == "%Y-%m-%d"
+    # Una fecha en otro formato: ningún formato sirve para todas
+    assert detect_format(iso + ["03/15/2024"]) is None
+    # Un valor que no es fecha no cuenta en contra
+    assert detect_format(iso + ["sin fecha"]) == "%Y-%m-%d"
+
+
+def test_parse_falls_back_per_value():
+    values = pd.Series([f"2024-01-{d:02d}" for d in range(1, 20)] + ["03/15/2024", "xx", None])
+    stats = {}
+    parsed = parse_dates(values, key="t.col", stats=stats)
+    assert parsed.iloc[0] == pd.Timestamp("2024-01-01")
+    assert parsed.iloc[19] == pd.Timestamp("2024-03-15")
+    assert pd.isna(parsed.iloc[20]) and pd.isna(parsed.iloc[21])
+    # Solo el valor que no es fecha (el nulo ya lo era)
+    assert stats["coerced"] == 1
+
+    # Formato recordado: las fechas en otro formato se parsean igual
+    parse_dates(pd.Series(["2024-02-01", "xx"]), key="t.iso")
+    assert dates._formats["t.iso"] == "%Y-%m-%d"
+    stats = {}
+    parsed = parse_dates(pd.Series(["2024-02-01", "2024-02-30", "15/03/2024"]), key="t.iso",
+                         stats=stats)
+    assert dates._formats["t.iso"] == "%Y-%m-%d"
+    assert parsed.iloc[2] == pd.Timestamp("2024-03-15")
+    assert stats["coerced"] == 1
+
+
+def test_forget_formats():
+    parse_dates(pd.Series(["20240101"]), key="tabla.fecha")
+    parse_dates(pd.Series(["2024-01-01"]), key="otra.fecha")
+    forget_formats("tabla")
+    assert "tabla.fecha" not in dates._formats
+    assert dates._formats["otra.fecha"] == "%Y-%m-%d"
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import decimal
+import pytest
+from utils import synthetic
+from utils.raw_io import RAW_FORMATS, find_raw, read_raw
+from etl_spaceparts import run_extract
+
+TABLES = ["dim.Customers", "dim.Products", "fact.Invoices"]
+
+
+@pytest.mark.parametrize("fmt", RAW_FORMATS)
+def test_streamed_extract_each_format(connect, fmt):
+    # Lotes chicos: la tabla de hechos llega en varios lotes
+    result = run_extract(connect=connect, full_refresh=True, format=fmt, batch_size=700,
+                         plan="off")
+    assert result["ok"]
+    sizes = synthetic.table_sizes(3_000)
+    for table in TABLES:
+        path = find_raw(os.path.join("data", "raw"), table.replace(".", "_"))
+        assert path.endswith(fmt)
+        df = read_raw(path)
+        assert len(df) == sizes[table]
+        assert list(df.columns) == [c for c, _ in synthetic.TABLE_COLUMNS[table]]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_decimal_column_to_columnar(tmp_path, fmt):
+    # Como pyodbc con DECIMAL/MONEY: el driver entrega objetos Decimal
+    db = str(tmp_path / "prices.db")
+    cnxn = sqlite3.connect(db)
+    cnxn.execute("CREATE TABLE Prices (ProductKey INTEGER, Price MONEY)")
+    cnxn.executemany("INSERT INTO Prices VALUES (?, ?)",
+                     [(i, f"{i}.50") for i in range(1, 200)] + [(200, None)])
+    cnxn.commit()
+    cnxn.close()
+    sqlite3.register_converter("MONEY", lambda b: decimal.Decimal(b.decode()))
+
+    def connect():
+        return sqlite3.connect(db, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False)
+
+    # plan auto: el catálogo fija Price como float64 (numeric → double)
+    result = run_extract(tables=["main.Prices"], connect=connect, format=fmt, batch_size=50)
+    assert result["ok"]
+    df = read_raw(find_raw(os.path.join("data", "raw"), "main_Prices"))
+    assert len(df) == 200
+    assert df["Price"].dtype == "float64"
+    assert df["Price"].iloc[0] == 1.5
+    assert df["Price"].isna().sum() == 1
+
+
+def _add_invoice(folder, date):
+    cnxn = synthetic.sqlite_connect(folder)
+    row = list(cnxn.execute("SELECT * FROM fact.Invoices ORDER BY Invoice_Key DESC LIMIT 1").fetchone())
+    row[0] += 1
+    row[1] = date
+    cnxn.execute(f"INSERT INTO fact.Invoices VALUES ({', '.join('?' * len(row))})", row)
+    cnxn.commit()
+    cnxn.close()
+    return row[0]
+
+
+def _source_keys(folder):
+    cnxn = synthetic.sqlite_connect(folder)
+    keys = sorted(r[0] for r in cnxn.execute("SELECT Invoice_Key FROM fact.Invoices"))
+    cnxn.close()
+    return keys
+
+
+@pytest.mark.parametrize("fmt,partition", [("csv", []), ("parquet", []),
+                                           ("parquet", ["fact.Invoices:invoice_date:3"])])
+def test_incremental_same_day_late_rows(own_source, fmt, partition):
+    def extract():
+        result = run_extract(tables=["fact.Invoices"], format=fmt, partition=partition,
+                             connect=lambda: synthetic.sqlite_connect(own_source))
+        assert result["ok"]
+        return result["tables"][0]["rows"]
+
+    def raw_keys():
+        path = find_raw(os.path.join("data", "raw"), "fact_Invoices")
+        return sorted(read_raw(path, columns=["Invoice_Key"])["Invoice_Key"].tolist())
+
+    extract()
+    cnxn = synthetic.sqlite_connect(own_source)
+    last_day = cnxn.execute("SELECT MAX(Invoice_Date) FROM fact.Invoices").fetchone()[0]
+    cnxn.close()
+
+    # Factura tardía con la misma fecha que la marca de agua
+    late = _add_invoice(own_source, last_day)
+    extract()
+    assert raw_keys() == _source_keys(own_source)
+    assert late in raw_keys()
+
+    # Sin filas nuevas: no se vuelve a bajar el día
+    assert extract() == 0
+    assert raw_keys() == _source_keys(own_source)
+
+    # Día nuevo: solo el delta
+    _add_invoice(own_source, "2099-01-01")
+    assert extract() == 1
+    assert raw_keys() == _source_keys(own_source)
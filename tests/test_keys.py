@@ -0,0 +1,99 @@
+import os
+import pandas as pd
+from utils.keys import (KeyIndex, OrphanCounter, load_indexes, save_indexes, update_dimension,
+                        resolve_fact_keys, index_path)
+from utils.cache import StageCache
+from utils.raw_io import read_raw
+from utils.rollups import find_curated
+from etl_curated import run_curated
+from etl_spaceparts import run_extract
+
+KEYS_DIR = "keys"
+
+
+def _dims(customers, products=(1, 2, 3)):
+    update_dimension("dim_Customers", pd.DataFrame({"id_cliente": list(customers)}), KEYS_DIR)
+    update_dimension("dim_Products", pd.DataFrame({"productkey": list(products)}), KEYS_DIR)
+
+
+def _resolve(fact, replace):
+    indexes, counter = load_indexes(KEYS_DIR), OrphanCounter()
+    out = resolve_fact_keys(fact, indexes, counter, replace=replace)
+    save_indexes(indexes, KEYS_DIR)
+    return out, counter.result()
+
+
+def test_deleted_member_is_orphan():
+    fact = pd.DataFrame({"customerid": [10, 20, 30], "productkey": [1, 2, 3]})
+    _dims([10, 20, 30])
+    _, orphans = _resolve(fact, replace=False)
+    assert orphans["customerid"]["rows"] == 0
+
+    # El cliente 20 se borra de la dimensión: conserva su clave sustituta
+    _, _, removed = update_dimension("dim_Customers", pd.DataFrame({"id_cliente": [10, 30]}),
+                                     KEYS_DIR)
+    assert removed == 1
+    out, orphans = _resolve(fact, replace=True)
+    assert orphans["customerid"] == {"rows": 1, "sample": [20]}
+    assert out["customer_sk"].tolist() == [1, 2, 3]
+
+
+def test_inferred_member_keeps_business_key():
+    _dims([10, 20])
+    fact = pd.DataFrame({"customerid": [10, 99, None], "productkey": [1, 2, 3]})
+    out, orphans = _resolve(fact, replace=True)
+    assert orphans["customerid"]["rows"] == 2
+    inferred = int(out["customer_sk"].iloc[1])
+    assert inferred > 0 and out["customer_sk"].iloc[2] == -1
+
+    # La clave de negocio queda en el índice, como miembro no activo
+    index = KeyIndex.load("dim_Customers", KEYS_DIR)
+    assert index.resolve(pd.Series([99])).tolist() == [inferred]
+    assert not index.members(pd.Series([99]))[0]
+
+    # El cliente llega después: misma clave sustituta, ya no es huérfana
+    df, added, _ = update_dimension("dim_Customers", pd.DataFrame({"id_cliente": [10, 20, 99]}),
+                                    KEYS_DIR, add_sk=True)
+    assert added == 0
+    assert df["customer_sk"].tolist() == [1, 2, inferred]
+    out, orphans = _resolve(fact.iloc[:2], replace=True)
+    assert orphans["customerid"]["rows"] == 0
+    assert out["customer_sk"].tolist() == [1, inferred]
+
+
+def test_keys_dir_follows_curated_folder(connect):
+    # Dos datasets (ej: escalas del benchmark) no comparten claves sustitutas
+    assert run_extract(connect=connect, tables=["dim.Customers"], raw_folder="a/raw")["ok"]
+    os.makedirs("b/raw")
+    raw = read_raw(os.path.join("a", "raw", "dim_Customers.csv"))
+    raw.tail(10).to_csv(os.path.join("b", "raw", "dim_Customers.csv"), index=False)
+
+    def curate(folder):
+        result = run_curated(tables=["dim_Customers"], raw_folder=f"{folder}/raw",
+                             curated_folder=f"{folder}/curated", surrogate_keys=True,
+                             cache=StageCache(f"{folder}/cache"))
+        assert result["ok"]
+        return read_raw(find_curated(f"{folder}/curated", "dim_Customers"))
+
+    curate("a")
+    b = curate("b")
+    # Índice propio: el dataset b numera desde 1
+    assert sorted(b["customer_sk"].tolist()) == list(range(1, len(b) + 1))
+    assert os.path.exists(index_path("dim_Customers", os.path.join("a", "state", "keys")))
+    assert os.path.exists(index_path("dim_Customers", os.path.join("b", "state", "keys")))
+    assert not os.path.exists(os.path.join("data", "state", "keys"))
+
+
+def test_keys_dir_in_fingerprint(connect):
+    assert run_extract(connect=connect, tables=["dim.Customers"])["ok"]
+    cache = StageCache()
+
+    def curate(**options):
+        return run_curated(tables=["dim_Customers"], surrogate_keys=True, cache=cache,
+                           **options)["tables"][0]
+
+    assert not curate()["cached"]
+    assert curate()["cached"]
+    # Otra carpeta de índices → otras claves: no sirve lo cacheado
+    assert not curate(keys_dir="otros_keys")["cached"]
+    assert os.path.exists(index_path("dim_Customers", "otros_keys"))
@@ -0,0 +1,147 @@
+import os
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect, text
+import etl_load
+from etl_load import run_sql_load, load_table
+from etl_curated import run_curated
+from etl_spaceparts import run_extract
+from utils import synthetic
+from utils.cache import StageCache
+
+CURATED = os.path.join("data", "curated")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_sql_load_upsert_and_replace(own_source, engine):
+    connect = lambda: synthetic.sqlite_connect(own_source)   # noqa: E731
+    assert run_extract(connect=connect, full_refresh=True)["ok"]
+    assert run_curated(no_cache=True, no_rollups=True)["ok"]
+    assert run_sql_load(engine=engine, batch_size=700)["ok"]
+    sizes = synthetic.table_sizes(3_000)
+    assert _count(engine, "fact_invoices") == sizes["fact.Invoices"]
+    customers = _count(engine, "dim_customers")
+
+    # Cambia un cliente en la fuente y se borran facturas: la dimensión se
+    # actualiza por clave y la tabla de hechos se reemplaza entera
+    cnxn = connect()
+    cnxn.execute("UPDATE dim.Customers SET Country = 'Narnia' WHERE CustomerID = "
+                 "(SELECT MIN(CustomerID) FROM dim.Customers)")
+    cnxn.execute("DELETE FROM fact.Invoices WHERE Invoice_Key > 2500")
+    cnxn.commit()
+    cnxn.close()
+    assert run_extract(connect=connect, full_refresh=True)["ok"]
+    assert run_curated(no_cache=True, no_rollups=True)["ok"]
+    assert run_sql_load(engine=engine, batch_size=700)["ok"]
+
+    assert _count(engine, "dim_customers") == customers
+    assert _count(engine, "fact_invoices") == 2500
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM dim_customers "
+                                 "WHERE country = 'Narnia'")).scalar() == 1
+    assert sorted(inspect(engine).get_table_names()) == ["dim_customers", "dim_products",
+                                                         "fact_invoices"]
+
+
+def test_replace_failure_keeps_target(engine, monkeypatch):
+    os.makedirs(CURATED)
+    source = os.path.join(CURATED, "fact_Invoices_curated.parquet")
+    pd.DataFrame({"invoice_key": range(10), "profit": 1.5}).to_parquet(source, index=False)
+    assert load_table(engine, "fact_Invoices", source)["rows"] == 10
+
+    def broken(path, batch_size):
+        yield pd.DataFrame({"invoice_key": [1, 2], "profit": 2.0})
+        raise OSError("se cortó la lectura")
+
+    monkeypatch.setattr(etl_load, "iter_raw_batches", broken)
+    with pytest.raises(OSError):
+        load_table(engine, "fact_Invoices", source)
+    # La destino sigue con lo anterior y no queda staging
+    assert _count(engine, "fact_invoices") == 10
+    assert inspect(engine).get_table_names() == ["fact_invoices"]
+
+
+def test_reload_with_changed_columns(engine):
+    os.makedirs(CURATED)
+    fact = os.path.join(CURATED, "fact_Invoices_curated.parquet")
+    dim = os.path.join(CURATED, "dim_Customers_curated.parquet")
+    pd.DataFrame({"invoice_key": range(10), "customerid": 1}).to_parquet(fact, index=False)
+    pd.DataFrame({"id_cliente": range(5), "country": "AR"}).to_parquet(dim, index=False)
+    assert run_sql_load(engine=engine)["ok"]
+
+    # Como con --surrogate-keys: cambian las columnas del curated
+    pd.DataFrame({"invoice_key": range(10), "customer_sk": 3}).to_parquet(fact, index=False)
+    pd.DataFrame({"id_cliente": range(5), "country": "AR",
+                  "customer_sk": range(5)}).to_parquet(dim, index=False)
+    summary = run_sql_load(engine=engine)
+    results = {r["table"]: r for r in summary["tables"]}
+
+    # replace: la destino nueva trae las columnas nuevas
+    assert results["fact_Invoices"]["ok"]
+    columns = [c["name"] for c in inspect(engine).get_columns("fact_invoices")]
+    assert columns == ["invoice_key", "customer_sk"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT SUM(customer_sk) FROM fact_invoices")).scalar() == 30
+    # upsert: no descarta columnas en silencio, falla
+    assert not summary["ok"] and not results["dim_Customers"]["ok"]
+    columns = [c["name"] for c in inspect(engine).get_columns("dim_customers")]
+    assert columns == ["id_cliente", "country"]
+
+
+@pytest.mark.parametrize("ext", ["parquet", "csv"])
+def test_replace_with_empty_source(engine, ext):
+    os.makedirs(CURATED)
+    source = os.path.join(CURATED, f"fact_Invoices_curated.{ext}")
+    df = pd.DataFrame({"invoice_key": range(10), "profit": 1.5})
+    write = df.to_parquet if ext == "parquet" else df.to_csv
+    write(source, index=False)
+    assert load_table(engine, "fact_Invoices", source)["rows"] == 10
+
+    # Curated vacío: la destino queda vacía, no con los datos viejos
+    write = df.head(0).to_parquet if ext == "parquet" else df.head(0).to_csv
+    write(source, index=False)
+    assert load_table(engine, "fact_Invoices", source)["rows"] == 0
+    assert _count(engine, "fact_invoices") == 0
+    assert inspect(engine).get_table_names() == ["fact_invoices"]
+
+
+def test_sql_load_skipped_when_unchanged(engine):
+    os.makedirs(CURATED)
+    source = os.path.join(CURATED, "fact_Invoices_curated.parquet")
+    pd.DataFrame({"invoice_key": range(10), "profit": 1.5}).to_parquet(source, index=False)
+    cache = StageCache()
+
+    def load():
+        return run_sql_load(engine=engine, tables=["fact_Invoices"], files=[source],
+                            cache=cache)["tables"][0]
+
+    assert not load().get("cached")
+    # Sin cambios: no se vuelve a cargar
+    result = load()
+    assert result["cached"] and result["rows"] == 10
+
+    # Otro destino con el mismo curated: se carga
+    other = create_engine(f"sqlite:///{os.path.abspath('other.db')}")
+    assert not run_sql_load(engine=other, tables=["fact_Invoices"], files=[source],
+                            cache=cache)["tables"][0].get("cached")
+    other.dispose()
+
+    # Curated distinto o tabla borrada a mano: se carga
+    pd.DataFrame({"invoice_key": range(5), "profit": 1.5}).to_parquet(source, index=False)
+    assert not load().get("cached")
+    assert _count(engine, "fact_invoices") == 5
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE fact_invoices"))
+    assert not load().get("cached")
+    assert _count(engine, "fact_invoices") == 5
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import logging
+import subprocess
+import pytest
+from utils.logger import configure_logging, get_logger, log_context, set_run_id, forward_child_line
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+CHILD = """
+import sys
+from utils.logger import configure_logging, get_logger
+configure_logging(async_mode=True, log_file="logs/etl.log")
+logger = get_logger("ETL-Prueba")
+for i in range(int(sys.argv[1])):
+    logger.info(f"lote {i}")
+logger.warning("fin - con guion")
+print("un print suelto")
+"""
+
+
+def _run(env_extra, n):
+    env = dict(os.environ, PYTHONPATH=SRC, **env_extra)
+    return subprocess.run([sys.executable, "-c", CHILD, str(n)], env=env, capture_output=True,
+                          text=True, timeout=120, check=True)
+
+
+@pytest.fixture
+def restore_logging():
+    yield
+    set_run_id(None)
+    configure_logging(async_mode=False, log_file=None)
+
+
+def test_queue_flushed_at_exit():
+    # El proceso termina apenas loguea: lo que quedó en la cola igual se escribe
+    _run({"ETL_LOG_CHILD": "0"}, 20_000)
+    with open(os.path.join("logs", "etl.log"), encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 20_001
+    assert lines[0].endswith("ETL-Prueba - INFO - lote 0")
+    assert lines[-1].endswith("WARNING - fin - con guion")
+
+
+def test_child_lines_forwarded(caplog):
+    result = _run({"ETL_LOG_CHILD": "1"}, 3)
+    # El hijo no escribe el archivo: manda todo por stdout
+    assert not os.path.exists(os.path.join("logs", "etl.log"))
+    fallback = get_logger("Main-ETL")
+    with caplog.at_level(logging.INFO):
+        for line in result.stdout.splitlines(keepends=True) + ["\n"]:
+            forward_child_line(line, fallback)
+    got = [(r.name, r.levelname, r.getMessage()) for r in caplog.records]
+    assert got == [("ETL-Prueba", "INFO", "lote 0"), ("ETL-Prueba", "INFO", "lote 1"),
+                   ("ETL-Prueba", "INFO", "lote 2"),
+                   ("ETL-Prueba", "WARNING", "fin - con guion"),
+                   ("Main-ETL", "INFO", "un print suelto")]
+
+
+def test_forward_child_line_parsing(caplog):
+    fallback = get_logger("Main-ETL")
+    with caplog.at_level(logging.INFO):
+        forward_child_line("ETL-Load - ERROR - [ERROR] falló - lote 3\n", fallback)
+        forward_child_line("Traceback (most recent call last):\n", fallback)
+        forward_child_line("algo - NIVEL - no es un nivel\n", fallback)
+        forward_child_line("\n", fallback)
+    got = [(r.name, r.levelname, r.getMessage()) for r in caplog.records]
+    assert got == [("ETL-Load", "ERROR", "[ERROR] falló - lote 3"),
+                   ("Main-ETL", "INFO", "Traceback (most recent call last):"),
+                   ("Main-ETL", "INFO", "algo - NIVEL - no es un nivel")]
+
+
+def test_async_json_with_context(restore_logging):
+    configure_logging(async_mode=True, json_format=True, log_file=os.path.join("logs", "etl.log"))
+    set_run_id("20250101_000000")
+    logger = get_logger("ETL-Curated")
+    args = ["fact_Invoices"]
+    with log_context(stage="curate", table="fact_Invoices"):
+        logger.info("[START] %s", args[0])
+    # El mensaje se arma al loguear, no cuando el hilo del listener lo escribe
+    args[0] = "cambiado"
+    logger.info("sin contexto")
+    configure_logging(async_mode=False, log_file=None)   # vacía la cola
+
+    with open(os.path.join("logs", "etl.log"), encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["message"] for r in records] == ["[START] fact_Invoices", "sin contexto"]
+    assert records[0]["table"] == "fact_Invoices" and records[0]["stage"] == "curate"
+    assert records[1]["table"] is None
+    assert {r["run_id"] for r in records} == {"20250101_000000"}
+    assert records[0]["logger"] == "ETL-Curated" and records[0]["level"] == "INFO"
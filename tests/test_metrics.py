@@ -0,0 +1,60 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from utils.metrics import RunMetrics, peak_rss_mb
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_measure_writes_jsonl(tmp_path):
+    metrics = RunMetrics(run_id="prueba", metrics_dir=str(tmp_path / "metrics"))
+    with metrics.measure("curate", "fact_Invoices") as m:
+        m.rows_in, m.rows_out = 100, 90
+    with pytest.raises(ValueError):
+        with metrics.measure("load", "fact_Invoices"):
+            raise ValueError("falla")
+
+    assert metrics.path == str(tmp_path / "metrics" / "run_prueba.jsonl")
+    with open(metrics.path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert [(r["stage"], r["status"]) for r in lines] == [("curate", "ok"), ("load", "error")]
+    assert lines[0]["rows_out"] == 90 and lines[0]["run_id"] == "prueba"
+    for key in ("wall_seconds", "cpu_seconds", "process_cpu_seconds", "process_peak_rss_mb",
+                "peak_growth_mb", "rows_per_sec"):
+        assert key in lines[0]
+
+
+def test_cpu_of_worker_threads(tmp_path):
+    # Como run_extract: el trabajo corre en hilos del pool, no en el que mide
+    metrics = RunMetrics(metrics_dir=str(tmp_path))
+    with metrics.measure("extract", "fact_Invoices") as m:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(_busy, [2_000_000] * 2))
+    assert m.cpu_seconds < m.process_cpu_seconds
+    assert m.process_cpu_seconds > 0.05
+    summary = metrics.summary_lines()
+    assert f"{m.process_cpu_seconds:.2f}" in summary[2]
+
+
+@pytest.mark.skipif(peak_rss_mb() is None, reason="sin medición de memoria")
+def test_peak_growth_per_stage(tmp_path):
+    metrics = RunMetrics(metrics_dir=str(tmp_path))
+    # Más grande que el pico actual: el pico del proceso tiene que subir
+    size_mb = peak_rss_mb() + 150
+    with metrics.measure("curate", "grande") as big:
+        data = np.ones(int(size_mb * 1024 ** 2 / 8))
+        data.sum()
+    del data
+    with metrics.measure("curate", "chica") as small:
+        np.ones(1_000).sum()
+
+    assert big.peak_growth_mb > 100
+    # Debajo del pico: el pico del proceso sigue igual, la subida es 0
+    assert small.peak_growth_mb < 5
+    assert small.process_peak_rss_mb >= big.process_peak_rss_mb
+    assert metrics.summary_lines()[-1].startswith("Pico de memoria del proceso")
+    assert os.path.exists(metrics.path)
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from utils.profiling import Profiler
+
+
+def _batches(n_batches=10, rows=2_000, seed=0):
+    # Claves repetidas dentro de cada lote y entre lotes
+    rng = np.random.default_rng(seed)
+    for _ in range(n_batches):
+        yield pd.DataFrame({"invoice_key": rng.integers(0, 15_000, rows),
+                            "net_invoice_value": rng.random(rows)})
+
+
+@pytest.mark.parametrize("dup_memory", [10 ** 9, 3_000, 500])
+def test_duplicates_exact_with_spill(tmp_path, dup_memory):
+    full = pd.concat(_batches(), ignore_index=True)
+    expected = int(full.duplicated(subset=["invoice_key"]).sum())
+
+    profiler = Profiler("fact_Invoices", key=["invoice_key"], dup_memory=dup_memory,
+                        spill_dir=str(tmp_path))
+    for df in _batches():
+        profiler.update(df)
+    assert bool(os.listdir(tmp_path)) is (dup_memory < len(full))
+    assert profiler.result()["duplicates"] == expected
+    # result() se puede pedir más de una vez
+    assert profiler.duplicates() == expected
+
+
+def test_duplicates_merge_spilled_profiles(tmp_path):
+    first, second = list(_batches(seed=1)), list(_batches(seed=2))
+    full = pd.concat(first + second, ignore_index=True)
+    expected = int(full.duplicated(subset=["invoice_key"]).sum())
+
+    profiles = []
+    for batches in (first, second):
+        p = Profiler("fact_Invoices", key=["invoice_key"], dup_memory=1_000,
+                     spill_dir=str(tmp_path))
+        for df in batches:
+            p.update(df)
+        profiles.append(p)
+    merged = profiles[0].merge(profiles[1])
+    assert merged.rows == len(full)
+    assert merged.duplicates() == expected
+
+    # Los temporales se borran cuando el perfil deja de usarse
+    del profiles, merged, p
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,83 @@
+import os
+import pytest
+from utils import publish
+
+LOAD = os.path.join("data", "load")
+
+
+def _curated(name, text):
+    os.makedirs("curated", exist_ok=True)
+    path = os.path.join("curated", name)
+    # Como curate: archivo nuevo + os.replace (el viejo sigue enlazado al snapshot)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _snapshot(run_id, text):
+    staging = publish.new_snapshot(LOAD, run_id)
+    publish.link_file(_curated("dim_Products_curated.csv", text),
+                      os.path.join(staging, "dim_Products_curated.csv"))
+    return staging
+
+
+def _read_current():
+    with open(os.path.join(publish.current_snapshot(LOAD), "dim_Products_curated.csv"),
+              encoding="utf-8") as f:
+        return f.read()
+
+
+def test_publish_switches_current_atomically():
+    first = publish.publish(_snapshot("20250101_000000", "v1"))
+    assert _read_current() == "v1"
+
+    # Mientras el snapshot nuevo se arma, current sigue en el anterior
+    staging = _snapshot("20250102_000000", "v2")
+    assert staging.endswith(publish.STAGING_SUFFIX)
+    assert publish.current_snapshot(LOAD) == first
+    assert _read_current() == "v1"
+
+    second = publish.publish(staging)
+    assert not os.path.exists(staging)
+    assert publish.current_snapshot(LOAD) == second and _read_current() == "v2"
+    # El anterior sigue completo para quien lo estaba leyendo
+    with open(os.path.join(first, "dim_Products_curated.csv"), encoding="utf-8") as f:
+        assert f.read() == "v1"
+    if os.path.islink(os.path.join(LOAD, publish.CURRENT_LINK)):
+        assert os.path.realpath(os.path.join(LOAD, publish.CURRENT_LINK)) == \
+            os.path.realpath(second)
+
+
+def test_snapshot_uses_hard_links():
+    staging = publish.new_snapshot(LOAD, "20250101_000000")
+    src = _curated("fact_Invoices_curated.parquet", "x" * 1000)
+    assert publish.link_file(src, os.path.join(staging, "fact_Invoices_curated.parquet")) == "link"
+    assert os.path.samefile(src, os.path.join(staging, "fact_Invoices_curated.parquet"))
+
+    # Mismo run_id: otra carpeta, no pisa la anterior
+    assert publish.new_snapshot(LOAD, "20250101_000000") != staging
+    publish.discard(staging)
+    assert not os.path.exists(staging)
+
+
+@pytest.mark.parametrize("keep", [1, 2, 3])
+def test_prune_keeps_last_snapshots(keep):
+    for day in range(1, 6):
+        publish.publish(_snapshot(f"202501{day:02d}_000000", f"v{day}"), keep=keep)
+    names = sorted(os.listdir(os.path.join(LOAD, publish.SNAPSHOTS_DIR)))
+    assert names == [f"202501{day:02d}_000000" for day in range(6 - keep, 6)]
+    assert _read_current() == "v5"
+
+
+def test_prune_never_removes_current():
+    for day in range(1, 4):
+        publish.publish(_snapshot(f"202501{day:02d}_000000", f"v{day}"))
+    # Vuelta atrás: CURRENT apunta a un snapshot viejo
+    with open(os.path.join(LOAD, publish.CURRENT_FILE), "w", encoding="utf-8") as f:
+        f.write("20250101_000000")
+    # Un staging sin publicar tampoco se toca
+    staging = _snapshot("20250109_000000", "v9")
+    assert publish.prune(LOAD, keep=1) == ["20250102_000000"]
+    assert _read_current() == "v1"
+    assert os.path.isdir(staging)
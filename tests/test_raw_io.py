@@ -0,0 +1,29 @@
+import os
+import pandas as pd
+import pytest
+from utils import synthetic
+from utils.raw_io import find_raw, read_raw
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_stratified_sample(fmt):
+    raw = os.path.join("data", "raw")
+    synthetic.write_raw(raw, 6_000, fmt=fmt)
+    path = find_raw(raw, "fact_Invoices")
+    full = read_raw(path)
+    months = pd.to_datetime(full["Invoice_Date"]).dt.to_period("M")
+
+    df = read_raw(path, columns=["Invoice_Key"], sample=0.1, stratify_by="invoice_date", seed=7)
+    # La columna de estratos no se pidió: no sale
+    assert list(df.columns) == ["Invoice_Key"]
+    assert abs(len(df) - 600) <= months.nunique()
+    # Todos los meses quedan representados, con la misma fracción
+    chosen = months[full["Invoice_Key"].isin(df["Invoice_Key"])]
+    assert chosen.nunique() == months.nunique()
+    ratio = chosen.value_counts() / months.value_counts()
+    assert ratio.between(0.05, 0.15).all()
+
+    # Misma semilla → misma muestra; pedida explícitamente, la columna sale
+    again = read_raw(path, columns=["Invoice_Key", "Invoice_Date"], sample=0.1,
+                     stratify_by="invoice_date", seed=7)
+    assert again["Invoice_Key"].tolist() == df["Invoice_Key"].tolist()
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from utils.dataset import PartitionedWriter
+from utils.rollups import build_rollups, rollup_path, MEASURES
+
+STATE = os.path.join("data", "state", "rollups.json")
+
+
+def _fact(days, start="2024-01-01", seed=0):
+    rng = np.random.default_rng(seed)
+    n = days * 20
+    df = pd.DataFrame({
+        "invoice_date": pd.Timestamp(start) + pd.to_timedelta(np.repeat(np.arange(days), 20), "D"),
+        "customerid": rng.integers(1, 30, n).astype("int32"),
+        "productkey": rng.integers(1, 10, n).astype("int32"),
+        "quantity": rng.integers(1, 5, n).astype("int32"),
+    })
+    for col in MEASURES[1:]:
+        df[col] = rng.random(n).round(2) * 100
+    return df
+
+
+def _write(folder, df, partitioned):
+    if partitioned:
+        with PartitionedWriter(os.path.join(folder, "fact_Invoices_curated"), "invoice_date",
+                               table="fact_Invoices") as writer:
+            writer.write(df)
+    else:
+        df.to_parquet(os.path.join(folder, "fact_Invoices_curated.parquet"), index=False)
+
+
+def _check(folder, df):
+    by_customer = pd.read_parquet(rollup_path(folder, "sales_by_customer")).set_index("customerid")
+    expected = df.groupby("customerid")[MEASURES].sum()
+    pd.testing.assert_frame_equal(by_customer[MEASURES], expected, check_dtype=False,
+                                  check_index_type=False, check_names=False)
+    by_date = pd.read_parquet(rollup_path(folder, "sales_by_date"))
+    assert by_date["invoices"].sum() == len(df)
+
+
+@pytest.mark.parametrize("partitioned", [False, True])
+def test_rollups_rebuild_after_changed_values(tmp_path, partitioned):
+    folder = str(tmp_path / "curated")
+    os.makedirs(folder)
+    df = _fact(60)
+    _write(folder, df, partitioned)
+    assert build_rollups(folder, state_file=STATE)["mode"] == "full"
+    assert build_rollups(folder, state_file=STATE)["mode"] == "unchanged"
+
+    # Mismo número de filas, otro valor en una fecha ya agregada
+    df.loc[5, "net_invoice_value"] += 1000
+    _write(folder, df, partitioned)
+    assert build_rollups(folder, state_file=STATE)["mode"] == "full"
+    _check(folder, df)
+
+    # Filas que solo se agregan al final: incremental
+    df = pd.concat([df, _fact(40, start="2024-03-01", seed=1)], ignore_index=True)
+    _write(folder, df, partitioned)
+    summary = build_rollups(folder, state_file=STATE)
+    assert summary["mode"] == "incremental"
+    assert summary["rows_read"] == 40 * 20
+    _check(folder, df)
+
+    # Fila agregada al final pero con una fecha vieja: también suma
+    late = df.iloc[[0]].assign(net_invoice_value=7.0)
+    df = pd.concat([df, late], ignore_index=True)
+    _write(folder, df, partitioned)
+    assert build_rollups(folder, state_file=STATE)["mode"] == "incremental"
+    _check(folder, df)
+
+    # Se borra una fila: el prefijo ya no cuadra
+    df = df.drop(index=3).reset_index(drop=True)
+    _write(folder, df, partitioned)
+    assert build_rollups(folder, state_file=STATE)["mode"] == "full"
+    _check(folder, df)
@@ -0,0 +1,41 @@
+import os
+import pandas as pd
+import pytest
+from utils import synthetic
+from utils.schema import enforce_schema, SchemaError
+from utils.raw_io import read_raw
+from etl_curated import run_curated
+
+BIG = 2**31 + 10
+
+
+def test_streaming_plan_keeps_integer_width():
+    first = pd.DataFrame({"invoice_key": [1, 2, 3], "quantity": [1, 2, 3],
+                          "gross_invoice_value": 1.0})
+    later = pd.DataFrame({"invoice_key": [BIG], "quantity": [4], "gross_invoice_value": 1.0})
+
+    _, plan = enforce_schema(first, "fact_Invoices", streaming=True)
+    assert "invoice_key" not in plan and plan["quantity"] == "int32"
+    out, _ = enforce_schema(later, "fact_Invoices", plan)
+    assert out["invoice_key"].iloc[0] == BIG
+
+    # En memoria el plan ve todos los valores: ahí sí se achica
+    _, plan = enforce_schema(first, "fact_Invoices")
+    assert plan["invoice_key"] == "int32"
+    with pytest.raises(SchemaError):
+        enforce_schema(later, "fact_Invoices", plan)
+
+
+def test_stream_curate_late_wide_key():
+    raw = os.path.join("data", "raw")
+    synthetic.write_raw(raw, 3_000)
+    path = os.path.join(raw, "fact_Invoices.csv")
+    df = pd.read_csv(path)
+    df.loc[len(df) - 1, "Invoice_Key"] = BIG
+    df.to_csv(path, index=False)
+
+    result = run_curated(tables=["fact_Invoices"], stream=True, chunk_size=500,
+                         no_cache=True, no_rollups=True)
+    assert result["ok"]
+    curated = read_raw(os.path.join("data", "curated", "fact_Invoices_curated.parquet"))
+    assert curated["invoice_key"].max() == BIG